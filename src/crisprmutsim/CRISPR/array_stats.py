@@ -2,7 +2,7 @@ from dataclasses import dataclass
 import json
 import sqlite3
 
-from crisprmutsim.CRISPR.simulation.events.mutation import MutationActions
+from crisprmutsim.CRISPR.mutation_diff import MutationDiff
 
 
 @dataclass
@@ -13,9 +13,9 @@ class ArrayStats:
     mutation_count_consensus: int
     mutation_count_proximal: int
     mutation_count_distal: int
-    mutation_diff_consensus: list[MutationActions]
-    mutation_diff_proximal: list[MutationActions]
-    mutation_diff_distal: list[MutationActions]
+    mutation_diff_consensus: MutationDiff
+    mutation_diff_proximal: MutationDiff
+    mutation_diff_distal: MutationDiff
     patterns: set[int]
 
     @classmethod
@@ -27,9 +27,9 @@ class ArrayStats:
             mutation_count_consensus=0,
             mutation_count_proximal=0,
             mutation_count_distal=0,
-            mutation_diff_consensus=[],
-            mutation_diff_proximal=[],
-            mutation_diff_distal=[],
+            mutation_diff_consensus=MutationDiff(),
+            mutation_diff_proximal=MutationDiff(),
+            mutation_diff_distal=MutationDiff(),
             patterns=set(),
         )
 
@@ -42,10 +42,10 @@ class ArrayStats:
             mutation_count_consensus=row["mutation_count_consensus"],
             mutation_count_proximal=row["mutation_count_proximal"],
             mutation_count_distal=row["mutation_count_distal"],
-            mutation_diff_consensus=json.loads(row["mutation_diff_consensus"]),
-            mutation_diff_proximal=json.loads(row["mutation_diff_proximal"]),
-            mutation_diff_distal=json.loads(row["mutation_diff_distal"]),
-            patterns=set(json.loads(row["patterns"])),
+            mutation_diff_consensus=_diff_from_db(row["mutation_diff_consensus"]),
+            mutation_diff_proximal=_diff_from_db(row["mutation_diff_proximal"]),
+            mutation_diff_distal=_diff_from_db(row["mutation_diff_distal"]),
+            patterns=_patterns_from_db(row["patterns"]),
         )
 
     @classmethod
@@ -58,8 +58,37 @@ class ArrayStats:
             mutation_count_consensus=data["mutation_count_consensus"],
             mutation_count_proximal=data["mutation_count_proximal"],
             mutation_count_distal=data["mutation_count_distal"],
-            mutation_diff_consensus=data["mutation_diff_consensus"],
-            mutation_diff_proximal=data["mutation_diff_proximal"],
-            mutation_diff_distal=data["mutation_diff_distal"],
+            mutation_diff_consensus=MutationDiff.from_actions(
+                data["mutation_diff_consensus"]
+            ),
+            mutation_diff_proximal=MutationDiff.from_actions(
+                data["mutation_diff_proximal"]
+            ),
+            mutation_diff_distal=MutationDiff.from_actions(
+                data["mutation_diff_distal"]
+            ),
             patterns=set(data["patterns"]),
         )
+
+
+# diffs and patterns are binary since storage schema version 2, JSON text before
+
+
+def _diff_from_db(value: str | bytes) -> MutationDiff:
+    if isinstance(value, bytes):
+        return MutationDiff.from_bytes(value)
+    return MutationDiff.from_json(value)
+
+
+def _patterns_from_db(value: str | bytes) -> set[int]:
+    if isinstance(value, bytes):
+        return set(value)
+    return set(json.loads(value))
+
+
+# bit p set for each pattern p, 0 for no patterns
+def pattern_mask(patterns: set[int]) -> int:
+    mask = 0
+    for pattern in patterns:
+        mask |= 1 << pattern
+    return mask
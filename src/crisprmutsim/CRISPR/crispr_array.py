@@ -1,7 +1,9 @@
+from collections.abc import Sequence
 from dataclasses import asdict, dataclass, field
 import sqlite3
 from typing import Self
 from crisprmutsim.CRISPR.array_stats import ArrayStats
+from crisprmutsim.CRISPR.matrix_stats import batch_all_stats, to_matrix
 from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
 
 
@@ -33,6 +35,20 @@ class CRISPRArray:
             repeat_stats=stats,
         )
 
+    # stats for all arrays in one vectorized pass, see matrix_stats.batch_all_stats
+    @classmethod
+    def from_raw_arrays(
+        cls,
+        ids: Sequence[str],
+        cas_types: Sequence[str],
+        raw_arrays: Sequence[RawCRISPRArray],
+    ) -> list[Self]:
+        stats = batch_all_stats([to_matrix(raw_array) for raw_array in raw_arrays])
+        return [
+            cls(id=id, cas_type=cas_type, repeat_stats=repeat_stats)
+            for id, cas_type, repeat_stats in zip(ids, cas_types, stats)
+        ]
+
     def as_raw_array(self) -> RawCRISPRArray:
         return RawCRISPRArray.from_array_stats(self.repeat_stats)
 
@@ -0,0 +1,170 @@
+from collections.abc import Iterable, Sequence
+
+from crisprmutsim.CRISPR.simulation.events.crispr_event import ICRISPREvent
+from crisprmutsim.CRISPR.simulation.events.deletion import Deletion, DeletionActions
+from crisprmutsim.CRISPR.simulation.events.insertion import Insertion, InsertionActions
+from crisprmutsim.CRISPR.simulation.events.insertion_deletion import (
+    InsertionDeletion,
+    InsertionDeletionActions,
+)
+from crisprmutsim.CRISPR.simulation.events.mutation import Mutation, MutationActions
+
+
+# thin implementation for inheritance
+# validated and "unsafe" event application, shared by all array storage types;
+#   subclasses provide __len__, __getitem__ and the __unsafe_apply_*__ primitives
+class CRISPRArrayEvents:
+    def __len__(self) -> int: ...
+
+    def __getitem__(self, index: int) -> Sequence[str]: ...
+
+    def apply_events(self, events: Iterable[ICRISPREvent]) -> None:
+        for event in events:
+            if isinstance(event, Mutation):
+                self.apply_mutation(event.actions)
+            elif isinstance(event, Insertion):
+                self.apply_insertion(event.actions)
+            elif isinstance(event, Deletion):
+                self.apply_deletion(event.actions)
+            elif isinstance(event, InsertionDeletion):
+                self.apply_insertion_deletion(event.actions)
+            else:
+                raise NotImplementedError(f"Unknown event type: {type(event)}")
+
+    def apply_mutation(self, actions: MutationActions) -> None:
+        if actions["repeat_index"] < 0 or actions["repeat_index"] > len(self) - 1:
+            raise IndexError("Repeat index out of bounds.")
+        if (
+            actions["base_index"] < 0
+            or actions["base_index"] > len(self[actions["repeat_index"]]) - 1
+        ):
+            raise IndexError("Base index out of bounds.")
+        self.__unsafe_apply_mutation__(
+            actions["repeat_index"], actions["base_index"], actions["new_base"]
+        )
+
+    def apply_insertion(self, actions: InsertionActions) -> None:
+        copy_index = actions["copy_index"]
+        insertion_index = actions["insertion_index"]
+        if insertion_index < 0 or insertion_index > len(self):
+            raise IndexError("Insertion position out of bounds.")
+        self.__unsafe_apply_insertion__(copy_index, insertion_index)
+
+    def apply_deletion(self, actions: DeletionActions) -> None:
+        repeat_index = actions["repeat_index"]
+        split_index = actions.get("split_index", -1)
+        block_length = actions.get("block_deletion_length", 1)
+
+        array_length = len(self)
+
+        if array_length < 1:
+            raise ValueError("Cannot delete from an empty array.")
+        if repeat_index < 0 or repeat_index > array_length - 1:
+            raise IndexError("Repeat index out of bounds.")
+        if block_length < 1:
+            raise ValueError("Block deletion length must be at least 1.")
+        if split_index > len(self[repeat_index]):
+            raise IndexError("Split index out of bounds.")
+
+        if split_index < 0:
+            if repeat_index + block_length > array_length:
+                raise ValueError("Block deletion length exceeds array bounds.")
+            self.__unsafe_apply_deletion__(repeat_index, block_length)
+        else:
+            # split deletion: need to access repeat at repeat_index + block_length
+            if repeat_index + block_length > array_length - 1:
+                raise IndexError(
+                    "Cannot perform split deletion: target repeat index out of bounds."
+                )
+            self.__unsafe_apply_split_deletion__(
+                repeat_index, split_index, block_length
+            )
+
+    def apply_insertion_deletion(self, actions: InsertionDeletionActions) -> None:
+        copy_index = actions["copy_index"]
+        insertion_index = actions["insertion_index"]
+        deletion_repeat_index = actions["deletion_repeat_index"]
+
+        self.apply_insertion(
+            {"copy_index": copy_index, "insertion_index": insertion_index}
+        )
+
+        # shift deletion index if insertion happened before or at the deletion point
+        adjusted_deletion_index = (
+            deletion_repeat_index + 1
+            if deletion_repeat_index >= insertion_index
+            else deletion_repeat_index
+        )
+
+        self.apply_deletion(
+            {
+                "repeat_index": adjusted_deletion_index,
+                "split_index": actions.get("deletion_split_index", -1),
+            }
+        )
+
+    #####
+    # "Unsafe" event versions; assume all actions are valid, reduce branching
+    #####
+
+    def __unsafe_apply_events__(self, events: Iterable[ICRISPREvent]) -> None:
+        for event in events:
+            if isinstance(event, Mutation):
+                self.__unsafe_apply_mutation__(
+                    event.actions["repeat_index"],
+                    event.actions["base_index"],
+                    event.actions["new_base"],
+                )
+            elif isinstance(event, Insertion):
+                self.__unsafe_apply_insertion__(
+                    event.actions["copy_index"], event.actions["insertion_index"]
+                )
+            elif isinstance(event, Deletion):
+                repeat_index = event.actions["repeat_index"]
+                split_index = event.actions.get("split_index", -1)
+                block_length = event.actions.get("block_deletion_length", 1)
+
+                if split_index < 0:
+                    self.__unsafe_apply_deletion__(repeat_index, block_length)
+                else:
+                    self.__unsafe_apply_split_deletion__(
+                        repeat_index, split_index, block_length
+                    )
+            elif isinstance(event, InsertionDeletion):
+                copy_index = event.actions["copy_index"]
+                insertion_index = event.actions["insertion_index"]
+                deletion_repeat_index = event.actions["deletion_repeat_index"]
+                deletion_split_index = event.actions.get("deletion_split_index", -1)
+
+                self.__unsafe_apply_insertion__(copy_index, insertion_index)
+                # shift deletion index if insertion happened before or at the deletion point
+                adjusted_deletion_index = (
+                    deletion_repeat_index + 1
+                    if deletion_repeat_index >= insertion_index
+                    else deletion_repeat_index
+                )
+
+                if deletion_split_index >= 0:
+                    self.__unsafe_apply_split_deletion__(
+                        adjusted_deletion_index, deletion_split_index, 1
+                    )
+                else:
+                    self.__unsafe_apply_deletion__(adjusted_deletion_index, 1)
+            else:
+                raise NotImplementedError(f"Unknown event type: {type(event)}")
+
+    def __unsafe_apply_mutation__(
+        self, repeat_index: int, base_index: int, new_base: str
+    ) -> None: ...
+
+    def __unsafe_apply_insertion__(
+        self, copy_index: int, insertion_index: int
+    ) -> None: ...
+
+    def __unsafe_apply_deletion__(
+        self, repeat_index: int, block_length: int
+    ) -> None: ...
+
+    def __unsafe_apply_split_deletion__(
+        self, repeat_index: int, split_index: int, block_length: int
+    ) -> None: ...
@@ -1,13 +1,106 @@
 from collections import defaultdict
+from collections.abc import Iterable
 from dataclasses import dataclass, field
 from typing import Literal, Self
 
+import numpy as np
+import numpy.typing as npt
+
+from crisprmutsim.CRISPR.array_stats import pattern_mask
 from crisprmutsim.CRISPR.crispr_array import CRISPRArray
+from crisprmutsim.CRISPR.mutation_diff import MutationDiff
+
+type Reference = Literal["consensus", "proximal", "distal"]
+REFERENCES: tuple[Reference, ...] = ("consensus", "proximal", "distal")
+
+# number of arrays per (cas type, array length, repeat length, pattern mask, mutation count)
+type ArrayCounts = dict[tuple[str, int, int, int, int], int]
+# number of mutations per (cas type, array length, repeat length, pattern mask,
+#   repeat index, base index)
+type MutationCounts = dict[tuple[str, int, int, int, int, int], int]
+
+
+# mutations against the given reference; the pattern mask is array_stats.pattern_mask
+def count_arrays(
+    arrays: Iterable[CRISPRArray], reference: Reference = "consensus"
+) -> tuple[ArrayCounts, MutationCounts]:
+    accumulator = DatasetStatsAccumulator(reference)
+    for array in arrays:
+        accumulator.add(array)
+    return dict(accumulator.array_counts), dict(accumulator.mutation_counts)
+
+
+class DatasetStatsAccumulator:
+    """
+    Raw counts behind DatasetStats (see count_arrays), built one array at a time.
+
+    Memory grows with the number of distinct count keys, not with the number of
+    arrays. Accumulators over different arrays (e.g. parallel workers over parts of
+    a database, see storage.accumulate_dataset_stats) are combined with merge, and
+    finalize can be called at any point, e.g. for live stats of a running simulation.
+    """
+
+    def __init__(self, reference: Reference = "consensus") -> None:
+        self.reference = reference
+        self.array_counts: ArrayCounts = defaultdict(int)
+        self.mutation_counts: MutationCounts = defaultdict(int)
+
+    def add(self, array: CRISPRArray) -> None:
+        stats = array.repeat_stats
+        if self.reference == "consensus":
+            mutation_diff = stats.mutation_diff_consensus
+            mutation_count = stats.mutation_count_consensus
+        elif self.reference == "proximal":
+            mutation_diff = stats.mutation_diff_proximal
+            mutation_count = stats.mutation_count_proximal
+        else:
+            mutation_diff = stats.mutation_diff_distal
+            mutation_count = stats.mutation_count_distal
+
+        group = (
+            array.cas_type,
+            stats.array_length,
+            stats.repeat_length,
+            pattern_mask(stats.patterns),
+        )
+        self.array_counts[(*group, mutation_count)] += 1
+        mutation_counts = self.mutation_counts
+        for repeat_idx, base_idx in zip(
+            mutation_diff.repeat_indices, mutation_diff.base_indices
+        ):
+            mutation_counts[(*group, repeat_idx, base_idx)] += 1
+
+    def merge(self, other: "DatasetStatsAccumulator") -> None:
+        if other.reference != self.reference:
+            raise ValueError(
+                f"Cannot merge stats against {other.reference} into stats against {self.reference}"
+            )
+        for key, count in other.array_counts.items():
+            self.array_counts[key] += count
+        for key, count in other.mutation_counts.items():
+            self.mutation_counts[key] += count
+
+    def __len__(self) -> int:
+        return sum(self.array_counts.values())
+
+    def finalize(
+        self,
+        mut_per_base_range: tuple[int, int] = (0, 0),
+        mut_per_base_distal_range: tuple[int, int] = (0, 0),
+    ) -> "DatasetStats":
+        # copies: the counts may keep growing (e.g. from a simulation thread)
+        return DatasetStats.from_aggregates(
+            dict(self.array_counts),
+            dict(self.mutation_counts),
+            self.reference,
+            mut_per_base_range,
+            mut_per_base_distal_range,
+        )
 
 
 @dataclass
 class DatasetStats:
-    reference: Literal["consensus", "proximal", "distal"] = "consensus"
+    reference: Reference = "consensus"
     max_array_length: int = 0
     max_repeat_length: int = 0
     total_arrays: int = 0
@@ -76,95 +169,196 @@ class DatasetStats:
     def from_arrays(
         cls,
         arrays: list[CRISPRArray],
-        reference: Literal["consensus", "proximal", "distal"] = "consensus",
+        reference: Reference = "consensus",
         mut_per_base_range: tuple[int, int] = (0, 0),
         mut_per_base_distal_range: tuple[int, int] = (0, 0),
     ) -> Self:
         if not arrays:
             return cls(reference=reference)
 
-        max_array_length = max(arr.repeat_stats.array_length for arr in arrays)
-        max_repeat_length = max(arr.repeat_stats.repeat_length for arr in arrays)
-        total_arrays = len(arrays)
+        cas_type_codes: dict[str, int] = {}
+        cas_codes: list[int] = []
+        array_lengths: list[int] = []
+        repeat_lengths: list[int] = []
+        masks: list[int] = []
+        mutation_counts: list[int] = []
+        mutation_diffs: list[MutationDiff] = []
+        for array in arrays:
+            stats = array.repeat_stats
+            if reference == "consensus":
+                mutation_diffs.append(stats.mutation_diff_consensus)
+                mutation_counts.append(stats.mutation_count_consensus)
+            elif reference == "proximal":
+                mutation_diffs.append(stats.mutation_diff_proximal)
+                mutation_counts.append(stats.mutation_count_proximal)
+            else:
+                mutation_diffs.append(stats.mutation_diff_distal)
+                mutation_counts.append(stats.mutation_count_distal)
+            cas_codes.append(
+                cas_type_codes.setdefault(array.cas_type, len(cas_type_codes))
+            )
+            array_lengths.append(stats.array_length)
+            repeat_lengths.append(stats.repeat_length)
+            masks.append(pattern_mask(stats.patterns))
+
+        # all mutations in one flat column each, array after array
+        num_mutations = [len(diff) for diff in mutation_diffs]
+        mutation_array_lengths = np.repeat(array_lengths, num_mutations)
+        mutation_repeat_lengths = np.repeat(repeat_lengths, num_mutations)
+        repeat_indices = np.frombuffer(
+            b"".join(diff.repeat_indices for diff in mutation_diffs), dtype=np.uint16
+        )
+        base_indices = np.frombuffer(
+            b"".join(diff.base_indices for diff in mutation_diffs), dtype=np.uint16
+        )
 
-        array_length_dist: dict[int, int] = defaultdict(int)
-        repeat_length_dist: dict[int, int] = defaultdict(int)
-        mutation_count_dist: dict[int, int] = defaultdict(int)
-        cas_type_dist: dict[str, int] = defaultdict(int)
+        return cls._from_columns(
+            reference,
+            list(cas_type_codes),
+            _columns(cas_codes, array_lengths, repeat_lengths, masks, mutation_counts),
+            _columns(
+                mutation_array_lengths,
+                mutation_repeat_lengths,
+                repeat_indices,
+                base_indices,
+            ),
+            None,
+            None,
+            mut_per_base_range,
+            mut_per_base_distal_range,
+        )
 
-        pattern_counts = {i: 0 for i in range(7)}
-        pattern_counts_by_cas_type: dict[str, dict[int, int]] = {}
+    @classmethod
+    def from_aggregates(
+        cls,
+        array_counts: ArrayCounts,
+        mutation_counts: MutationCounts,
+        reference: Reference = "consensus",
+        mut_per_base_range: tuple[int, int] = (0, 0),
+        mut_per_base_distal_range: tuple[int, int] = (0, 0),
+    ) -> Self:
+        """
+        Stats from counts of arrays and mutations, see count_arrays.
 
-        mutation_matrix = [
-            [0.0 for _ in range(max_repeat_length)] for _ in range(max_array_length)
-        ]
-        mutation_matrix_from_distal = [
-            [0.0 for _ in range(max_repeat_length)] for _ in range(max_array_length)
+        The counts can come from any source, e.g. summed from the aggregate tables of
+        a result database (storage.load_aggregates) instead of from the arrays.
+        """
+        if not array_counts:
+            return cls(reference=reference)
+
+        cas_type_codes: dict[str, int] = {}
+        array_keys = [
+            (cas_type_codes.setdefault(key[0], len(cas_type_codes)), *key[1:])
+            for key in array_counts
         ]
+        # (array length, repeat length, repeat index, base index)
+        mutation_keys = [key[1:3] + key[4:] for key in mutation_counts]
+        return cls._from_columns(
+            reference,
+            list(cas_type_codes),
+            _columns(*zip(*array_keys)),
+            (
+                _columns(*zip(*mutation_keys))
+                if mutation_keys
+                else _columns([], [], [], [])
+            ),
+            np.fromiter(array_counts.values(), dtype=np.int64, count=len(array_counts)),
+            np.fromiter(
+                mutation_counts.values(), dtype=np.int64, count=len(mutation_counts)
+            ),
+            mut_per_base_range,
+            mut_per_base_distal_range,
+        )
 
-        mutations_per_repeat: dict[int, int] = defaultdict(int)
-        mutations_per_repeat_normalized: dict[int, float] = defaultdict(float)
-        mutations_per_base: dict[int, int] = defaultdict(int)
-        mutations_per_repeat_from_distal: dict[int, int] = defaultdict(int)
-        mutations_per_base_from_distal: dict[int, int] = defaultdict(int)
+    # the stats from one row per array (or per group of arrays, with array_weights)
+    #   and one row per mutation (or group, with mutation_weights). Dicts are in the
+    #   order of first occurrence in the rows, as with a loop over the arrays
+    @classmethod
+    def _from_columns(
+        cls,
+        reference: Reference,
+        cas_types: list[str],
+        array_columns: tuple[npt.NDArray[np.int64], ...],
+        mutation_columns: tuple[npt.NDArray[np.int64], ...],
+        array_weights: npt.NDArray[np.int64] | None,
+        mutation_weights: npt.NDArray[np.int64] | None,
+        mut_per_base_range: tuple[int, int],
+        mut_per_base_distal_range: tuple[int, int],
+    ) -> Self:
+        cas_codes, array_lengths, repeat_lengths, masks, mutation_counts = array_columns
+        mutation_array_lengths, mutation_repeat_lengths, repeat_idx, base_idx = (
+            mutation_columns
+        )
 
-        for array in arrays:
-            stats = array.repeat_stats
+        max_array_length = int(array_lengths.max())
+        max_repeat_length = int(repeat_lengths.max())
+        total_arrays = (
+            len(array_lengths) if array_weights is None else int(array_weights.sum())
+        )
 
-            if reference == "consensus":
-                mutation_diff = stats.mutation_diff_consensus
-                mutation_count = stats.mutation_count_consensus
-            elif reference == "proximal":
-                mutation_diff = stats.mutation_diff_proximal
-                mutation_count = stats.mutation_count_proximal
-            else:
-                mutation_diff = stats.mutation_diff_distal
-                mutation_count = stats.mutation_count_distal
-
-            array_length_dist[stats.array_length] += 1
-            repeat_length_dist[stats.repeat_length] += 1
-            mutation_count_dist[mutation_count] += 1
-            cas_type_dist[array.cas_type] += 1
-
-            if array.cas_type not in pattern_counts_by_cas_type.keys():
-                pattern_counts_by_cas_type[array.cas_type] = {i: 0 for i in range(7)}
-            for i in stats.patterns:
-                pattern_counts[i] += 1
-                pattern_counts_by_cas_type[array.cas_type][i] += 1
-            if len(stats.patterns) == 0:
-                pattern_counts[0] += 1
-                pattern_counts_by_cas_type[array.cas_type][0] += 1
-
-            for mutation in mutation_diff:
-                repeat_idx = mutation["repeat_index"]
-                base_idx = mutation["base_index"]
-                repeat_idx_from_distal = stats.array_length - 1 - repeat_idx
-                base_idx_from_distal = stats.repeat_length - 1 - base_idx
-
-                mutation_matrix[repeat_idx][base_idx] += 1
-                mutation_matrix_from_distal[repeat_idx_from_distal][
-                    base_idx_from_distal
-                ] += 1
-
-                mutations_per_repeat[repeat_idx] += 1
-                mutations_per_repeat_from_distal[repeat_idx_from_distal] += 1
-                if mut_per_base_range[0] <= repeat_idx <= mut_per_base_range[1]:
-                    mutations_per_base[base_idx] += 1
-                if (
-                    mut_per_base_distal_range[0]
-                    <= repeat_idx_from_distal
-                    <= mut_per_base_distal_range[1]
-                ):
-                    mutations_per_base_from_distal[base_idx_from_distal] += 1
+        array_length_dist = _counts(array_lengths, array_weights)
+        repeat_length_dist = _counts(repeat_lengths, array_weights)
+        mutation_count_dist = _counts(mutation_counts, array_weights)
+        cas_type_dist = {
+            cas_types[code]: count
+            for code, count in _counts(cas_codes, array_weights).items()
+        }
+
+        # bit 0 is never set: mask 0 counts as pattern 0 (none)
+        has_pattern = [masks == 0] + [masks >> i & 1 == 1 for i in range(1, 7)]
+        by_cas_type = np.stack(
+            [
+                _bincount(cas_codes[has], _weights(array_weights, has), len(cas_types))
+                for has in has_pattern
+            ],
+            axis=1,
+        )
+        pattern_counts = dict(enumerate(by_cas_type.sum(axis=0).tolist()))
+        pattern_counts_by_cas_type = {
+            cas_type: dict(enumerate(counts))
+            for cas_type, counts in zip(cas_types, by_cas_type.tolist())
+        }
+
+        repeat_idx_from_distal = mutation_array_lengths - 1 - repeat_idx
+        base_idx_from_distal = mutation_repeat_lengths - 1 - base_idx
+
+        mutation_matrix = _bincount(
+            repeat_idx * max_repeat_length + base_idx,
+            mutation_weights,
+            max_array_length * max_repeat_length,
+        ).reshape(max_array_length, max_repeat_length)
+        mutation_matrix_from_distal = _bincount(
+            repeat_idx_from_distal * max_repeat_length + base_idx_from_distal,
+            mutation_weights,
+            max_array_length * max_repeat_length,
+        ).reshape(max_array_length, max_repeat_length)
 
+        mutations_per_repeat = _counts(repeat_idx, mutation_weights)
+        mutations_per_repeat_from_distal = _counts(
+            repeat_idx_from_distal, mutation_weights
+        )
+        in_range = (mut_per_base_range[0] <= repeat_idx) & (
+            repeat_idx <= mut_per_base_range[1]
+        )
+        mutations_per_base = _counts(
+            base_idx[in_range], _weights(mutation_weights, in_range)
+        )
+        in_distal_range = (mut_per_base_distal_range[0] <= repeat_idx_from_distal) & (
+            repeat_idx_from_distal <= mut_per_base_distal_range[1]
+        )
+        mutations_per_base_from_distal = _counts(
+            base_idx_from_distal[in_distal_range],
+            _weights(mutation_weights, in_distal_range),
+        )
+
+        # arrays with more than repeat_idx repeats: reverse cumulative sum
+        arrays_per_length = _bincount(
+            array_lengths, array_weights, max_array_length + 1
+        )
+        arrays_longer_than = np.cumsum(arrays_per_length[::-1])[::-1][1:].tolist()
         mutations_per_repeat_normalized = {
-            repeat_idx: mutations_per_repeat[repeat_idx]
-            / sum(
-                count
-                for length, count in array_length_dist.items()
-                if length > repeat_idx
-            )
-            for repeat_idx in mutations_per_repeat
+            repeat_idx: count / arrays_longer_than[repeat_idx]
+            for repeat_idx, count in mutations_per_repeat.items()
         }
 
         # means
@@ -199,13 +393,10 @@ class DatasetStats:
             for cas_type, counts in pattern_counts_by_cas_type.items()
         }
 
-        mutation_matrix_norm = [
-            [count / total_arrays for count in row] for row in mutation_matrix
-        ]
-        mutation_matrix_from_distal_norm = [
-            [count / total_arrays for count in row]
-            for row in mutation_matrix_from_distal
-        ]
+        mutation_matrix_norm = (mutation_matrix / total_arrays).tolist()
+        mutation_matrix_from_distal_norm = (
+            mutation_matrix_from_distal / total_arrays
+        ).tolist()
 
         mutations_per_repeat_norm = {
             k: v / total_arrays for k, v in mutations_per_repeat.items()
@@ -229,10 +420,10 @@ class DatasetStats:
             repeat_length_distribution=repeat_length_dist_norm,
             mutation_count_distribution=mutation_count_dist_norm,
             cas_type_distribution=cas_type_dist_norm,
-            array_length_distribution_abs=dict(array_length_dist),
-            repeat_length_distribution_abs=dict(repeat_length_dist),
-            mutation_count_distribution_abs=dict(mutation_count_dist),
-            cas_type_distribution_abs=dict(cas_type_dist),
+            array_length_distribution_abs=array_length_dist,
+            repeat_length_distribution_abs=repeat_length_dist,
+            mutation_count_distribution_abs=mutation_count_dist,
+            cas_type_distribution_abs=cas_type_dist,
             mean_array_length=mean_array_length,
             mean_repeat_length=mean_repeat_length,
             mean_mutations_per_array=mean_mutations_per_array,
@@ -246,3 +437,37 @@ class DatasetStats:
             mutations_per_repeat_position_from_distal=mutations_per_repeat_from_distal_norm,
             mutations_per_base_position_from_distal=mutations_per_base_from_distal_norm,
         )
+
+
+# int64 columns of equal length
+def _columns(*columns: Iterable[int]) -> tuple[npt.NDArray[np.int64], ...]:
+    return tuple(np.asarray(column, dtype=np.int64) for column in columns)
+
+
+def _weights(
+    weights: npt.NDArray[np.int64] | None, selected: npt.NDArray[np.bool_]
+) -> npt.NDArray[np.int64] | None:
+    return None if weights is None else weights[selected]
+
+
+# exact integer counts per value (bincount returns floats for weights)
+def _bincount(
+    values: npt.NDArray[np.int64],
+    weights: npt.NDArray[np.int64] | None,
+    minlength: int = 0,
+) -> npt.NDArray[np.int64]:
+    return np.bincount(values, weights, minlength).astype(np.int64)
+
+
+# counts per value (non-negative), in the order of first occurrence
+def _counts(
+    values: npt.NDArray[np.int64], weights: npt.NDArray[np.int64] | None
+) -> dict[int, int]:
+    if len(values) == 0:
+        return {}
+    counts = _bincount(values, weights)
+    first = np.full(len(counts), len(values))
+    np.minimum.at(first, values, np.arange(len(values)))
+    present = np.flatnonzero(first < len(values))
+    order = present[np.argsort(first[present])]
+    return dict(zip(order.tolist(), counts[order].tolist()))
@@ -121,3 +121,140 @@ class DNASequence(MutableSequence[str]):
     # Support left insertions using '+'
     def __radd__(self, value: Iterable[str]) -> "DNASequence":
         return DNASequence(value) + self.sequence
+
+
+_IUPAC_BYTES = IUPAC_BASES.encode("ascii")
+
+
+class PackedDNASequence(DNASequence):
+    """
+    Alternative DNASequence storage backend.
+
+    Bases are kept as ASCII codes in a single bytearray (one byte per base)
+    instead of a list of one-character strings, which makes copies and
+    in-place writes considerably cheaper for large numbers of short sequences.
+    """
+
+    def __init__(self, sequence: Iterable[str] = "", unsafe: bool = False) -> None:
+        self.bases: bytearray
+        if unsafe:
+            if isinstance(sequence, PackedDNASequence):
+                self.bases = sequence.bases.copy()
+            elif isinstance(sequence, str):
+                self.bases = bytearray(sequence.encode("ascii"))
+            else:
+                self.bases = bytearray("".join(sequence).encode("ascii"))
+        else:
+            self.bases = self._convert_bytes(sequence)
+
+    def _convert_bytes(self, sequence: Iterable[str]) -> bytearray:
+        if isinstance(sequence, PackedDNASequence):
+            return sequence.bases.copy()
+        if isinstance(sequence, DNASequence):
+            # already validated
+            return bytearray(str(sequence).encode("ascii"))
+
+        if not isinstance(sequence, str):
+            sequence = list(sequence)
+            if not all(isinstance(base, str) and len(base) == 1 for base in sequence):
+                raise ValueError(f"Invalid base in sequence: {sequence}")
+            sequence = "".join(sequence)
+        try:
+            data = bytearray(sequence.upper().encode("ascii"))
+        except UnicodeEncodeError:
+            raise ValueError(f"Invalid base in sequence: {sequence}")
+        if data.translate(None, _IUPAC_BYTES):
+            raise ValueError(f"Invalid base in sequence: {sequence}")
+        return data
+
+    # list view for compatibility with code reading DNASequence.sequence directly
+    @property
+    def sequence(self) -> list[str]:  # type: ignore[override]
+        return list(self.bases.decode("ascii"))
+
+    @sequence.setter
+    def sequence(self, value: list[str]) -> None:
+        self.bases = bytearray("".join(value).encode("ascii"))
+
+    def __unsafe_setitem__(self, index: int, value: str) -> None:
+        self.bases[index] = ord(value)
+
+    #############################################################################
+    # Dunder methods for MutableSequence interface and additional functionality #
+    #############################################################################
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+    def __getitem__(self, index: int | slice) -> str | list[str]:
+        if isinstance(index, slice):
+            return list(self.bases[index].decode("ascii"))
+        return chr(self.bases[index])
+
+    @overload
+    def __setitem__(self, index: int, value: str) -> None: ...
+    @overload
+    def __setitem__(self, index: slice, value: Iterable[str]) -> None: ...
+    def __setitem__(self, index: int | slice, value: str | Iterable[str]) -> None:
+        data = self._convert_bytes(value)
+        if isinstance(index, slice):
+            self.bases[index] = data
+        else:
+            if len(data) != 1:
+                raise ValueError(f"Invalid base: {value}.")
+            self.bases[index] = data[0]
+
+    @overload
+    def __delitem__(self, index: int) -> None: ...
+    @overload
+    def __delitem__(self, index: slice) -> None: ...
+    def __delitem__(self, index: int | slice) -> None:
+        del self.bases[index]
+
+    def __contains__(self, value: object) -> bool:
+        if not isinstance(value, Iterable):
+            raise TypeError(f"Invalid type for value: {type(value)}.")
+        # see comment in DNASequence.__contains__
+        value = cast(Iterable[str], value)
+        return self._convert_bytes(value) in self.bases
+
+    def __len__(self) -> int:
+        return len(self.bases)
+
+    def insert(self, index: int, value: str) -> None:
+        value = value.upper()
+        if len(value) != 1 or value not in IUPAC_BASES:
+            raise ValueError(f"Invalid base: {value}.")
+        self.bases.insert(index, ord(value))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.bases.decode("ascii"))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PackedDNASequence):
+            return self.bases == other.bases
+        elif isinstance(other, DNASequence):
+            return str(self) == str(other)
+        elif isinstance(other, str):
+            return str(self) == other.upper()
+        elif isinstance(other, Iterable):
+            # see comment in DNASequence.__contains__
+            other = cast(Iterable[str], other)
+            return str(self) == "".join(other).upper()
+        return False
+
+    def __str__(self) -> str:
+        return self.bases.decode("ascii")
+
+    def __add__(self, value: Iterable[str]) -> "PackedDNASequence":
+        result = PackedDNASequence(self, unsafe=True)
+        result.bases += self._convert_bytes(value)
+        return result
+
+    def __iadd__(self, value: Iterable[str]) -> Self:
+        self.bases += self._convert_bytes(value)
+        return self
+
+    def __radd__(self, value: Iterable[str]) -> "PackedDNASequence":
+        return PackedDNASequence(value) + self
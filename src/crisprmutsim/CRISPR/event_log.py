@@ -0,0 +1,170 @@
+from array import array
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from typing import Any
+
+from crisprmutsim.CRISPR.simulation.events.crispr_event import ICRISPREvent
+from crisprmutsim.CRISPR.simulation.events.deletion import Deletion
+from crisprmutsim.CRISPR.simulation.events.insertion import Insertion
+from crisprmutsim.CRISPR.simulation.events.insertion_deletion import (
+    InsertionDeletion,
+)
+from crisprmutsim.CRISPR.simulation.events.mutation import Mutation
+
+# integer fields per event type, in column order. new_base is stored as its ASCII code,
+#   optional fields with their defaults (split index -1, block length 1)
+EVENT_FIELDS: dict[str, tuple[str, ...]] = {
+    "Mutation": ("repeat_index", "base_index", "new_base"),
+    "Insertion": ("copy_index", "insertion_index"),
+    "Deletion": ("repeat_index", "split_index", "block_deletion_length"),
+    "InsertionDeletion": (
+        "copy_index",
+        "insertion_index",
+        "deletion_repeat_index",
+        "deletion_split_index",
+    ),
+}
+# stored in the database: never renumber
+EVENT_TYPE_CODES: dict[str, int] = {
+    "Mutation": 0,
+    "Insertion": 1,
+    "Deletion": 2,
+    "InsertionDeletion": 3,
+}
+
+_EVENT_CLASSES: dict[str, type[Any]] = {
+    "Mutation": Mutation,
+    "Insertion": Insertion,
+    "Deletion": Deletion,
+    "InsertionDeletion": InsertionDeletion,
+}
+
+_TO_FIELDS: dict[str, Callable[[Mapping[str, Any]], tuple[int, ...]]] = {
+    "Mutation": lambda actions: (
+        actions["repeat_index"],
+        actions["base_index"],
+        ord(actions["new_base"]),
+    ),
+    "Insertion": lambda actions: (actions["copy_index"], actions["insertion_index"]),
+    "Deletion": lambda actions: (
+        actions["repeat_index"],
+        actions.get("split_index", -1),
+        actions.get("block_deletion_length", 1),
+    ),
+    "InsertionDeletion": lambda actions: (
+        actions["copy_index"],
+        actions["insertion_index"],
+        actions["deletion_repeat_index"],
+        actions.get("deletion_split_index", -1),
+    ),
+}
+
+
+class EventColumns:
+    """Events of one type: run index, position in the run, time and the int fields."""
+
+    __slots__ = ("run_indices", "seqs", "times", "fields")
+
+    def __init__(self, num_fields: int) -> None:
+        self.run_indices = array("q")
+        self.seqs = array("q")
+        self.times = array("d")
+        self.fields = [array("q") for _ in range(num_fields)]
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def rows(self) -> Iterator[tuple[Any, ...]]:
+        return zip(self.run_indices, self.seqs, self.times, *self.fields)
+
+    def extend(self, other: "EventColumns") -> None:
+        self.run_indices.extend(other.run_indices)
+        self.seqs.extend(other.seqs)
+        self.times.extend(other.times)
+        for column, other_column in zip(self.fields, other.fields):
+            column.extend(other_column)
+
+
+class EventLog:
+    """
+    Event histories of any number of runs, as one set of columns per event type.
+
+    record() consumes a run's event stream and stores each event's time and integer
+    fields; events() rebuilds a run's events in order. The columns map one to one to
+    the per-type event tables of the result database.
+    """
+
+    def __init__(self) -> None:
+        self.columns = {
+            name: EventColumns(len(fields)) for name, fields in EVENT_FIELDS.items()
+        }
+
+    def record(self, run_index: int, events: Iterable[ICRISPREvent]) -> int:
+        # bound appends per type, built once per run rather than per event
+        appends = {
+            name: (
+                columns.seqs.append,
+                columns.times.append,
+                [column.append for column in columns.fields],
+                _TO_FIELDS[name],
+            )
+            for name, columns in self.columns.items()
+        }
+        counts = dict.fromkeys(self.columns, 0)
+        seq = 0
+        try:
+            for event in events:
+                name = event.__class__.__name__
+                if name not in appends:
+                    raise ValueError(f"Cannot record events of type {name}")
+                seq_append, time_append, field_appends, to_fields = appends[name]
+                # before any append: a malformed event leaves no partial row
+                fields = to_fields(event.actions)
+                seq_append(seq)
+                time_append(event.time)
+                for append, value in zip(field_appends, fields):
+                    append(value)
+                counts[name] += 1
+                seq += 1
+        finally:
+            # the run index column, filled last
+            for name, count in counts.items():
+                self.columns[name].run_indices.extend([run_index] * count)
+        return seq
+
+    def add_rows(self, name: str, rows: Iterable[Iterable[Any]]) -> None:
+        target = self.columns[name]
+        for run_index, seq, time, *fields in rows:
+            target.run_indices.append(run_index)
+            target.seqs.append(seq)
+            target.times.append(time)
+            for column, value in zip(target.fields, fields):
+                column.append(value)
+
+    def extend(self, other: "EventLog") -> None:
+        for name, columns in self.columns.items():
+            columns.extend(other.columns[name])
+
+    def run_indices(self) -> set[int]:
+        return {
+            run_index
+            for columns in self.columns.values()
+            for run_index in columns.run_indices
+        }
+
+    def events(self, run_index: int) -> list[ICRISPREvent]:
+        numbered: list[tuple[int, ICRISPREvent]] = []
+        for name, columns in self.columns.items():
+            event_class = _EVENT_CLASSES[name]
+            keys = EVENT_FIELDS[name]
+            for row_run_index, seq, time, *fields in columns.rows():
+                if row_run_index != run_index:
+                    continue
+                actions = dict(zip(keys, fields))
+                if name == "Mutation":
+                    actions["new_base"] = chr(actions["new_base"])
+                numbered.append((seq, event_class(time, actions)))
+        numbered.sort(key=lambda item: item[0])
+        return [event for _, event in numbered]
+
+    def __len__(self) -> int:
+        return sum(len(columns) for columns in self.columns.values())
@@ -0,0 +1,230 @@
+from collections.abc import Iterable, Iterator
+from typing import overload
+
+import numpy as np
+import numpy.typing as npt
+
+from crisprmutsim.CRISPR.array_stats import ArrayStats
+from crisprmutsim.CRISPR.crispr_array_events import CRISPRArrayEvents
+from crisprmutsim.CRISPR.dna_sequence import DNASequence
+from crisprmutsim.CRISPR.matrix_stats import matrix_all_stats
+from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
+
+# spare rows kept free on each side of the active block
+MIN_SPARE_ROWS = 8
+
+
+class MatrixCRISPRArray(CRISPRArrayEvents):
+    """
+    Matrix-backed CRISPR array for the simulation hot loop.
+
+    Repeats are the rows of a 2-D uint8 buffer of ASCII base codes. The buffer keeps
+    spare rows at both ends, so insertions and deletions only shift the shorter side
+    of the array, and leader-side insertions reduce to an offset change.
+    Accepts the same events as RawCRISPRArray.
+    """
+
+    def __init__(
+        self, repeat_sequences: Iterable[Iterable[str]], unsafe: bool = False
+    ) -> None:
+        if isinstance(repeat_sequences, str) or isinstance(
+            repeat_sequences, DNASequence
+        ):
+            repeat_sequences = [repeat_sequences]
+
+        rows = [
+            ("".join(seq) if unsafe else str(DNASequence(seq))).encode("ascii")
+            for seq in repeat_sequences
+        ]
+        repeat_length = len(rows[0]) if rows else 0
+        if any(len(row) != repeat_length for row in rows):
+            raise ValueError("All repeats must have the same length.")
+
+        matrix = np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(
+            len(rows), repeat_length
+        )
+        self._init_buffer(matrix)
+
+    def _init_buffer(self, matrix: npt.NDArray[np.uint8]) -> None:
+        array_length, self.repeat_length = matrix.shape
+        spare = max(MIN_SPARE_ROWS, array_length // 2)
+        self._allocate(array_length + 2 * spare)
+        self._start = spare
+        self._stop = spare + array_length
+        self._buffer[self._start : self._stop] = matrix
+
+    def _allocate(self, capacity: int) -> None:
+        # single-base reads/writes go through the bytearray (cheaper than numpy scalars),
+        #   row shifts through a numpy view on the same memory
+        self._bytes = bytearray(capacity * self.repeat_length)
+        self._buffer = np.frombuffer(self._bytes, dtype=np.uint8).reshape(
+            capacity, self.repeat_length
+        )
+
+    @classmethod
+    def from_shape(
+        cls, array_length: int, repeat_length: int, base: str = "N"
+    ) -> "MatrixCRISPRArray":
+        array = cls.__new__(cls)
+        array._init_buffer(
+            np.full((array_length, repeat_length), ord(base), dtype=np.uint8)
+        )
+        return array
+
+    @classmethod
+    def from_matrix(cls, matrix: npt.NDArray[np.uint8]) -> "MatrixCRISPRArray":
+        array = cls.__new__(cls)
+        array._init_buffer(matrix)
+        return array
+
+    @classmethod
+    def from_raw_array(cls, raw_array: RawCRISPRArray) -> "MatrixCRISPRArray":
+        return cls(raw_array, unsafe=True)
+
+    def to_raw_array(
+        self, sequence_type: type[DNASequence] = DNASequence
+    ) -> RawCRISPRArray:
+        return RawCRISPRArray(
+            [list(row) for row in self], unsafe=True, sequence_type=sequence_type
+        )
+
+    # view on the active rows; writes go through to the array
+    @property
+    def matrix(self) -> npt.NDArray[np.uint8]:
+        return self._buffer[self._start : self._stop]
+
+    def all_stats(
+        self, min_line_length: int = 3, max_gap_length: int = 5
+    ) -> ArrayStats:
+        return matrix_all_stats(self.matrix, min_line_length, max_gap_length)
+
+    def _reserve(self, front: int, back: int) -> None:
+        # reallocate with at least `front`/`back` free rows before/after the active block
+        if self._start >= front and len(self._buffer) - self._stop >= back:
+            return
+        array_length = self._stop - self._start
+        spare = max(MIN_SPARE_ROWS, array_length // 2, front, back)
+        matrix = self.matrix
+        self._allocate(array_length + 2 * spare)
+        self._buffer[spare : spare + array_length] = matrix
+        self._start = spare
+        self._stop = spare + array_length
+
+    #####
+    # "Unsafe" event primitives; see CRISPRArrayEvents for event application
+    #####
+
+    def __unsafe_apply_mutation__(
+        self, repeat_index: int, base_index: int, new_base: str
+    ) -> None:
+        self._bytes[(self._start + repeat_index) * self.repeat_length + base_index] = (
+            ord(new_base)
+        )
+
+    # batch of mutations by flat (row-major) cell index; see MutationGenerator.generate_batch
+    def __unsafe_apply_mutation_batch__(
+        self, cells: npt.NDArray[np.intp], new_bases: npt.NDArray[np.uint8]
+    ) -> None:
+        self.matrix.reshape(-1)[cells] = new_bases
+
+    def __unsafe_apply_insertion__(self, copy_index: int, insertion_index: int) -> None:
+        buffer = self._buffer
+        row = buffer[self._start + copy_index].copy()
+
+        # shift whichever side is shorter
+        if insertion_index <= (self._stop - self._start) - insertion_index:
+            self._reserve(1, 0)
+            buffer = self._buffer
+            start = self._start
+            buffer[start - 1 : start - 1 + insertion_index] = buffer[
+                start : start + insertion_index
+            ]
+            self._start -= 1
+        else:
+            self._reserve(0, 1)
+            buffer = self._buffer
+            position = self._start + insertion_index
+            buffer[position + 1 : self._stop + 1] = buffer[position : self._stop]
+            self._stop += 1
+
+        buffer[self._start + insertion_index] = row
+
+    def __unsafe_apply_deletion__(self, repeat_index: int, block_length: int) -> None:
+        buffer = self._buffer
+        start = self._start
+        stop = self._stop
+        # shift whichever side is shorter
+        if repeat_index <= stop - start - repeat_index - block_length:
+            buffer[start + block_length : start + block_length + repeat_index] = buffer[
+                start : start + repeat_index
+            ]
+            self._start += block_length
+        else:
+            position = start + repeat_index
+            buffer[position : stop - block_length] = buffer[
+                position + block_length : stop
+            ]
+            self._stop -= block_length
+
+    def __unsafe_apply_split_deletion__(
+        self, repeat_index: int, split_index: int, block_length: int
+    ) -> None:
+        position = self._start + repeat_index
+        self._buffer[position, split_index:] = self._buffer[
+            position + block_length, split_index:
+        ]
+        self.__unsafe_apply_deletion__(repeat_index + 1, block_length)
+
+    #####
+    # Sequence interface
+    #####
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index: int | slice) -> str | list[str]:
+        if isinstance(index, slice):
+            return [row.tobytes().decode("ascii") for row in self.matrix[index]]
+        array_length = self._stop - self._start
+        if index < 0:
+            index += array_length
+        if index < 0 or index >= array_length:
+            raise IndexError("Repeat index out of bounds.")
+        offset = (self._start + index) * self.repeat_length
+        return self._bytes[offset : offset + self.repeat_length].decode("ascii")
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __iter__(self) -> Iterator[str]:
+        return (row.tobytes().decode("ascii") for row in self.matrix)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, MatrixCRISPRArray):
+            return np.array_equal(self.matrix, other.matrix)
+        if isinstance(other, str):
+            other = [other]
+        if isinstance(other, Iterable):
+            return list(self) == ["".join(seq).upper() for seq in other]
+        return False
+
+    __hash__ = None  # type: ignore[assignment]
+
+    # the numpy view does not survive pickling; rebuild it from the active rows
+    def __getstate__(self) -> tuple[bytes, int, int]:
+        return self.matrix.tobytes(), len(self), self.repeat_length
+
+    def __setstate__(self, state: tuple[bytes, int, int]) -> None:
+        data, array_length, repeat_length = state
+        self._init_buffer(
+            np.frombuffer(data, dtype=np.uint8).reshape(array_length, repeat_length)
+        )
+
+    def __str__(self) -> str:
+        return f"{list(self)}"
+
+    def __repr__(self) -> str:
+        return self.__str__()
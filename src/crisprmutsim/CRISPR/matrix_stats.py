@@ -0,0 +1,285 @@
+from collections.abc import Iterable, Sequence
+import random
+
+import numpy as np
+import numpy.typing as npt
+
+from crisprmutsim.CRISPR.array_stats import ArrayStats
+from crisprmutsim.CRISPR.dna_sequence import IUPAC_BASES
+from crisprmutsim.CRISPR.mutation_diff import MutationDiff
+
+# ASCII code -> index in IUPAC_BASES
+IUPAC_INDEX = np.zeros(256, dtype=np.uint8)
+IUPAC_INDEX[np.frombuffer(IUPAC_BASES.encode("ascii"), dtype=np.uint8)] = np.arange(
+    len(IUPAC_BASES), dtype=np.uint8
+)
+IUPAC_CODES = np.frombuffer(IUPAC_BASES.encode("ascii"), dtype=np.uint8)
+
+# count slot for padding rows, dropped after counting
+_PADDING_INDEX = len(IUPAC_BASES)
+
+
+def to_matrix(repeat_sequences: Iterable[Iterable[str]]) -> npt.NDArray[np.uint8]:
+    """Stack equal-length repeats into a 2-D uint8 matrix of ASCII base codes."""
+    rows = ["".join(seq).encode("ascii") for seq in repeat_sequences]
+    repeat_length = len(rows[0]) if rows else 0
+    if any(len(row) != repeat_length for row in rows):
+        raise ValueError("All repeats must have the same length.")
+    return np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(
+        len(rows), repeat_length
+    )
+
+
+def stack_matrices(
+    matrices: Sequence[npt.NDArray[np.uint8]],
+) -> tuple[npt.NDArray[np.uint8], npt.NDArray[np.intp]]:
+    """
+    Stack matrices of one repeat length into a zero-padded 3-D tensor of shape
+    (len(matrices), max array length, repeat_length), plus the array lengths.
+    """
+    lengths = np.array([len(matrix) for matrix in matrices], dtype=np.intp)
+    repeat_length = matrices[0].shape[1] if matrices else 0
+    if any(matrix.shape[1] != repeat_length for matrix in matrices):
+        raise ValueError("All matrices must have the same repeat length.")
+    tensor = np.zeros(
+        (len(matrices), int(lengths.max(initial=0)), repeat_length), dtype=np.uint8
+    )
+    for n, matrix in enumerate(matrices):
+        tensor[n, : len(matrix)] = matrix
+    return tensor, lengths
+
+
+def _valid_rows(
+    tensor: npt.NDArray[np.uint8], lengths: npt.NDArray[np.intp]
+) -> npt.NDArray[np.bool_]:
+    return np.arange(tensor.shape[1]) < lengths[:, None]
+
+
+def column_counts(
+    tensor: npt.NDArray[np.uint8], lengths: npt.NDArray[np.intp]
+) -> npt.NDArray[np.intp]:
+    """Per-column base counts of a padded tensor, shape (N, repeat_length, 15)."""
+    num_arrays, _, repeat_length = tensor.shape
+    slots = _PADDING_INDEX + 1
+    indices = IUPAC_INDEX[tensor]
+    indices[~_valid_rows(tensor, lengths)] = _PADDING_INDEX
+    columns = np.arange(num_arrays * repeat_length).reshape(
+        num_arrays, 1, repeat_length
+    )
+    counts = np.bincount(
+        (columns * slots + indices).ravel(),
+        minlength=num_arrays * repeat_length * slots,
+    )
+    return counts.reshape(num_arrays, repeat_length, slots)[..., :_PADDING_INDEX]
+
+
+def _tied_bases(counts: npt.NDArray[np.intp]) -> tuple[list[int], list[int]]:
+    # bases with the maximum count per column (flattened), in IUPAC_BASES order;
+    #   column k's candidates are tied[boundaries[k]:boundaries[k + 1]]
+    counts = counts.reshape(-1, len(IUPAC_BASES))
+    ties = counts == counts.max(axis=1, keepdims=True, initial=0)
+    tie_columns, tie_bases = np.nonzero(ties)
+    boundaries = np.zeros(len(counts) + 1, dtype=np.intp)
+    np.cumsum(np.bincount(tie_columns, minlength=len(counts)), out=boundaries[1:])
+    return tie_bases.tolist(), boundaries.tolist()
+
+
+def _choose_consensus(
+    tied: list[int], boundaries: list[int], first: int, last: int
+) -> npt.NDArray[np.uint8]:
+    # one random.choice() per column, also for columns without a tie
+    choices = [
+        random.choice(tied[boundaries[k] : boundaries[k + 1]])
+        for k in range(first, last)
+    ]
+    return IUPAC_CODES[choices]
+
+
+def consensus_codes(matrix: npt.NDArray[np.uint8]) -> npt.NDArray[np.uint8]:
+    """
+    Majority base per column, as ASCII codes.
+
+    Ties are broken with the global random module: one random.choice() per column
+    (also for columns without a tie) over the tied bases, in IUPAC_BASES order.
+    """
+    tensor = matrix[np.newaxis]
+    tied, boundaries = _tied_bases(
+        column_counts(tensor, np.array([len(matrix)], dtype=np.intp))
+    )
+    return _choose_consensus(tied, boundaries, 0, matrix.shape[1])
+
+
+def _mutation_diffs(
+    tensor: npt.NDArray[np.uint8], mask: npt.NDArray[np.bool_]
+) -> list[MutationDiff]:
+    # per array, column-major order, same as the original per-column scan
+    arrays, base_indices, repeat_indices = np.nonzero(mask.transpose(0, 2, 1))
+    diff = MutationDiff(
+        repeat_indices.astype(np.uint16).tobytes(),
+        base_indices.astype(np.uint16).tobytes(),
+        tensor[arrays, repeat_indices, base_indices].tobytes(),
+    )
+    boundaries = np.cumsum(np.bincount(arrays, minlength=len(tensor))).tolist()
+    return [diff[start:stop] for start, stop in zip([0] + boundaries, boundaries)]
+
+
+def mismatch_patterns(
+    mismatch: npt.NDArray[np.bool_],
+    lengths: npt.NDArray[np.intp],
+    min_line_length: int = 3,
+    max_gap_length: int = 5,
+) -> list[set[int]]:
+    """
+    Classify the mismatch "lines" (runs of consensus mismatches along each column)
+    of a padded (N, array_length, repeat_length) mask; padding rows must be False.
+
+    Lines in the same column are grouped unless separated by more than max_gap_length
+    repeats; each group is one pattern:
+        1: a single line of at least min_line_length, touching the first or last repeat
+        2: a single floating line of at least min_line_length
+        3: a split line, two lines with at least one of min_line_length
+        4: dotted, more than two lines
+        5: dotted in the first column
+        6: dotted in the last column
+    """
+    num_arrays, array_length, repeat_length = mismatch.shape
+    patterns: list[set[int]] = [set() for _ in range(num_arrays)]
+    padded = np.zeros((num_arrays, repeat_length, array_length + 2), dtype=np.int8)
+    padded[:, :, 1:-1] = mismatch.transpose(0, 2, 1)
+    edges = np.diff(padded, axis=2)
+    arrays, columns, starts = np.nonzero(edges == 1)
+    _, _, stops = np.nonzero(edges == -1)
+    if len(starts) == 0:
+        return patterns
+    line_lengths = stops - starts
+    keys = arrays * repeat_length + columns
+
+    # split lines into groups separated by large gaps;
+    #    each group represents an independent pattern
+    new_group = np.ones(len(starts), dtype=np.bool_)
+    new_group[1:] = (keys[1:] != keys[:-1]) | (starts[1:] - stops[:-1] > max_gap_length)
+    group_starts = np.flatnonzero(new_group)
+    group_sizes = np.diff(np.append(group_starts, len(starts)))
+    group_arrays = arrays[group_starts]
+    group_columns = columns[group_starts]
+    group_max_lengths = np.maximum.reduceat(line_lengths, group_starts)
+    first_starts = starts[group_starts]
+    first_stops = stops[group_starts]
+
+    dotted = group_sizes > 2
+    first_column = group_columns == 0
+    last_column = (group_columns == repeat_length - 1) & ~first_column
+    lines = (group_sizes == 1) & (group_max_lengths >= min_line_length)
+    anchored = (first_starts == 0) | (first_stops == lengths[group_arrays])
+    conditions = {
+        5: dotted & first_column,  # Dotted at first column (Pattern 5)
+        6: dotted & last_column,  # Pattern 5 at last column
+        4: dotted & ~first_column & ~last_column,  # Pattern 4
+        # Split Line (Pattern 3): at least one line must be long enough
+        3: (group_sizes == 2) & (group_max_lengths >= min_line_length),
+        1: lines & anchored,  # Line: starts at top or bottom (Pattern 1)
+        2: lines & ~anchored,  # Floating line (2 flips) (Pattern 2)
+    }
+    for pattern, condition in conditions.items():
+        for n in np.unique(group_arrays[condition]).tolist():
+            patterns[n].add(pattern)
+    return patterns
+
+
+def _tensor_all_stats(
+    tensor: npt.NDArray[np.uint8],
+    lengths: npt.NDArray[np.intp],
+    consensus: npt.NDArray[np.uint8],
+    min_line_length: int,
+    max_gap_length: int,
+) -> list[ArrayStats]:
+    num_arrays, _, repeat_length = tensor.shape
+    valid = _valid_rows(tensor, lengths)[:, :, np.newaxis]
+    last_rows = tensor[np.arange(num_arrays), lengths - 1][:, np.newaxis]
+    mismatch_consensus = (tensor != consensus[:, np.newaxis]) & valid
+    mismatch_proximal = (tensor != tensor[:, :1]) & valid
+    mismatch_distal = (tensor != last_rows) & valid
+
+    diffs_consensus = _mutation_diffs(tensor, mismatch_consensus)
+    diffs_proximal = _mutation_diffs(tensor, mismatch_proximal)
+    diffs_distal = _mutation_diffs(tensor, mismatch_distal)
+    patterns = mismatch_patterns(
+        mismatch_consensus, lengths, min_line_length, max_gap_length
+    )
+    return [
+        ArrayStats(
+            consensus_repeat=consensus[n].tobytes().decode("ascii"),
+            array_length=int(lengths[n]),
+            repeat_length=repeat_length,
+            mutation_diff_consensus=diffs_consensus[n],
+            mutation_diff_proximal=diffs_proximal[n],
+            mutation_diff_distal=diffs_distal[n],
+            mutation_count_consensus=len(diffs_consensus[n]),
+            mutation_count_proximal=len(diffs_proximal[n]),
+            mutation_count_distal=len(diffs_distal[n]),
+            patterns=patterns[n],
+        )
+        for n in range(num_arrays)
+    ]
+
+
+def batch_all_stats(
+    matrices: Sequence[npt.NDArray[np.uint8]],
+    min_line_length: int = 3,
+    max_gap_length: int = 5,
+) -> list[ArrayStats]:
+    """
+    ArrayStats for many arrays at once, in input order.
+
+    Arrays are grouped by repeat length and each group is padded into one 3-D tensor.
+    Consensus tie-breaking draws from the global random module in input order, so the
+    result is the same as calling matrix_all_stats() on each array in turn.
+    """
+    stats: list[ArrayStats | None] = [None] * len(matrices)
+    groups: dict[int, list[int]] = {}
+    for k, matrix in enumerate(matrices):
+        if len(matrix) == 0:
+            stats[k] = ArrayStats.empty()
+        else:
+            groups.setdefault(matrix.shape[1], []).append(k)
+
+    tensors = {
+        repeat_length: stack_matrices([matrices[k] for k in indices])
+        for repeat_length, indices in groups.items()
+    }
+    ties = {
+        repeat_length: _tied_bases(column_counts(tensor, lengths))
+        for repeat_length, (tensor, lengths) in tensors.items()
+    }
+    consensus = {
+        repeat_length: np.empty((len(indices), repeat_length), dtype=np.uint8)
+        for repeat_length, indices in groups.items()
+    }
+
+    # tie-breaking in input order, independent of the grouping
+    positions = {k: n for indices in groups.values() for n, k in enumerate(indices)}
+    for k, n in sorted(positions.items()):
+        repeat_length = matrices[k].shape[1]
+        tied, boundaries = ties[repeat_length]
+        consensus[repeat_length][n] = _choose_consensus(
+            tied, boundaries, n * repeat_length, (n + 1) * repeat_length
+        )
+
+    for repeat_length, indices in groups.items():
+        tensor, lengths = tensors[repeat_length]
+        group_stats = _tensor_all_stats(
+            tensor, lengths, consensus[repeat_length], min_line_length, max_gap_length
+        )
+        for k, array_stats in zip(indices, group_stats):
+            stats[k] = array_stats
+    return [array_stats for array_stats in stats if array_stats is not None]
+
+
+def matrix_all_stats(
+    matrix: npt.NDArray[np.uint8], min_line_length: int = 3, max_gap_length: int = 5
+) -> ArrayStats:
+    """
+    Consensus, mutation diffs and counts against the consensus, the first (proximal)
+    and the last (distal) repeat, and mismatch patterns, all in one pass.
+    """
+    return batch_all_stats([matrix], min_line_length, max_gap_length)[0]
@@ -0,0 +1,139 @@
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+import json
+import sys
+from typing import overload
+
+from crisprmutsim.CRISPR.simulation.events.mutation import MutationActions
+
+
+class MutationDiff(Sequence[MutationActions]):
+    """
+    Compact list of mutations against a reference repeat.
+
+    Stored as three parallel columns (repeat index, base index, ASCII code of the new
+    base) instead of one dict per mutation; indexing and iteration still yield
+    MutationActions dicts, and a MutationDiff compares equal to the equivalent list.
+    """
+
+    __slots__ = ("repeat_indices", "base_indices", "new_bases")
+
+    def __init__(
+        self,
+        repeat_indices: Iterable[int] = (),
+        base_indices: Iterable[int] = (),
+        new_bases: Iterable[int] = (),
+    ) -> None:
+        self.repeat_indices = array("H", repeat_indices)
+        self.base_indices = array("H", base_indices)
+        self.new_bases = array("B", new_bases)
+        if not (
+            len(self.repeat_indices) == len(self.base_indices) == len(self.new_bases)
+        ):
+            raise ValueError("All columns must have the same length.")
+
+    @classmethod
+    def from_actions(cls, actions: Iterable[MutationActions]) -> "MutationDiff":
+        diff = cls()
+        for action in actions:
+            diff.append(action)
+        return diff
+
+    @classmethod
+    def from_json(cls, json_str: str) -> "MutationDiff":
+        return cls.from_actions(json.loads(json_str))
+
+    def to_json(self) -> str:
+        return json.dumps(list(self))
+
+    # little-endian columns: repeat indices (u16), base indices (u16), new bases (u8)
+    def to_bytes(self) -> bytes:
+        repeat_indices = self.repeat_indices
+        base_indices = self.base_indices
+        if sys.byteorder == "big":
+            repeat_indices = array("H", repeat_indices)
+            base_indices = array("H", base_indices)
+            repeat_indices.byteswap()
+            base_indices.byteswap()
+        return (
+            repeat_indices.tobytes() + base_indices.tobytes() + self.new_bases.tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "MutationDiff":
+        length, remainder = divmod(len(data), 5)
+        if remainder != 0:
+            raise ValueError("Invalid mutation diff encoding.")
+        diff = cls.__new__(cls)
+        diff.__setstate__(
+            (data[: 2 * length], data[2 * length : 4 * length], data[4 * length :])
+        )
+        if sys.byteorder == "big":
+            diff.repeat_indices.byteswap()
+            diff.base_indices.byteswap()
+        return diff
+
+    def append(self, action: MutationActions) -> None:
+        self.repeat_indices.append(action["repeat_index"])
+        self.base_indices.append(action["base_index"])
+        self.new_bases.append(ord(action["new_base"]))
+
+    @overload
+    def __getitem__(self, index: int) -> MutationActions: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "MutationDiff": ...
+
+    def __getitem__(self, index: int | slice) -> "MutationActions | MutationDiff":
+        if isinstance(index, slice):
+            return MutationDiff(
+                self.repeat_indices[index],
+                self.base_indices[index],
+                self.new_bases[index],
+            )
+        return {
+            "repeat_index": self.repeat_indices[index],
+            "base_index": self.base_indices[index],
+            "new_base": chr(self.new_bases[index]),
+        }
+
+    def __len__(self) -> int:
+        return len(self.repeat_indices)
+
+    def __iter__(self) -> Iterator[MutationActions]:
+        for repeat_index, base_index, new_base in zip(
+            self.repeat_indices, self.base_indices, self.new_bases
+        ):
+            yield {
+                "repeat_index": repeat_index,
+                "base_index": base_index,
+                "new_base": chr(new_base),
+            }
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, MutationDiff):
+            return (
+                self.repeat_indices == other.repeat_indices
+                and self.base_indices == other.base_indices
+                and self.new_bases == other.new_bases
+            )
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __getstate__(self) -> tuple[bytes, bytes, bytes]:
+        return (
+            self.repeat_indices.tobytes(),
+            self.base_indices.tobytes(),
+            self.new_bases.tobytes(),
+        )
+
+    def __setstate__(self, state: tuple[bytes, bytes, bytes]) -> None:
+        self.repeat_indices = array("H", state[0])
+        self.base_indices = array("H", state[1])
+        self.new_bases = array("B", state[2])
+
+    def __repr__(self) -> str:
+        return f"MutationDiff({list(self)})"
@@ -0,0 +1,146 @@
+from collections.abc import Collection, Iterator, Sequence
+import math
+
+import numpy as np
+import numpy.typing as npt
+
+from crisprmutsim.CRISPR.matrix_crispr_array import MatrixCRISPRArray
+from crisprmutsim.CRISPR.simulation.events.crispr_event import (
+    ICRISPREvent,
+    ICRISPREventGenerator,
+)
+from crisprmutsim.CRISPR.simulation.events.mutation import (
+    ACGT_CODES,
+    MutationGenerator,
+)
+from crisprmutsim.simulation.event import EventParametersType, rate_dependencies
+from crisprmutsim.simulation.rng import IRandom, numpy_generator
+from crisprmutsim.simulation.simulation import select_by_rate
+
+# rates that only depend on these are constant while the array shape is
+SHAPE_DEPENDENCIES = frozenset({"array_length", "repeat_length"})
+# below this many expected mutations between structural events, the mutations are
+#   applied one by one (cheaper than evolve_mutations)
+SEQUENTIAL_MUTATIONS = 16.0
+
+
+def has_shape_only_rate(event_gen: object) -> bool:
+    dependencies = rate_dependencies(event_gen)
+    return dependencies is not None and dependencies <= SHAPE_DEPENDENCIES
+
+
+# samples the state of every base after `elapsed` time units of mutations, instead of
+#   the individual mutations. each base is redrawn uniformly from ACGT at a constant
+#   rate (MutationGenerator.redraw_rates), so it is redrawn at least once with
+#   probability p = 1 - e^(-rate * elapsed), and its end state is uniform if so.
+#   sparse: Binomial(bases, max p) candidate bases, each kept with p / max p; same
+#   distribution as one draw per base, O(candidates).
+#   `rates` are the generators' total rates, constant over the interval
+def evolve_mutations(
+    rng: np.random.Generator,
+    array: MatrixCRISPRArray,
+    mutation_generators: Sequence[MutationGenerator],
+    rates: Sequence[float],
+    elapsed: float,
+) -> None:
+    bases = array.matrix.reshape(-1)
+    if not mutation_generators or bases.size == 0:
+        return
+
+    def redraw_probabilities(codes: npt.NDArray[np.uint8]) -> npt.NDArray[np.float64]:
+        redraw_rate = sum(
+            event_gen.redraw_rates(codes, rate / bases.size)
+            for event_gen, rate in zip(mutation_generators, rates)
+        )
+        return -np.expm1(-redraw_rate * elapsed)
+
+    max_rate = sum(
+        event_gen.max_redraw_rate(rate / bases.size)
+        for event_gen, rate in zip(mutation_generators, rates)
+    )
+    max_probability = -math.expm1(-max_rate * elapsed)
+    count = int(rng.binomial(bases.size, max_probability))
+    if count == 0:
+        return
+    candidates = rng.choice(bases.size, size=count, replace=False)
+    redrawn = candidates[
+        rng.random(count) * max_probability < redraw_probabilities(bases[candidates])
+    ]
+    bases[redrawn] = ACGT_CODES[rng.integers(0, 4, size=len(redrawn))]
+
+
+# analytic engine (exact): structural (length-changing) events are simulated with the
+#   direct method over the structural generators alone. the mutations in between are
+#   resolved on the unchanged array shape before the next structural event is
+#   generated: a Poisson count of mutation events if there are few, evolve_mutations
+#   otherwise. mutation-only runs take O(bases) instead of O(events).
+#   exact as long as no rate changes between structural events: all rates must only
+#   depend on the array shape (float rates, the CRISPR rate converters).
+#   yields the structural events only
+def run_analytic(
+    rng: IRandom,
+    end_time: float,
+    array: MatrixCRISPRArray,
+    event_generators: Collection[
+        ICRISPREventGenerator[EventParametersType, ICRISPREvent]
+    ],
+) -> Iterator[ICRISPREvent]:
+    if len(event_generators) == 0:
+        raise ValueError("No event generators provided for simulation.")
+    if end_time <= 0:
+        raise ValueError("End time must be greater than 0.")
+    if not isinstance(array, MatrixCRISPRArray):
+        raise TypeError("The analytic engine requires a MatrixCRISPRArray.")
+
+    mutation_generators: list[MutationGenerator] = []
+    structural_generators: list[
+        ICRISPREventGenerator[EventParametersType, ICRISPREvent]
+    ] = []
+    for event_gen in event_generators:
+        if not has_shape_only_rate(event_gen):
+            raise ValueError(
+                "The analytic engine needs rates that only depend on the array shape."
+            )
+        if isinstance(event_gen, MutationGenerator):
+            mutation_generators.append(event_gen)
+        else:
+            structural_generators.append(event_gen)
+
+    np_rng = numpy_generator(rng)
+    current_time: float = 0.0
+
+    while True:
+        mutation_rates = [
+            event_gen.rate(current_time, array) for event_gen in mutation_generators
+        ]
+        structural_rates = [
+            event_gen.rate(current_time, array) for event_gen in structural_generators
+        ]
+        structural_rate = sum(structural_rates)
+        next_time = (
+            current_time + rng.expovariate(structural_rate)
+            if structural_rate > 0
+            else float("inf")
+        )
+
+        # mutations never change the rates: a Poisson count of them is exact as well
+        elapsed = min(next_time, end_time) - current_time
+        mutation_rate = sum(mutation_rates)
+        if mutation_rate * elapsed < SEQUENTIAL_MUTATIONS:
+            for _ in range(int(np_rng.poisson(mutation_rate * elapsed))):
+                index = select_by_rate(rng, mutation_rates, mutation_rate)
+                array.apply_events(
+                    [mutation_generators[index].generate(rng, current_time, array)]
+                )
+        else:
+            evolve_mutations(
+                np_rng, array, mutation_generators, mutation_rates, elapsed
+            )
+        if next_time > end_time:
+            break
+
+        current_time = next_time
+        index = select_by_rate(rng, structural_rates, structural_rate)
+        event = structural_generators[index].generate(rng, current_time, array)
+        array.apply_events([event])
+        yield event
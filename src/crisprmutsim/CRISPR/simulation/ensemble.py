@@ -0,0 +1,462 @@
+from collections.abc import Callable, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+from crisprmutsim.CRISPR.simulation.events.crispr_event import (
+    ICRISPREvent,
+    ICRISPREventGenerator,
+)
+from crisprmutsim.CRISPR.simulation.events.deletion import (
+    DeletionGenerator,
+    DeletionRateConverter,
+)
+from crisprmutsim.CRISPR.simulation.events.insertion import InsertionGenerator
+from crisprmutsim.CRISPR.simulation.events.insertion_deletion import (
+    InsertionDeletionGenerator,
+    InsertionDeletionRateConverter,
+)
+from crisprmutsim.CRISPR.simulation.events.mutation import (
+    ACGT_CODES,
+    ACGT_INDEX,
+    MutationGenerator,
+    MutationRateConverter,
+)
+from crisprmutsim.helpers import geometric_mean_alpha_batch
+from crisprmutsim.simulation.event import EventParametersType
+from crisprmutsim.simulation.rng import RandomBackend, make_rng, numpy_generator
+
+type Lengths = npt.NDArray[np.int64]
+
+# spare rows per replicate on allocation, at least
+MIN_SPARE_ROWS = 8
+# replicates simulated together by simulate_runs: run i is replicate
+#   i % ENSEMBLE_BLOCK_SIZE of block i // ENSEMBLE_BLOCK_SIZE, whatever the chunking.
+#   the last block only holds the runs below num_runs, so its results depend on the
+#   number of runs of the job (stored with the simulation info)
+ENSEMBLE_BLOCK_SIZE = 4096
+
+
+class Ensemble:
+    """
+    Replicate arrays of one repeat length, advanced together.
+
+    Replicate b is buffer[b, :lengths[b]]; rows past its length are padding. The
+    event primitives apply one event to each of a set of replicates at once, with the
+    same effect as the MatrixCRISPRArray primitives.
+    """
+
+    def __init__(
+        self, num_runs: int, array_length: int, repeat_length: int, base: str = "N"
+    ) -> None:
+        if repeat_length < 1:
+            raise ValueError("Repeat length must be at least 1.")
+        capacity = max(2 * array_length, array_length + MIN_SPARE_ROWS)
+        self._set_buffer(
+            np.full((num_runs, capacity, repeat_length), ord(base), dtype=np.uint8)
+        )
+        self.lengths = np.full(num_runs, array_length, dtype=np.int64)
+
+    def _set_buffer(self, buffer: npt.NDArray[np.uint8]) -> None:
+        self.buffer = buffer
+        # one opaque item per repeat: row gathers copy whole repeats at once
+        self._repeats = buffer.view(f"V{buffer.shape[2]}")[..., 0]
+
+    @property
+    def repeat_length(self) -> int:
+        return self.buffer.shape[2]
+
+    def matrices(self) -> list[npt.NDArray[np.uint8]]:
+        return [self.buffer[b, :length] for b, length in enumerate(self.lengths)]
+
+    def _reserve(self, rows: int) -> None:
+        num_runs, capacity, repeat_length = self.buffer.shape
+        if rows <= capacity:
+            return
+        buffer = np.zeros(
+            (num_runs, max(rows, 2 * capacity), repeat_length), dtype=np.uint8
+        )
+        buffer[:, :capacity] = self.buffer
+        self._set_buffer(buffer)
+
+    # one mutation per replicate
+    def mutate(
+        self,
+        replicas: Lengths,
+        repeat_indices: Lengths,
+        base_indices: Lengths,
+        new_bases: npt.NDArray[np.uint8],
+    ) -> None:
+        self.buffer[replicas, repeat_indices, base_indices] = new_bases
+
+    # one insertion per replicate: copy of row copy_indices (before the insertion)
+    #   at insertion_indices
+    def insert(
+        self, replicas: Lengths, copy_indices: Lengths, insertion_indices: Lengths
+    ) -> None:
+        # rows past the longest array after the insertion are left as they are
+        stop = int(self.lengths[replicas].max()) + 1
+        self._reserve(stop)
+        rows = np.arange(stop)
+        insertion = insertion_indices[:, None]
+        source = np.where(
+            rows < insertion,
+            rows,
+            np.where(rows == insertion, copy_indices[:, None], rows - 1),
+        )
+        self._repeats[replicas, :stop] = self._repeats[replicas[:, None], source]
+        self.lengths[replicas] += 1
+
+    # one deletion per replicate: block_lengths rows from repeat_indices; with a split
+    #   index >= 0, the repeat keeps its bases before the split and takes the rest from
+    #   the repeat after the block, as in __unsafe_apply_split_deletion__
+    def delete(
+        self,
+        replicas: Lengths,
+        repeat_indices: Lengths,
+        split_indices: Lengths,
+        block_lengths: Lengths,
+    ) -> None:
+        split = split_indices >= 0
+        if split.any():
+            split_replicas = replicas[split]
+            kept = repeat_indices[split]
+            merged = kept + block_lengths[split]
+            columns = np.arange(self.repeat_length) >= split_indices[split][:, None]
+            self.buffer[split_replicas, kept] = np.where(
+                columns,
+                self.buffer[split_replicas, merged],
+                self.buffer[split_replicas, kept],
+            )
+
+        # rows past the longest array before the deletion are padding
+        stop = int(self.lengths[replicas].max())
+        rows = np.arange(stop)
+        first_deleted = (repeat_indices + split)[:, None]
+        source = np.where(rows < first_deleted, rows, rows + block_lengths[:, None])
+        np.minimum(source, stop - 1, out=source)
+        self._repeats[replicas, :stop] = self._repeats[replicas[:, None], source]
+        self.lengths[replicas] -= block_lengths
+
+
+#####
+# Vectorized counterparts of the built-in generators
+#####
+
+
+def _uniform_int(rng: np.random.Generator, low: Lengths, high: Lengths) -> Lengths:
+    # one uniform integer in [low, high] per entry, like Random.randint
+    return low + (rng.random(len(low)) * (high - low + 1)).astype(np.int64)
+
+
+def _rate_function(
+    event_gen: ICRISPREventGenerator[EventParametersType, ICRISPREvent],
+) -> Callable[[Lengths, int], npt.NDArray[np.float64]]:
+    rate = event_gen._rate
+    if not callable(rate):
+        constant = float(rate)
+        return lambda lengths, repeat_length: np.full(len(lengths), constant)
+    if isinstance(rate, MutationRateConverter):
+        per_base = rate.mutation_rate_per_base
+        return lambda lengths, repeat_length: per_base * lengths * repeat_length
+    if isinstance(rate, DeletionRateConverter):
+        per_repeat = rate.deletion_rate_per_repeat
+        return lambda lengths, repeat_length: per_repeat * lengths
+    if isinstance(rate, InsertionDeletionRateConverter):
+        per_repeat = rate.indel_rate_per_repeat
+        return lambda lengths, repeat_length: per_repeat * lengths
+    raise ValueError(
+        "The ensemble engine supports float rates and the CRISPR rate converters only."
+    )
+
+
+def _insertion_indices(
+    rng: np.random.Generator,
+    lengths: Lengths,
+    anchor: str,
+    randomize: str,
+    exp_lambda_factor: float,
+    min_distal_index: int,
+) -> Lengths:
+    # vectorized insertion_index_sampler
+    match randomize, anchor:
+        case "none", "proximal":
+            return np.zeros(len(lengths), dtype=np.int64)
+        case "none", _:  # distal
+            return lengths.copy()
+        case "uniform", "proximal":
+            return _uniform_int(rng, np.zeros_like(lengths), lengths - 1)
+        case "uniform", _:  # distal
+            return _uniform_int(rng, np.full_like(lengths, min_distal_index), lengths)
+        case _:  # exponential
+            with np.errstate(divide="ignore"):
+                distances = rng.standard_exponential(len(lengths)) / (
+                    exp_lambda_factor * lengths
+                )
+            distances = np.minimum(distances, lengths).astype(np.int64)
+            if anchor == "proximal":
+                return np.maximum(np.minimum(distances, lengths - 1), 0)
+            return np.maximum(lengths - distances, min_distal_index)
+
+
+def _split_indices(
+    rng: np.random.Generator, count: int, split_offset: int, repeat_length: int
+) -> Lengths:
+    if split_offset < 0 or split_offset > repeat_length - 1:
+        return np.full(count, -1, dtype=np.int64)
+    return split_offset + (rng.random(count) * (repeat_length - split_offset)).astype(
+        np.int64
+    )
+
+
+class _MutationKernel:
+    def __init__(self, event_gen: MutationGenerator) -> None:
+        self.rates = _rate_function(event_gen)
+        self.allow_same_base = event_gen.parameters.get("allow_same_base", False)
+
+    def apply(
+        self, rng: np.random.Generator, ensemble: Ensemble, replicas: Lengths
+    ) -> None:
+        count = len(replicas)
+        repeat_indices = (rng.random(count) * ensemble.lengths[replicas]).astype(
+            np.int64
+        )
+        base_indices = (rng.random(count) * ensemble.repeat_length).astype(np.int64)
+        new = (rng.random(count) * 4).astype(np.int64)
+        if not self.allow_same_base:
+            current = ACGT_INDEX[
+                ensemble.buffer[replicas, repeat_indices, base_indices]
+            ].astype(np.int64)
+            # uniform over the other three bases; uniform over ACGT from anything else
+            other = (rng.random(count) * 3).astype(np.int64)
+            other += other >= current
+            new = np.where(current < 4, other, new)
+        ensemble.mutate(replicas, repeat_indices, base_indices, ACGT_CODES[new])
+
+
+class _InsertionKernel:
+    def __init__(self, event_gen: InsertionGenerator) -> None:
+        self.rates = _rate_function(event_gen)
+        self.anchor = event_gen.parameters.get("anchor", "proximal")
+        self.randomize = event_gen.parameters.get("randomize", "none")
+        self.exp_lambda_factor = event_gen.parameters.get("exp_lambda_factor", 0.1)
+
+    def apply(
+        self, rng: np.random.Generator, ensemble: Ensemble, replicas: Lengths
+    ) -> None:
+        insertion_indices = _insertion_indices(
+            rng,
+            ensemble.lengths[replicas],
+            self.anchor,
+            self.randomize,
+            self.exp_lambda_factor,
+            min_distal_index=0,
+        )
+        # copy_index is always 0, see InsertionGenerator
+        ensemble.insert(replicas, np.zeros_like(replicas), insertion_indices)
+
+
+class _DeletionKernel:
+    def __init__(self, event_gen: DeletionGenerator) -> None:
+        self.base_rates = _rate_function(event_gen)
+        self.leader_offset = event_gen.parameters.get("leader_offset", 0)
+        self.distal_offset = event_gen.parameters.get("distal_offset", 0)
+        self.split_offset = event_gen.parameters.get("split_offset", -1)
+        self.mean_block_deletion_length = event_gen.parameters.get(
+            "mean_block_deletion_length", 1.0
+        )
+
+    def rates(self, lengths: Lengths, repeat_length: int) -> npt.NDArray[np.float64]:
+        return np.where(
+            lengths - self.distal_offset - 2 <= self.leader_offset,
+            0.0,
+            self.base_rates(lengths, repeat_length),
+        )
+
+    def apply(
+        self, rng: np.random.Generator, ensemble: Ensemble, replicas: Lengths
+    ) -> None:
+        count = len(replicas)
+        lengths = ensemble.lengths[replicas]
+        repeat_indices = _uniform_int(
+            rng,
+            np.full(count, self.leader_offset, dtype=np.int64),
+            lengths - self.distal_offset - 2,
+        )
+        split_indices = _split_indices(
+            rng, count, self.split_offset, ensemble.repeat_length
+        )
+        max_block_lengths = (
+            lengths - repeat_indices - self.distal_offset - (split_indices >= 0)
+        )
+        block_lengths = np.minimum(
+            geometric_mean_alpha_batch(rng, self.mean_block_deletion_length, count),
+            max_block_lengths,
+        )
+        ensemble.delete(replicas, repeat_indices, split_indices, block_lengths)
+
+
+class _InsertionDeletionKernel:
+    def __init__(self, event_gen: InsertionDeletionGenerator) -> None:
+        self.base_rates = _rate_function(event_gen)
+        self.anchor = event_gen.parameters.get("insertion_anchor", "proximal")
+        self.randomize = event_gen.parameters.get("insertion_randomize", "none")
+        self.exp_lambda_factor = event_gen.parameters.get(
+            "insertion_exp_lambda_factor", 0.1
+        )
+        self.leader_offset = event_gen.parameters.get("leader_offset", 0)
+        self.distal_offset = event_gen.parameters.get("distal_offset", 0)
+        self.split_offset = event_gen.parameters.get("split_offset", -1)
+
+    # also 0 at length leader_offset + distal_offset + 1, where the generator would
+    #   draw the deleted repeat from an empty range
+    def rates(self, lengths: Lengths, repeat_length: int) -> npt.NDArray[np.float64]:
+        return np.where(
+            self.leader_offset + self.distal_offset + 1 >= lengths,
+            0.0,
+            self.base_rates(lengths, repeat_length),
+        )
+
+    def apply(
+        self, rng: np.random.Generator, ensemble: Ensemble, replicas: Lengths
+    ) -> None:
+        count = len(replicas)
+        lengths = ensemble.lengths[replicas]
+        insertion_indices = _insertion_indices(
+            rng,
+            lengths,
+            self.anchor,
+            self.randomize,
+            self.exp_lambda_factor,
+            min_distal_index=1,
+        )
+        copy_indices = (
+            insertion_indices if self.anchor == "proximal" else insertion_indices - 1
+        )
+        repeat_indices = _uniform_int(
+            rng,
+            np.full(count, self.leader_offset, dtype=np.int64),
+            lengths - self.distal_offset - 2,
+        )
+        split_indices = _split_indices(
+            rng, count, self.split_offset, ensemble.repeat_length
+        )
+
+        ensemble.insert(replicas, copy_indices, insertion_indices)
+        # the insertion shifts the deleted repeat if it was inserted before it
+        repeat_indices += repeat_indices >= insertion_indices
+        ensemble.delete(
+            replicas, repeat_indices, split_indices, np.ones_like(repeat_indices)
+        )
+
+
+type _Kernel = (
+    _MutationKernel | _InsertionKernel | _DeletionKernel | _InsertionDeletionKernel
+)
+
+
+def _kernel(
+    event_gen: ICRISPREventGenerator[EventParametersType, ICRISPREvent],
+) -> _Kernel:
+    if isinstance(event_gen, MutationGenerator):
+        return _MutationKernel(event_gen)
+    if isinstance(event_gen, InsertionGenerator):
+        return _InsertionKernel(event_gen)
+    if isinstance(event_gen, DeletionGenerator):
+        return _DeletionKernel(event_gen)
+    if isinstance(event_gen, InsertionDeletionGenerator):
+        return _InsertionDeletionKernel(event_gen)
+    raise ValueError(
+        f"The ensemble engine does not support {event_gen.__class__.__name__}."
+    )
+
+
+# direct method for num_runs replicates in lock-step: each step draws the next event
+#   of every replicate still running, with NumPy calls over the whole batch (one
+#   waiting time per replicate from its total rate, then the generator, then the
+#   event's actions, per generator). replicates drop out once past end_time.
+#   same process as the scalar engines, different random numbers
+def simulate_ensemble(
+    rng: np.random.Generator,
+    end_time: float,
+    array_length: int,
+    repeat_length: int,
+    event_generators: Sequence[
+        ICRISPREventGenerator[EventParametersType, ICRISPREvent]
+    ],
+    num_runs: int,
+) -> Ensemble:
+    if len(event_generators) == 0:
+        raise ValueError("No event generators provided for simulation.")
+    if end_time <= 0:
+        raise ValueError("End time must be greater than 0.")
+
+    kernels = [_kernel(event_gen) for event_gen in event_generators]
+    ensemble = Ensemble(num_runs, array_length, repeat_length)
+    times = np.zeros(num_runs)
+    running = np.arange(num_runs)
+
+    while len(running) > 0:
+        lengths = ensemble.lengths[running]
+        cumulative_rates = np.cumsum(
+            np.stack(
+                [kernel.rates(lengths, repeat_length) for kernel in kernels], axis=1
+            ),
+            axis=1,
+        )
+        total_rates = cumulative_rates[:, -1]
+
+        with np.errstate(divide="ignore"):
+            next_times = (
+                times[running] + rng.standard_exponential(len(running)) / total_rates
+            )
+        # no events left (total rate 0: infinite waiting time) or past end_time
+        still_running = next_times <= end_time
+        running = running[still_running]
+        times[running] = next_times[still_running]
+        cumulative_rates = cumulative_rates[still_running]
+        total_rates = total_rates[still_running]
+
+        # first generator whose cumulative rate exceeds the threshold
+        thresholds = rng.random(len(running)) * total_rates
+        chosen = np.sum(cumulative_rates <= thresholds[:, None], axis=1)
+        np.minimum(chosen, len(kernels) - 1, out=chosen)
+        for index, kernel in enumerate(kernels):
+            replicas = running[chosen == index]
+            if len(replicas) > 0:
+                kernel.apply(rng, ensemble, replicas)
+
+    return ensemble
+
+
+# final matrices of the given runs of a job of num_runs runs, in order; each block
+#   holding one of them is simulated once, from the random stream of its block index
+def simulate_runs(
+    base_seed: int,
+    run_indices: Sequence[int],
+    num_runs: int,
+    end_time: float,
+    array_length: int,
+    repeat_length: int,
+    event_generators: Sequence[
+        ICRISPREventGenerator[EventParametersType, ICRISPREvent]
+    ],
+    rng_backend: RandomBackend = "random",
+) -> list[npt.NDArray[np.uint8]]:
+    blocks: dict[int, list[npt.NDArray[np.uint8]]] = {}
+    matrices: list[npt.NDArray[np.uint8]] = []
+    for run_index in run_indices:
+        if not 0 <= run_index < num_runs:
+            raise ValueError(f"Run index {run_index} out of range for {num_runs} runs.")
+        block_index, replicate = divmod(run_index, ENSEMBLE_BLOCK_SIZE)
+        if block_index not in blocks:
+            blocks[block_index] = simulate_ensemble(
+                numpy_generator(make_rng(rng_backend, base_seed, block_index)),
+                end_time,
+                array_length,
+                repeat_length,
+                event_generators,
+                min(ENSEMBLE_BLOCK_SIZE, num_runs - block_index * ENSEMBLE_BLOCK_SIZE),
+            ).matrices()
+        matrices.append(blocks[block_index][replicate])
+    return matrices
@@ -1,17 +1,17 @@
-from collections.abc import Callable
-from random import Random
+from collections.abc import Callable, Sequence
 from typing import TYPE_CHECKING, Literal, Protocol
 
 from crisprmutsim.simulation.event import (
     Event,
     EventActionsType,
     EventParametersType,
+    IAcceptsEvents,
     IEvent,
     IEventGenerator,
 )
+from crisprmutsim.simulation.rng import IRandom
 
 if TYPE_CHECKING:
-    from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
     from crisprmutsim.CRISPR.simulation.events.mutation import Mutation
     from crisprmutsim.CRISPR.simulation.events.insertion import Insertion
     from crisprmutsim.CRISPR.simulation.events.deletion import Deletion
@@ -24,6 +24,14 @@ class ICRISPREvent(IEvent, Protocol):
     __crispr_event__: Literal[True]  # phantom type
 
 
+# what generators and rate converters need from an array, regardless of its storage
+#   (e.g. RawCRISPRArray, MatrixCRISPRArray)
+class ICRISPRArray(IAcceptsEvents[ICRISPREvent], Protocol):
+    def __len__(self) -> int: ...
+
+    def __getitem__(self, index: int, /) -> Sequence[str]: ...
+
+
 # thin implementation for inheritance
 class CRISPREvent[TEventActions: EventActionsType](Event[TEventActions]):
     __crispr_event__: Literal[True]
@@ -31,33 +39,54 @@ class CRISPREvent[TEventActions: EventActionsType](Event[TEventActions]):
 
 class ICRISPREventGenerator[
     TEventParameters: EventParametersType, TIEvent: ICRISPREvent
-](IEventGenerator[TEventParameters, TIEvent, "RawCRISPRArray"], Protocol): ...
+](IEventGenerator[TEventParameters, TIEvent, ICRISPRArray], Protocol): ...
 
 
 # thin implementation for inheritance
 class CRISPREventGenerator[
     TEventParameters: EventParametersType, TIEvent: ICRISPREvent
 ]:
-    def rate(self, current_time: float, obj: "RawCRISPRArray") -> float:
+    def rate(self, current_time: float, obj: ICRISPRArray) -> float:
         if callable(self._rate):
             return self._rate(current_time, obj)
         return self._rate
 
+    # see simulation.event.rate_dependencies; "array_length" and/or "repeat_length"
+    @property
+    def rate_dependencies(self) -> frozenset[str] | None:
+        if callable(self._rate):
+            return getattr(self._rate, "rate_dependencies", None)
+        return frozenset()
+
     def generate(
-        self, rng: Random, current_time: float, obj: "RawCRISPRArray"
+        self, rng: IRandom, current_time: float, obj: ICRISPRArray
     ) -> TIEvent: ...
 
     def __init__(
         self,
         parameters: TEventParameters,
-        rate: float | Callable[[float, "RawCRISPRArray"], float],
+        rate: float | Callable[[float, ICRISPRArray], float],
     ) -> None:
         self.parameters = parameters
         self._rate = rate
         self._verify_parameters()
+        self._compile()
 
     def _verify_parameters(self) -> None: ...
 
+    # precompute whatever generate() needs from the parameters (values, sampling
+    #   closures), once instead of per event. parameters are read-only afterwards
+    def _compile(self) -> None: ...
+
+    # compiled closures do not pickle; they are rebuilt from the parameters
+    def __getstate__(self) -> dict[str, object]:
+        return {"parameters": self.parameters, "_rate": self._rate}
+
+    def __setstate__(self, state: dict[str, object]) -> None:
+        self.parameters = state["parameters"]  # type: ignore
+        self._rate = state["_rate"]  # type: ignore
+        self._compile()
+
 
 def crispr_event_from_tuple(
     data: tuple[str, int, str, float, str],
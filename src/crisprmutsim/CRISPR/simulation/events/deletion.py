@@ -1,14 +1,14 @@
-from random import Random
-from typing import NotRequired, TypedDict, TYPE_CHECKING
+from functools import partial
+import json
+from typing import NotRequired, TypedDict
 
-from crisprmutsim.helpers import geometric_mean_alpha
-
-if TYPE_CHECKING:
-    from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
+from crisprmutsim.helpers import geometric_mean_alpha, geometric_sampler
 from crisprmutsim.CRISPR.simulation.events.crispr_event import (
     CRISPREvent,
     CRISPREventGenerator,
+    ICRISPRArray,
 )
+from crisprmutsim.simulation.rng import IRandom
 
 
 class DeletionParameters(TypedDict):
@@ -16,6 +16,9 @@ class DeletionParameters(TypedDict):
     distal_offset: NotRequired[int]  # .
     split_offset: NotRequired[int]  # default -1 = no splits
     mean_block_deletion_length: NotRequired[float]  # SpacerPlacer "alpha"
+    # default false; true: one draw per trial for the block length (old draw sequence,
+    #   to reproduce existing results)
+    legacy_block_length_sampling: NotRequired[bool]
 
 
 class DeletionActions(TypedDict):
@@ -24,7 +27,8 @@ class DeletionActions(TypedDict):
     block_deletion_length: NotRequired[int]  # default 1
 
 
-class Deletion(CRISPREvent[DeletionActions]): ...
+class Deletion(CRISPREvent[DeletionActions]):
+    invalidates = frozenset({"array_length"})
 
 
 class DeletionGenerator(CRISPREventGenerator[DeletionParameters, Deletion]):
@@ -46,28 +50,44 @@ class DeletionGenerator(CRISPREventGenerator[DeletionParameters, Deletion]):
         if mean_block_deletion_length < 1.0:
             raise ValueError(f"mean_block_deletion_length must be at least 1.0")
 
-    def rate(self, current_time: float, obj: "RawCRISPRArray") -> float:
-        array_len = len(obj)
-        leader_offset = self.parameters.get("leader_offset", 0)
-        distal_offset = self.parameters.get("distal_offset", 0)
+    def _compile(self) -> None:
+        self._leader_offset = self.parameters.get("leader_offset", 0)
+        self._distal_offset = self.parameters.get("distal_offset", 0)
+        self._split_offset = self.parameters.get("split_offset", -1)
+        mean_block_deletion_length = self.parameters.get(
+            "mean_block_deletion_length", 1.0
+        )
+        legacy = self.parameters.get("legacy_block_length_sampling", False)
+        # always stored (see event_generators_to_json): generators written without
+        #   the flag predate it and sampled the legacy way, see with_legacy_sampling
+        self.parameters = {**self.parameters, "legacy_block_length_sampling": legacy}
+        if legacy:
+            self._block_length = partial(
+                geometric_mean_alpha, alpha=mean_block_deletion_length
+            )
+        else:
+            self._block_length = geometric_sampler(mean_block_deletion_length)
 
-        if array_len - distal_offset - 2 <= leader_offset:
+    def rate(self, current_time: float, obj: ICRISPRArray) -> float:
+        if len(obj) - self._distal_offset - 2 <= self._leader_offset:
             return 0.0
 
         return super().rate(current_time, obj)
 
+    @property
+    def rate_dependencies(self) -> frozenset[str] | None:
+        # the offsets make the rate depend on the array length
+        dependencies = super().rate_dependencies
+        return None if dependencies is None else dependencies | {"array_length"}
+
     def generate(
-        self, rng: Random, current_time: float, obj: "RawCRISPRArray"
+        self, rng: IRandom, current_time: float, obj: ICRISPRArray
     ) -> Deletion:
         array_len = len(obj)
-        leader_offset = self.parameters.get("leader_offset", 0)
-        distal_offset = self.parameters.get("distal_offset", 0)
-        split_offset = self.parameters.get("split_offset", -1)
-        mean_block_deletion_length = self.parameters.get(
-            "mean_block_deletion_length", 1.0
-        )
+        distal_offset = self._distal_offset
+        split_offset = self._split_offset
 
-        repeat_idx = rng.randint(leader_offset, array_len - distal_offset - 2)
+        repeat_idx = rng.randint(self._leader_offset, array_len - distal_offset - 2)
 
         split_idx = -1
         if split_offset >= 0:
@@ -80,7 +100,7 @@ class DeletionGenerator(CRISPREventGenerator[DeletionParameters, Deletion]):
         else:
             max_block_deletion_length = array_len - repeat_idx - distal_offset
 
-        block_len = geometric_mean_alpha(rng, mean_block_deletion_length)
+        block_len = self._block_length(rng)
         block_len = min(block_len, max_block_deletion_length)
 
         return Deletion(
@@ -93,12 +113,24 @@ class DeletionGenerator(CRISPREventGenerator[DeletionParameters, Deletion]):
         )
 
 
+# generator JSON (see event_generators_to_json) with the legacy sampling set on the
+#   deletion generators written before legacy_block_length_sampling existed
+def with_legacy_sampling(json_str: str) -> str:
+    entries = json.loads(json_str)
+    for entry in entries:
+        if entry["type"] == DeletionGenerator.__name__:
+            entry["parameters"].setdefault("legacy_block_length_sampling", True)
+    return json.dumps(entries)
+
+
 # picklable callable, for multithreading
 class DeletionRateConverter:
+    rate_dependencies = frozenset({"array_length"})
+
     def __init__(self, deletion_rate_per_repeat: float):
         self.deletion_rate_per_repeat = deletion_rate_per_repeat
 
-    def __call__(self, current_time: float, obj: "RawCRISPRArray") -> float:
+    def __call__(self, current_time: float, obj: ICRISPRArray) -> float:
         if not obj or len(obj) < 1:
             return 0.0
 
@@ -1,12 +1,12 @@
-from random import Random
-from typing import Literal, NotRequired, TypedDict, TYPE_CHECKING
+from collections.abc import Callable
+from typing import Literal, NotRequired, TypedDict
 
-if TYPE_CHECKING:
-    from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
 from crisprmutsim.CRISPR.simulation.events.crispr_event import (
     CRISPREvent,
     CRISPREventGenerator,
+    ICRISPRArray,
 )
+from crisprmutsim.simulation.rng import IRandom
 
 
 class InsertionParameters(TypedDict):
@@ -20,34 +20,48 @@ class InsertionActions(TypedDict):
     insertion_index: int
 
 
-class Insertion(CRISPREvent[InsertionActions]): ...
+class Insertion(CRISPREvent[InsertionActions]):
+    invalidates = frozenset({"array_length"})
+
+
+# insertion index for an array of the given length, specialized once per generator;
+#   draws the same random numbers as branching on the parameters per event.
+#   min_distal_index: lowest index a randomized distal insertion can use
+def insertion_index_sampler(
+    anchor: str, randomize: str, exp_lambda_factor: float, min_distal_index: int = 0
+) -> Callable[[IRandom, int], int]:
+    match randomize, anchor:
+        case "none", "proximal":
+            return lambda rng, array_len: 0
+        case "none", _:  # distal
+            return lambda rng, array_len: array_len
+        case "uniform", "proximal":
+            return lambda rng, array_len: rng.randint(0, array_len - 1)
+        case "uniform", _:  # distal
+            return lambda rng, array_len: rng.randint(min_distal_index, array_len)
+        case _, "proximal":  # exponential
+            return lambda rng, array_len: min(
+                int(rng.expovariate(exp_lambda_factor * array_len)), array_len - 1
+            )
+        case _:  # exponential, distal
+            return lambda rng, array_len: max(
+                min_distal_index,
+                array_len - int(rng.expovariate(exp_lambda_factor * array_len)),
+            )
 
 
 class InsertionGenerator(CRISPREventGenerator[InsertionParameters, Insertion]):
+    def _compile(self) -> None:
+        self._insertion_index = insertion_index_sampler(
+            self.parameters.get("anchor", "proximal"),
+            self.parameters.get("randomize", "none"),
+            self.parameters.get("exp_lambda_factor", 0.1),
+        )
+
     def generate(
-        self, rng: Random, current_time: float, obj: "RawCRISPRArray"
+        self, rng: IRandom, current_time: float, obj: ICRISPRArray
     ) -> Insertion:
-        anchor = self.parameters.get("anchor", "proximal")
-        randomize = self.parameters.get("randomize", "none")
-        exp_lambda_factor = self.parameters.get("exp_lambda_factor", 0.1)
-
-        if randomize == "none":
-            if anchor == "proximal":
-                insertion_index = 0
-            else:  # distal
-                insertion_index = len(obj)
-        elif randomize == "uniform":
-            if anchor == "proximal":
-                insertion_index = rng.randint(0, len(obj) - 1)
-            else:  # distal
-                insertion_index = rng.randint(0, len(obj))
-        else:  # exponential
-            distance = int(rng.expovariate(exp_lambda_factor * len(obj)))
-
-            if anchor == "proximal":
-                insertion_index = min(distance, len(obj) - 1)
-            else:  # distal
-                insertion_index = max(0, len(obj) - distance)
+        insertion_index = self._insertion_index(rng, len(obj))
 
         # which one???? need more research/testing
         # copy_index = insertion_index if anchor == "proximal" else insertion_index - 1
@@ -1,12 +1,12 @@
-from random import Random
-from typing import TYPE_CHECKING, Literal, NotRequired, TypedDict
+from typing import Literal, NotRequired, TypedDict
 
-if TYPE_CHECKING:
-    from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
 from crisprmutsim.CRISPR.simulation.events.crispr_event import (
     CRISPREvent,
     CRISPREventGenerator,
+    ICRISPRArray,
 )
+from crisprmutsim.CRISPR.simulation.events.insertion import insertion_index_sampler
+from crisprmutsim.simulation.rng import IRandom
 
 
 class InsertionDeletionParameters(TypedDict):
@@ -25,7 +25,9 @@ class InsertionDeletionActions(TypedDict):
     deletion_split_index: NotRequired[int]  # default -1
 
 
-class InsertionDeletion(CRISPREvent[InsertionDeletionActions]): ...
+# one repeat inserted, one deleted (or merged by a split): the length does not change
+class InsertionDeletion(CRISPREvent[InsertionDeletionActions]):
+    invalidates = frozenset[str]()
 
 
 class InsertionDeletionGenerator(
@@ -44,51 +46,44 @@ class InsertionDeletionGenerator(
         if split_offset < -1:
             raise ValueError(f"split_offset must be >= -1, got {split_offset}")
 
-    def rate(self, current_time: float, obj: "RawCRISPRArray") -> float:
-        leader_offset = self.parameters.get("leader_offset", 0)
-        distal_offset = self.parameters.get("distal_offset", 0)
-
-        if leader_offset + distal_offset >= len(obj):
+    def _compile(self) -> None:
+        insertion_anchor = self.parameters.get("insertion_anchor", "proximal")
+        self._insertion_index = insertion_index_sampler(
+            insertion_anchor,
+            self.parameters.get("insertion_randomize", "none"),
+            self.parameters.get("insertion_exp_lambda_factor", 0.1),
+            min_distal_index=1,
+        )
+        # proximal: the repeat at the insertion index, distal: the one before it
+        self._copy_offset = 0 if insertion_anchor == "proximal" else -1
+        self._leader_offset = self.parameters.get("leader_offset", 0)
+        self._distal_offset = self.parameters.get("distal_offset", 0)
+        self._split_offset = self.parameters.get("split_offset", -1)
+
+    def rate(self, current_time: float, obj: ICRISPRArray) -> float:
+        if self._leader_offset + self._distal_offset >= len(obj):
             return 0.0
 
         return super().rate(current_time, obj)
 
+    @property
+    def rate_dependencies(self) -> frozenset[str] | None:
+        # the offsets make the rate depend on the array length
+        dependencies = super().rate_dependencies
+        return None if dependencies is None else dependencies | {"array_length"}
+
     def generate(
-        self, rng: Random, current_time: float, obj: "RawCRISPRArray"
+        self, rng: IRandom, current_time: float, obj: ICRISPRArray
     ) -> InsertionDeletion:
         array_len = len(obj)
-        insertion_anchor = self.parameters.get("insertion_anchor", "proximal")
-        insertion_randomize = self.parameters.get("insertion_randomize", "none")
-        insertion_exp_lambda_factor = self.parameters.get(
-            "insertion_exp_lambda_factor", 0.1
-        )
-        leader_offset = self.parameters.get("leader_offset", 0)
-        distal_offset = self.parameters.get("distal_offset", 0)
-        split_offset = self.parameters.get("split_offset", -1)
+        split_offset = self._split_offset
 
-        if insertion_randomize == "none":
-            if insertion_anchor == "proximal":
-                insertion_index = 0
-            else:  # distal
-                insertion_index = len(obj)
-        elif insertion_randomize == "uniform":
-            if insertion_anchor == "proximal":
-                insertion_index = rng.randint(0, len(obj) - 1)
-            else:  # distal
-                insertion_index = rng.randint(1, len(obj))
-        else:  # exponential
-            distance = int(rng.expovariate(insertion_exp_lambda_factor * len(obj)))
-
-            if insertion_anchor == "proximal":
-                insertion_index = min(distance, len(obj) - 1)
-            else:  # distal
-                insertion_index = max(1, len(obj) - distance)
-
-        copy_index = (
-            insertion_index if insertion_anchor == "proximal" else insertion_index - 1
-        )
+        insertion_index = self._insertion_index(rng, array_len)
+        copy_index = insertion_index + self._copy_offset
 
-        repeat_idx = rng.randint(leader_offset, array_len - distal_offset - 2)
+        repeat_idx = rng.randint(
+            self._leader_offset, array_len - self._distal_offset - 2
+        )
 
         split_idx = -1
         if split_offset >= 0:
@@ -109,10 +104,12 @@ class InsertionDeletionGenerator(
 
 # picklable callable, for multithreading
 class InsertionDeletionRateConverter:
+    rate_dependencies = frozenset({"array_length"})
+
     def __init__(self, indel_rate_per_repeat: float):
         self.indel_rate_per_repeat = indel_rate_per_repeat
 
-    def __call__(self, current_time: float, obj: "RawCRISPRArray") -> float:
+    def __call__(self, current_time: float, obj: ICRISPRArray) -> float:
         if not obj or len(obj) < 1:
             return 0.0
         return self.indel_rate_per_repeat * len(obj)
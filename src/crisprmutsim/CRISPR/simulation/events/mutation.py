@@ -1,12 +1,19 @@
-from random import Random
-from typing import TYPE_CHECKING, NotRequired, TypedDict
+from typing import NotRequired, TypedDict
+
+import numpy as np
+import numpy.typing as npt
 
-if TYPE_CHECKING:
-    from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
 from crisprmutsim.CRISPR.simulation.events.crispr_event import (
     CRISPREvent,
     CRISPREventGenerator,
+    ICRISPRArray,
 )
+from crisprmutsim.simulation.rng import IRandom
+
+ACGT_CODES = np.frombuffer(b"ACGT", dtype=np.uint8)
+# position of a base code in ACGT_CODES; 4 for anything else (N, IUPAC codes)
+ACGT_INDEX = np.full(256, 4, dtype=np.uint8)
+ACGT_INDEX[ACGT_CODES] = np.arange(4, dtype=np.uint8)
 
 
 class MutationParameters(TypedDict):
@@ -19,33 +26,82 @@ class MutationActions(TypedDict):
     new_base: str
 
 
-class Mutation(CRISPREvent[MutationActions]): ...
+class Mutation(CRISPREvent[MutationActions]):
+    invalidates = frozenset[str]()
 
 
 class MutationGenerator(CRISPREventGenerator[MutationParameters, Mutation]):
+    def _compile(self) -> None:
+        self._allow_same_base = self.parameters.get("allow_same_base", False)
+        # bases a mutation can lead to, by current base; "ACGT" for any other base
+        self._new_bases = (
+            {}
+            if self._allow_same_base
+            else {base: "ACGT".replace(base, "") for base in "ACGT"}
+        )
+
     def generate(
-        self, rng: Random, current_time: float, obj: "RawCRISPRArray"
+        self, rng: IRandom, current_time: float, obj: ICRISPRArray
     ) -> Mutation:
-        allow_same_base = self.parameters.get("allow_same_base", False)
-
         repeat_idx = rng.randint(0, len(obj) - 1)
         repeat = obj[repeat_idx]
         base_idx = rng.randint(0, len(repeat) - 1)
-        choice = "ACGT" if allow_same_base else "ACGT".replace(repeat[base_idx], "")
-        base = rng.choice(choice)
+        base = rng.choice(self._new_bases.get(repeat[base_idx], "ACGT"))
         return Mutation(
             current_time,
             {"repeat_index": repeat_idx, "base_index": base_idx, "new_base": base},
         )
 
+    # `count` mutations at once on a matrix of ASCII base codes (tau-leaping):
+    #   returns the flat indices of the hit cells and their new base codes.
+    #   same distribution as applying `count` generate() events one after the other
+    def generate_batch(
+        self,
+        rng: np.random.Generator,
+        matrix: npt.NDArray[np.uint8],
+        count: int,
+    ) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.uint8]]:
+        cells, hits = np.unique(
+            rng.integers(0, matrix.size, size=count), return_counts=True
+        )
+        current = ACGT_INDEX[matrix.reshape(-1)[cells]]
+        # after the first hit the base is uniform over ACGT, except when starting from
+        #   ACGT without same-base mutations: that jump chain is back at its start
+        #   base after m hits with probability (1 + 3 * (-1/3)^m) / 4, and uniform over
+        #   the other three bases otherwise
+        new = rng.integers(0, 4, size=len(cells))
+        if not self._allow_same_base:
+            acgt = current < 4
+            stay = rng.random(len(cells)) < (1 + 3 * (-1 / 3) ** hits) / 4
+            other = rng.integers(0, 3, size=len(cells))
+            other += other >= current
+            new = np.where(acgt, np.where(stay, current, other), new)
+        return cells, ACGT_CODES[new]
+
+    # rate at which each of `bases` (ASCII codes) is redrawn uniformly from ACGT, for a
+    #   per-base mutation rate (analytic engine). without same-base mutations, an ACGT
+    #   base is redrawn at 4/3 the mutation rate, since a quarter of the redraws keep it
+    def redraw_rates(
+        self, bases: npt.NDArray[np.uint8], rate_per_base: float
+    ) -> npt.NDArray[np.float64]:
+        if self._allow_same_base:
+            return np.full(bases.shape, rate_per_base)
+        return np.where(ACGT_INDEX[bases] < 4, 4 / 3 * rate_per_base, rate_per_base)
+
+    def max_redraw_rate(self, rate_per_base: float) -> float:
+        if self._allow_same_base:
+            return rate_per_base
+        return 4 / 3 * rate_per_base
+
 
 # picklable callable, for multithreading
 class MutationRateConverter:
+    rate_dependencies = frozenset({"array_length", "repeat_length"})
 
     def __init__(self, mutation_rate_per_base: float):
         self.mutation_rate_per_base = mutation_rate_per_base
 
-    def __call__(self, current_time: float, obj: "RawCRISPRArray") -> float:
+    def __call__(self, current_time: float, obj: ICRISPRArray) -> float:
         if not obj or not obj[0]:
             return 0.0
         return self.mutation_rate_per_base * len(obj) * len(obj[0])
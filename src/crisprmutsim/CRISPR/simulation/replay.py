@@ -0,0 +1,119 @@
+from collections.abc import Iterator, Mapping
+import json
+from typing import Any
+
+from crisprmutsim.CRISPR.matrix_crispr_array import MatrixCRISPRArray
+from crisprmutsim.CRISPR.simulation.ensemble import simulate_runs
+from crisprmutsim.CRISPR.simulation.events.crispr_event import (
+    ICRISPREvent,
+    ICRISPREventGenerator,
+)
+from crisprmutsim.CRISPR.simulation.events.deletion import (
+    DeletionGenerator,
+    DeletionRateConverter,
+    with_legacy_sampling,
+)
+from crisprmutsim.CRISPR.simulation.events.insertion import InsertionGenerator
+from crisprmutsim.CRISPR.simulation.events.insertion_deletion import (
+    InsertionDeletionGenerator,
+    InsertionDeletionRateConverter,
+)
+from crisprmutsim.CRISPR.simulation.events.mutation import (
+    MutationGenerator,
+    MutationRateConverter,
+)
+from crisprmutsim.CRISPR.simulation.simulation import (
+    RECORDING_ENGINES,
+    run_crispr_poisson_process,
+)
+from crisprmutsim.simulation.event import EventParametersType
+from crisprmutsim.simulation.rng import make_rng
+
+_GENERATOR_CLASSES: dict[str, type[Any]] = {
+    cls.__name__: cls
+    for cls in [
+        MutationGenerator,
+        InsertionGenerator,
+        DeletionGenerator,
+        InsertionDeletionGenerator,
+    ]
+}
+_RATE_CONVERTER_CLASSES: dict[str, type[Any]] = {
+    cls.__name__: cls
+    for cls in [
+        MutationRateConverter,
+        DeletionRateConverter,
+        InsertionDeletionRateConverter,
+    ]
+}
+
+
+# inverse of event_generators_to_json, for the built-in generators and rate converters;
+#   deletion generators written before legacy_block_length_sampling get the legacy sampling
+def event_generators_from_json(
+    json_str: str,
+) -> list[ICRISPREventGenerator[EventParametersType, ICRISPREvent]]:
+    generators: list[ICRISPREventGenerator[EventParametersType, ICRISPREvent]] = []
+    for entry in json.loads(with_legacy_sampling(json_str)):
+        generator_class = _GENERATOR_CLASSES.get(entry["type"])
+        if generator_class is None:
+            raise ValueError(f"Unknown event generator type: {entry['type']}")
+
+        rate = entry["rate"]
+        if rate == "callable":
+            raise ValueError(
+                f"The rate of {entry['type']} was not stored (custom callable, or a file written before rate converters were stored)."
+            )
+        if isinstance(rate, dict):
+            converter_class = _RATE_CONVERTER_CLASSES.get(rate["type"])
+            if converter_class is None:
+                raise ValueError(f"Unknown rate converter type: {rate['type']}")
+            rate = converter_class(**rate["parameters"])
+
+        generators.append(generator_class(entry["parameters"], rate=rate))
+    return generators
+
+
+def replay(
+    info: Mapping[str, Any], run_index: int, until: float | None = None
+) -> tuple[MatrixCRISPRArray, Iterator[ICRISPREvent]]:
+    """
+    Re-simulate one run of a stored simulation (see load_simulation_info).
+
+    Returns the run's array and its events; the events are simulated lazily and
+    applied to the array as they are consumed. With until, the run stops at that
+    time: the events are the run's events up to until, the same as in the full run.
+    Stopping early needs one of the RECORDING_ENGINES; the other engines do not
+    yield every event, and the ensemble engine none (its array is returned in the
+    final state).
+    """
+    engine = info["engine"]
+    end_time = info["end_time"]
+    event_generators = event_generators_from_json(info["event_generators"])
+    if until is not None:
+        if engine not in RECORDING_ENGINES:
+            raise ValueError(
+                f"Replaying up to a time needs one of the engines {', '.join(RECORDING_ENGINES)}."
+            )
+        end_time = min(end_time, until)
+
+    if engine == "ensemble":
+        (matrix,) = simulate_runs(
+            info["base_seed"],
+            [run_index],
+            info["num_runs"],
+            end_time,
+            info["array_length"],
+            info["repeat_length"],
+            event_generators,
+            info["rng_backend"],
+        )
+        return MatrixCRISPRArray.from_matrix(matrix), iter(())
+
+    array = MatrixCRISPRArray.from_shape(info["array_length"], info["repeat_length"])
+    if end_time <= 0:
+        return array, iter(())
+    rng = make_rng(info["rng_backend"], info["base_seed"], run_index)
+    return array, run_crispr_poisson_process(
+        rng, end_time, array, event_generators, engine
+    )
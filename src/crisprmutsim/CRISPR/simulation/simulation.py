@@ -1,72 +1,374 @@
 from collections import deque
-from collections.abc import Callable, Collection, Iterator
-from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from collections.abc import Callable, Collection, Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import groupby
 from pathlib import Path
-from random import Random
+from typing import Literal
+import sqlite3
+import threading
+import time
 
 from crisprmutsim.CRISPR.array_stats import ArrayStats
 from crisprmutsim.CRISPR.crispr_array import CRISPRArray
-from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
+from crisprmutsim.CRISPR.dataset_stats import DatasetStatsAccumulator
+from crisprmutsim.CRISPR.event_log import EventLog
+from crisprmutsim.CRISPR.matrix_crispr_array import MatrixCRISPRArray
+from crisprmutsim.CRISPR.matrix_stats import batch_all_stats
+from crisprmutsim.CRISPR.simulation.analytic import run_analytic
+from crisprmutsim.CRISPR.simulation.ensemble import ENSEMBLE_BLOCK_SIZE, simulate_runs
 from crisprmutsim.CRISPR.simulation.events.crispr_event import (
+    ICRISPRArray,
     ICRISPREvent,
     ICRISPREventGenerator,
 )
+from crisprmutsim.CRISPR.simulation.events.deletion import (
+    DeletionGenerator,
+    with_legacy_sampling,
+)
+from crisprmutsim.CRISPR.simulation.tau_leaping import run_tau_leaping
 import crisprmutsim.CRISPR.storage as db
-from crisprmutsim.simulation.event import EventParametersType
-from crisprmutsim.simulation.simulation import run_poisson_process
+from crisprmutsim.simulation.event import EventParametersType, event_generators_to_json
+from crisprmutsim.simulation.rng import IRandom, RandomBackend, make_rng
+from crisprmutsim.simulation.simulation import run_direct_method, run_poisson_process
+
+# "first_reaction": one waiting time per generator and step (reference implementation)
+# "direct": one waiting time from the total rate, cached rates (see run_direct_method)
+#   both are exact, but consume the random numbers differently
+# "tau_leaping": mutations applied in batches (approximate, see run_tau_leaping);
+#   needs a MatrixCRISPRArray
+# "analytic": direct method over the structural events only, the mutations in between
+#   are resolved in one batch (exact, see run_analytic); needs a MatrixCRISPRArray
+# "ensemble": blocks of runs advanced together in NumPy (exact, see
+#   simulate_ensemble); built-in generators only, no event stream
+type SimulationEngine = Literal[
+    "first_reaction", "direct", "tau_leaping", "analytic", "ensemble"
+]
+# engines yielding every event, as needed for recording them (see EventLog)
+RECORDING_ENGINES: tuple[SimulationEngine, ...] = ("first_reaction", "direct")
 
 
 def run_crispr_poisson_process(
-    rng: Random,
+    rng: IRandom,
     end_time: float,
-    array: RawCRISPRArray,
+    array: ICRISPRArray,
     event_generators: Collection[
         ICRISPREventGenerator[EventParametersType, ICRISPREvent]
     ],
+    engine: SimulationEngine = "first_reaction",
 ) -> Iterator[ICRISPREvent]:
-    return run_poisson_process(rng, end_time, array, event_generators)
+    match engine:
+        case "first_reaction":
+            return run_poisson_process(rng, end_time, array, event_generators)
+        case "direct":
+            return run_direct_method(rng, end_time, array, event_generators)
+        case "tau_leaping":
+            return run_tau_leaping(
+                rng, end_time, array, event_generators  # type: ignore
+            )
+        case "analytic":
+            return run_analytic(rng, end_time, array, event_generators)  # type: ignore
+        case "ensemble":
+            raise ValueError(
+                "The ensemble engine simulates whole blocks of runs, see simulate_runs."
+            )
+        case _:
+            raise ValueError(f"Unknown simulation engine: {engine}")
 
 
-def run_single(
-    seed: int,
+def _simulate(
+    base_seed: int,
+    run_index: int,
     end_time: float,
     array_length: int,
     repeat_length: int,
     event_generators: list[ICRISPREventGenerator[EventParametersType, ICRISPREvent]],
-) -> tuple[int, ArrayStats]:
-    rng = Random(seed)
-    array = RawCRISPRArray([["N"] * repeat_length] * array_length, unsafe=True)
+    engine: SimulationEngine = "first_reaction",
+    rng_backend: RandomBackend = "random",
+    event_log: EventLog | None = None,
+    num_runs: int | None = None,
+) -> MatrixCRISPRArray:
+    if event_log is not None and engine not in RECORDING_ENGINES:
+        raise ValueError(
+            f"Recording events needs one of the engines {', '.join(RECORDING_ENGINES)}."
+        )
+    if engine == "ensemble":
+        # a run depends on the size of its block, see ENSEMBLE_BLOCK_SIZE
+        if num_runs is None:
+            raise ValueError("The ensemble engine needs the number of runs of the job.")
+        (matrix,) = simulate_runs(
+            base_seed,
+            [run_index],
+            num_runs,
+            end_time,
+            array_length,
+            repeat_length,
+            event_generators,
+            rng_backend,
+        )
+        return MatrixCRISPRArray.from_matrix(matrix)
+
+    rng = make_rng(rng_backend, base_seed, run_index)
+    array = MatrixCRISPRArray.from_shape(array_length, repeat_length)
     array.apply_events = array.__unsafe_apply_events__
 
-    # fast exhaust
-    deque(run_crispr_poisson_process(rng, end_time, array, event_generators), maxlen=0)
+    events = run_crispr_poisson_process(rng, end_time, array, event_generators, engine)
+    if event_log is not None:
+        event_log.record(run_index, events)
+    else:
+        # fast exhaust
+        deque(events, maxlen=0)
+    return array
+
+
+def run_single(
+    base_seed: int,
+    run_index: int,
+    end_time: float,
+    array_length: int,
+    repeat_length: int,
+    event_generators: list[ICRISPREventGenerator[EventParametersType, ICRISPREvent]],
+    engine: SimulationEngine = "first_reaction",
+    rng_backend: RandomBackend = "random",
+    num_runs: int | None = None,
+) -> tuple[int, ArrayStats]:
+    array = _simulate(
+        base_seed,
+        run_index,
+        end_time,
+        array_length,
+        repeat_length,
+        event_generators,
+        engine,
+        rng_backend,
+        num_runs=num_runs,
+    )
 
     # reduce pickle overhead; array can be reconstructed
-    return seed, array.all_stats()
+    return run_index, array.all_stats()
 
 
-def run_parallel(
+#####
+# Chunked execution: workers receive the event generators once (initializer),
+#   then run contiguous ranges of run indices and return the results per chunk
+#####
+
+# target wall time per chunk, see _chunk_size
+CHUNK_TARGET_SECONDS = 0.2
+# chunks per worker at least, to keep the workers balanced towards the end
+MIN_CHUNKS_PER_WORKER = 4
+# submitted but unfinished chunks per worker, bounds the memory for pending tasks
+TASKS_IN_FLIGHT_PER_WORKER = 2
+CANCEL_POLL_SECONDS = 0.5
+
+_worker_event_generators: list[
+    ICRISPREventGenerator[EventParametersType, ICRISPREvent]
+] = []
+
+
+def _init_worker(
+    event_generators: list[ICRISPREventGenerator[EventParametersType, ICRISPREvent]],
+) -> None:
+    global _worker_event_generators
+    _worker_event_generators = event_generators
+
+
+class ChunkResults(list[tuple[int, ArrayStats]]):
+    """A chunk's (run index, stats) results, with the runs' events if recorded."""
+
+    event_log: EventLog | None = None
+
+
+def _run_chunk(
     base_seed: int,
+    run_indices: Sequence[int],
     end_time: float,
     array_length: int,
     repeat_length: int,
     event_generators: list[ICRISPREventGenerator[EventParametersType, ICRISPREvent]],
-    num_runs: int,
-    num_workers: int = 4,
-) -> list[Future[tuple[int, ArrayStats]]]:
-    executor = ProcessPoolExecutor(max_workers=num_workers)
-    futures = [
-        executor.submit(
-            run_single,
-            base_seed + i,
+    engine: SimulationEngine = "first_reaction",
+    rng_backend: RandomBackend = "random",
+    record_events: bool = False,
+    num_runs: int | None = None,
+) -> ChunkResults:
+    event_log = EventLog() if record_events else None
+    if engine == "ensemble" and event_log is None:
+        if num_runs is None:
+            raise ValueError("The ensemble engine needs the number of runs of the job.")
+        matrices = simulate_runs(
+            base_seed,
+            run_indices,
+            num_runs,
             end_time,
             array_length,
             repeat_length,
             event_generators,
+            rng_backend,
         )
-        for i in range(num_runs)
-    ]
-    return futures
+    else:
+        matrices = [
+            _simulate(
+                base_seed,
+                run_index,
+                end_time,
+                array_length,
+                repeat_length,
+                event_generators,
+                engine,
+                rng_backend,
+                event_log,
+                num_runs,
+            ).matrix
+            for run_index in run_indices
+        ]
+    # same tie-breaking draws as one all_stats() per run, in run order
+    results = ChunkResults(zip(run_indices, batch_all_stats(matrices)))
+    results.event_log = event_log
+    return results
+
+
+def run_chunk(
+    base_seed: int,
+    run_indices: Sequence[int],
+    end_time: float,
+    array_length: int,
+    repeat_length: int,
+    engine: SimulationEngine = "first_reaction",
+    rng_backend: RandomBackend = "random",
+    record_events: bool = False,
+    num_runs: int | None = None,
+) -> ChunkResults:
+    """Run one chunk of run indices with the worker's event generators."""
+    return _run_chunk(
+        base_seed,
+        run_indices,
+        end_time,
+        array_length,
+        repeat_length,
+        _worker_event_generators,
+        engine,
+        rng_backend,
+        record_events,
+        num_runs,
+    )
+
+
+def _check_chunk_size(chunk_size: int | None) -> None:
+    if chunk_size is not None and chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {chunk_size}.")
+
+
+def _chunk_size(pilot_seconds: float, num_runs: int, num_workers: int) -> int:
+    by_time = int(CHUNK_TARGET_SECONDS / max(pilot_seconds, 1e-6))
+    by_balance = num_runs // (num_workers * MIN_CHUNKS_PER_WORKER)
+    return max(1, min(by_time, by_balance))
+
+
+def run_parallel(
+    base_seed: int,
+    end_time: float,
+    array_length: int,
+    repeat_length: int,
+    event_generators: list[ICRISPREventGenerator[EventParametersType, ICRISPREvent]],
+    num_runs: int,
+    num_workers: int = 4,
+    run_indices: Iterable[int] | None = None,
+    chunk_size: int | None = None,
+    cancel_event: threading.Event | None = None,
+    engine: SimulationEngine = "first_reaction",
+    rng_backend: RandomBackend = "random",
+    record_events: bool = False,
+) -> Iterator[ChunkResults]:
+    """
+    Run the simulations in chunks of run indices and yield each chunk's results
+    (run index, stats) as it completes.
+
+    Without chunk_size, the first run is timed in this process (and yielded first)
+    and the chunk size is chosen so a chunk takes about CHUNK_TARGET_SECONDS.
+    The ensemble engine ignores chunk_size: a chunk is the runs of one block, the
+    last block sized to the runs below num_runs.
+    With record_events, each chunk carries the events of its runs (event_log).
+    At most TASKS_IN_FLIGHT_PER_WORKER * num_workers chunks are submitted at a
+    time. Setting cancel_event stops the submission; the executor is always shut
+    down on return, cancelling the chunks not yet started.
+    """
+    _check_chunk_size(chunk_size)
+    # run_indices: runs to simulate, all of range(num_runs) by default
+    indices = list(range(num_runs) if run_indices is None else run_indices)
+
+    if engine == "ensemble":
+        chunks: Iterator[list[int]] = (
+            list(block)
+            for _, block in groupby(
+                indices, key=lambda run_index: run_index // ENSEMBLE_BLOCK_SIZE
+            )
+        )
+    else:
+        if chunk_size is None:
+            if not indices:
+                return
+            start = time.perf_counter()
+            pilot = _run_chunk(
+                base_seed,
+                indices[:1],
+                end_time,
+                array_length,
+                repeat_length,
+                event_generators,
+                engine,
+                rng_backend,
+                record_events,
+                num_runs,
+            )
+            chunk_size = _chunk_size(
+                time.perf_counter() - start, len(indices) - 1, num_workers
+            )
+            yield pilot
+            indices = indices[1:]
+
+        chunks = (
+            indices[start : start + chunk_size]
+            for start in range(0, len(indices), chunk_size)
+        )
+    max_in_flight = TASKS_IN_FLIGHT_PER_WORKER * num_workers
+    executor = ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_worker,
+        initargs=(event_generators,),
+    )
+    try:
+        pending: set[Future[ChunkResults]] = set()
+        while True:
+            while len(pending) < max_in_flight and (
+                cancel_event is None or not cancel_event.is_set()
+            ):
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.add(
+                    executor.submit(
+                        run_chunk,
+                        base_seed,
+                        chunk,
+                        end_time,
+                        array_length,
+                        repeat_length,
+                        engine,
+                        rng_backend,
+                        record_events,
+                        num_runs,
+                    )
+                )
+            if not pending or (cancel_event is not None and cancel_event.is_set()):
+                return
+
+            # timeout: check for cancellation while long chunks are running
+            done, pending = wait(
+                pending, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                yield future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
 
 
 def run_and_iter_results(
@@ -77,9 +379,14 @@ def run_and_iter_results(
     event_generators: list[ICRISPREventGenerator[EventParametersType, ICRISPREvent]],
     num_runs: int,
     num_workers: int = 4,
+    run_indices: Iterable[int] | None = None,
+    chunk_size: int | None = None,
+    cancel_event: threading.Event | None = None,
+    engine: SimulationEngine = "first_reaction",
+    rng_backend: RandomBackend = "random",
 ) -> Iterator[tuple[int, ArrayStats]]:
     print(f"Starting {num_workers} workers")
-    futures = run_parallel(
+    for results in run_parallel(
         base_seed,
         end_time,
         array_length,
@@ -87,10 +394,13 @@ def run_and_iter_results(
         event_generators,
         num_runs,
         num_workers,
-    )
-
-    for future in as_completed(futures):
-        yield future.result()
+        run_indices,
+        chunk_size,
+        cancel_event,
+        engine,
+        rng_backend,
+    ):
+        yield from results
 
 
 def run_and_store_results(
@@ -104,46 +414,199 @@ def run_and_store_results(
     meta: str = "",
     num_workers: int = 4,
     progress_callback: Callable[[int, int], None] | None = None,
+    commit_interval: int = 1000,
+    resume: bool = False,
+    chunk_size: int | None = None,
+    cancel_event: threading.Event | None = None,
+    engine: SimulationEngine = "first_reaction",
+    rng_backend: RandomBackend = "random",
+    record_events: bool = False,
+    store_aggregates: bool = False,
+    stats_accumulator: DatasetStatsAccumulator | None = None,
 ) -> None:
-    if Path(filename).exists():
-        raise FileExistsError(f"Database file {filename} already exists")
+    """
+    Run the simulation and stream the results into a database file.
 
-    arrays: list[CRISPRArray] = []
-    count = 0
-    for seed, stats in run_and_iter_results(
-        base_seed,
-        end_time,
-        array_length,
-        repeat_length,
-        event_generators,
-        num_runs,
-        num_workers,
-    ):
-        arrays.append(
-            CRISPRArray(
-                id=str(seed - base_seed),
-                cas_type="",
-                repeat_stats=stats,
-            )
+    Results are inserted as they complete and committed every commit_interval
+    runs, so memory use does not grow with num_runs and a crash only loses the
+    uncommitted batch. With resume, an existing file from the same simulation is
+    completed: only the runs missing from its arrays table are submitted.
+    Setting cancel_event stops the run early; finished results are kept.
+    With record_events, the events of every run are stored in the event tables
+    (see EventLog); this needs one of the RECORDING_ENGINES. With store_aggregates,
+    the aggregate tables for DatasetStats.from_aggregates are written as well.
+    A stats_accumulator gets every array as it completes (and the stored ones on
+    resume), for stats of the running simulation.
+    """
+    if record_events and engine not in RECORDING_ENGINES:
+        raise ValueError(
+            f"Recording events needs one of the engines {', '.join(RECORDING_ENGINES)}."
         )
-        count += 1
-        if count % 100 == 0:
-            print(f"Completed {count} / {num_runs} runs")
-        if progress_callback:
-            progress_callback(count, num_runs)
+    _check_chunk_size(chunk_size)
+    exists = Path(filename).exists()
+    if exists and not resume:
+        raise FileExistsError(f"Database file {filename} already exists")
 
     with db.database(filename) as con:
-        db.store_meta(con, "sim")
-        db.store_arrays(con, arrays)
-        db.store_simulation_info(
-            con,
+        db.set_wal_mode(con)
+        if exists:
+            event_generators = _resume_event_generators(con, event_generators)
+            _verify_simulation_info(
+                con,
+                base_seed,
+                end_time,
+                array_length,
+                repeat_length,
+                event_generators,
+                num_runs,
+                engine,
+                rng_backend,
+                record_events,
+            )
+            db.migrate(con)
+            if record_events:
+                db.delete_orphaned_events(con)
+            if store_aggregates and not db.has_aggregate_tables(con):
+                db.build_aggregates(con)
+            # ids are the run indices
+            done = {int(id) for id in db.load_array_ids(con)}
+            if stats_accumulator is not None:
+                for array in db.iter_arrays(con):
+                    stats_accumulator.add(array)
+        else:
+            db.store_meta(con, "sim")
+            db.store_simulation_info(
+                con,
+                base_seed,
+                end_time,
+                array_length,
+                repeat_length,
+                event_generators,
+                num_runs,
+                meta,
+                engine,
+                rng_backend,
+            )
+            db.create_arrays_table(con)
+            if record_events:
+                db.create_event_tables(con)
+            if store_aggregates:
+                db.create_aggregate_tables(con)
+            con.commit()
+            done = set()
+
+        run_indices = [i for i in range(num_runs) if i not in done]
+        if done:
+            print(f"Resuming: {len(done)} / {num_runs} runs already stored")
+
+        batch: list[CRISPRArray] = []
+        count = len(done)
+        print(f"Starting {num_workers} workers")
+        for results in run_parallel(
             base_seed,
             end_time,
             array_length,
             repeat_length,
             event_generators,
             num_runs,
-            meta,
+            num_workers,
+            run_indices,
+            chunk_size,
+            cancel_event,
+            engine,
+            rng_backend,
+            record_events,
+        ):
+            if results.event_log is not None:
+                db.insert_event_log(con, results.event_log)
+            for run_index, stats in results:
+                array = CRISPRArray(
+                    id=str(run_index),
+                    cas_type="",
+                    repeat_stats=stats,
+                )
+                batch.append(array)
+                if stats_accumulator is not None:
+                    stats_accumulator.add(array)
+                count += 1
+                if len(batch) >= commit_interval:
+                    db.insert_arrays(con, batch)
+                    con.commit()
+                    batch.clear()
+                if count % 100 == 0:
+                    print(f"Completed {count} / {num_runs} runs")
+                if progress_callback:
+                    progress_callback(count, num_runs)
+
+        db.insert_arrays(con, batch)
+
+    if cancel_event is not None and cancel_event.is_set():
+        print(f"Simulation cancelled after {count} / {num_runs} runs, db stored")
+    else:
+        print("Simulation complete and db stored")
+
+
+# the event generators to resume a file with: files written before
+#   legacy_block_length_sampling existed sampled deletion block lengths the legacy way,
+#   and the missing runs must too
+def _resume_event_generators(
+    con: sqlite3.Connection,
+    event_generators: list[ICRISPREventGenerator[EventParametersType, ICRISPREvent]],
+) -> list[ICRISPREventGenerator[EventParametersType, ICRISPREvent]]:
+    info = db.load_simulation_info(con)
+    if info is None or info["event_generators"] == with_legacy_sampling(
+        info["event_generators"]
+    ):
+        return event_generators
+    return [
+        (
+            DeletionGenerator(
+                {**gen.parameters, "legacy_block_length_sampling": True},
+                rate=gen._rate,
+            )
+            if isinstance(gen, DeletionGenerator)
+            else gen
         )
+        for gen in event_generators
+    ]
 
-    print("Simulation complete and db stored")
+
+def _verify_simulation_info(
+    con: sqlite3.Connection,
+    base_seed: int,
+    end_time: float,
+    array_length: int,
+    repeat_length: int,
+    event_generators: list[ICRISPREventGenerator[EventParametersType, ICRISPREvent]],
+    num_runs: int,
+    engine: SimulationEngine,
+    rng_backend: RandomBackend,
+    record_events: bool,
+) -> None:
+    info = db.load_simulation_info(con)
+    if info is None:
+        raise ValueError("Cannot resume: file has no simulation info")
+    info["record_events"] = db.has_event_tables(con)
+    info["event_generators"] = with_legacy_sampling(info["event_generators"])
+
+    expected = {
+        "base_seed": base_seed,
+        "end_time": end_time,
+        "array_length": array_length,
+        "repeat_length": repeat_length,
+        "event_generators": event_generators_to_json(event_generators),
+        "num_runs": num_runs,
+        "engine": engine,
+        "rng_backend": rng_backend,
+        "record_events": record_events,
+    }
+    # files written before the rate converters were serialized
+    if info["event_generators"] == event_generators_to_json(
+        event_generators, opaque_rates=True
+    ):
+        info["event_generators"] = expected["event_generators"]
+    mismatched = [key for key, value in expected.items() if info[key] != value]
+    if mismatched:
+        raise ValueError(
+            f"Cannot resume: simulation parameters differ ({', '.join(mismatched)})"
+        )
@@ -0,0 +1,111 @@
+from collections.abc import Collection, Iterator
+
+import numpy as np
+
+from crisprmutsim.CRISPR.matrix_crispr_array import MatrixCRISPRArray
+from crisprmutsim.CRISPR.simulation.events.crispr_event import (
+    ICRISPREvent,
+    ICRISPREventGenerator,
+)
+from crisprmutsim.CRISPR.simulation.events.mutation import MutationGenerator
+from crisprmutsim.simulation.event import EventParametersType
+from crisprmutsim.simulation.rng import IRandom, numpy_generator
+from crisprmutsim.simulation.simulation import select_by_rate
+
+# leap condition: expected structural (length-changing) events per leap, relative to
+#   the array length; bounds the relative change of the length-dependent rates
+LEAP_EPSILON = 0.03
+# below this many expected mutations per leap, leaping does not pay off: exact step
+MIN_LEAP_MUTATIONS = 10.0
+
+
+# tau-leaping (approximate): time advances in leaps of length tau, mutations within a
+#   leap are drawn as one Poisson count per mutation generator and applied in a batch.
+#   tau is chosen so that the array length changes little within a leap
+#   (LEAP_EPSILON); structural events that do occur are applied after the leap's
+#   mutations, at uniform times within the leap. When structural events are too
+#   frequent for a leap to cover MIN_LEAP_MUTATIONS mutations, a single exact step is
+#   taken instead (same random numbers as run_direct_method).
+#   only mutation-only runs are exact (one leap over the whole time span). Mutations
+#   applied in a leap are not yielded; structural events and exact steps are.
+def run_tau_leaping(
+    rng: IRandom,
+    end_time: float,
+    array: MatrixCRISPRArray,
+    event_generators: Collection[
+        ICRISPREventGenerator[EventParametersType, ICRISPREvent]
+    ],
+) -> Iterator[ICRISPREvent]:
+    if len(event_generators) == 0:
+        raise ValueError("No event generators provided for simulation.")
+    if end_time <= 0:
+        raise ValueError("End time must be greater than 0.")
+    if not isinstance(array, MatrixCRISPRArray):
+        raise TypeError("Tau-leaping requires a MatrixCRISPRArray.")
+
+    generators = list(event_generators)
+    is_mutation = [isinstance(event_gen, MutationGenerator) for event_gen in generators]
+    structural_generators = [
+        event_gen
+        for event_gen, mutation in zip(generators, is_mutation)
+        if not mutation
+    ]
+    # seeded on the first leap, so runs without leaps match the direct method
+    np_rng: np.random.Generator | None = None
+    current_time: float = 0.0
+
+    while current_time < end_time:
+        rates = [event_gen.rate(current_time, array) for event_gen in generators]
+        total_rate = sum(rates)
+        structural_rate = sum(
+            rate for rate, mutation in zip(rates, is_mutation) if not mutation
+        )
+        mutation_rate = total_rate - structural_rate
+
+        tau = end_time - current_time
+        if structural_rate > 0:
+            tau = min(tau, LEAP_EPSILON * max(len(array), 1) / structural_rate)
+
+        if mutation_rate * tau < MIN_LEAP_MUTATIONS:
+            if total_rate <= 0:
+                break
+            current_time += rng.expovariate(total_rate)
+            if current_time > end_time:
+                break
+            event = generators[select_by_rate(rng, rates, total_rate)].generate(
+                rng, current_time, array
+            )
+            array.apply_events([event])
+            yield event
+            continue
+
+        if np_rng is None:
+            np_rng = numpy_generator(rng)
+
+        for event_gen, rate, mutation in zip(generators, rates, is_mutation):
+            if mutation and rate > 0:
+                count = int(np_rng.poisson(rate * tau))
+                if count > 0:
+                    array.__unsafe_apply_mutation_batch__(
+                        *event_gen.generate_batch(  # type: ignore
+                            np_rng, array.matrix, count
+                        )
+                    )
+
+        if structural_rate > 0:
+            count = int(np_rng.poisson(structural_rate * tau))
+            for event_time in np.sort(current_time + tau * np_rng.random(count)):
+                rates = [
+                    event_gen.rate(float(event_time), array)
+                    for event_gen in structural_generators
+                ]
+                total_rate = sum(rates)
+                if total_rate <= 0:
+                    break
+                event = structural_generators[
+                    select_by_rate(rng, rates, total_rate)
+                ].generate(rng, float(event_time), array)
+                array.apply_events([event])
+                yield event
+
+        current_time += tau
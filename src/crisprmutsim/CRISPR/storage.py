@@ -1,15 +1,43 @@
-from collections.abc import Sequence
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import contextmanager
 import json
 import sqlite3 as db
 from typing import Any, Literal
 
+from crisprmutsim.CRISPR.array_stats import pattern_mask
 from crisprmutsim.CRISPR.crispr_array import CRISPRArray
+from crisprmutsim.CRISPR.dataset_stats import (
+    REFERENCES,
+    ArrayCounts,
+    DatasetStatsAccumulator,
+    MutationCounts,
+    Reference,
+    count_arrays,
+)
+from crisprmutsim.CRISPR.event_log import EVENT_FIELDS, EVENT_TYPE_CODES, EventLog
+from crisprmutsim.CRISPR.mutation_diff import MutationDiff
 from crisprmutsim.simulation.event import (
     IEventGenerator,
     event_generators_to_json,
 )
 
+# 1: mutation diffs and patterns as JSON text
+# 2: mutation diffs and patterns as binary BLOBs, see MutationDiff.to_bytes
+# 3: indexed pattern_mask column, see array_stats.pattern_mask
+# 4: index on the filter columns, arrays_summary table
+SCHEMA_VERSION = 4
+
+# the patterns of matrix_stats.mismatch_patterns
+PATTERNS = range(1, 7)
+
+# column types of CRISPRArray.as_flat_dict; registered once, the adapters are
+#   process-wide
+db.register_adapter(list, json.dumps)
+db.register_adapter(tuple, json.dumps)
+db.register_adapter(set, lambda s: bytes(sorted(s)))  # type: ignore
+db.register_adapter(MutationDiff, MutationDiff.to_bytes)
+
 
 def connect_file(filename: str) -> db.Connection:
     return db.connect(filename)
@@ -37,14 +65,15 @@ def store_meta(
         """
         CREATE TABLE meta (
         type TEXT,
-        info TEXT
+        info TEXT,
+        schema_version INTEGER
         ) STRICT;
         """
     )
 
     con.execute(
-        "INSERT INTO meta (type, info) VALUES (?, ?)",
-        (type, info),
+        "INSERT INTO meta (type, info, schema_version) VALUES (?, ?, ?)",
+        (type, info, SCHEMA_VERSION),
     )
 
 
@@ -56,9 +85,15 @@ def load_meta(con: db.Connection) -> dict[str, Any]:
     return {
         "type": row[0],
         "info": row[1],
+        # files written before schema versioning have no schema_version column
+        "schema_version": row[2] if len(row) > 2 else 1,
     }
 
 
+def get_schema_version(con: db.Connection) -> int:
+    return load_meta(con).get("schema_version", 1)
+
+
 def store_simulation_info(
     con: db.Connection,
     base_seed: int,
@@ -68,6 +103,8 @@ def store_simulation_info(
     event_generators: Sequence[IEventGenerator[Any, Any, Any]],
     num_runs: int,
     meta: str = "",
+    engine: str = "first_reaction",
+    rng_backend: str = "random",
 ) -> None:
     con.execute(
         """
@@ -78,13 +115,15 @@ def store_simulation_info(
         repeat_length INTEGER,
         event_generators TEXT,
         num_runs INTEGER,
-        meta TEXT
+        meta TEXT,
+        engine TEXT,
+        rng_backend TEXT
         ) STRICT;
         """
     )
 
     con.execute(
-        "INSERT INTO simulation_info (base_seed, end_time, array_length, repeat_length, event_generators, num_runs, meta) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        "INSERT INTO simulation_info (base_seed, end_time, array_length, repeat_length, event_generators, num_runs, meta, engine, rng_backend) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
         (
             base_seed,
             end_time,
@@ -93,6 +132,8 @@ def store_simulation_info(
             event_generators_to_json(event_generators),
             num_runs,
             meta,
+            engine,
+            rng_backend,
         ),
     )
 
@@ -111,14 +152,18 @@ def load_simulation_info(con: db.Connection) -> dict[str, Any] | None:
         "event_generators": row[4],
         "num_runs": row[5],
         "meta": row[6],
+        # files written before these options: first_reaction, random.Random
+        "engine": row[7] if len(row) > 7 else "first_reaction",
+        "rng_backend": row[8] if len(row) > 8 else "random",
     }
 
 
-def store_arrays(con: db.Connection, arrays: Sequence[CRISPRArray]) -> None:
-    db.register_adapter(list, json.dumps)
-    db.register_adapter(tuple, json.dumps)
-    db.register_adapter(set, lambda s: json.dumps(sorted(list(s))))  # type: ignore
+def set_wal_mode(con: db.Connection) -> None:
+    # readers are not blocked by a running simulation writing results
+    con.execute("PRAGMA journal_mode=WAL")
+
 
+def create_arrays_table(con: db.Connection) -> None:
     con.execute(
         """
         CREATE TABLE arrays (
@@ -131,19 +176,346 @@ def store_arrays(con: db.Connection, arrays: Sequence[CRISPRArray]) -> None:
         mutation_count_consensus INTEGER,
         mutation_count_proximal INTEGER,
         mutation_count_distal INTEGER,
-        mutation_diff_consensus TEXT,
-        mutation_diff_proximal TEXT,
-        mutation_diff_distal TEXT,
-        patterns TEXT
+        mutation_diff_consensus BLOB,
+        mutation_diff_proximal BLOB,
+        mutation_diff_distal BLOB,
+        patterns BLOB,
+        pattern_mask INTEGER
+        ) STRICT;
+        """
+    )
+    con.execute("CREATE INDEX arrays_pattern_mask ON arrays (pattern_mask)")
+    _create_filter_index(con)
+    _create_summary_table(con)
+
+
+def _create_filter_index(con: db.Connection) -> None:
+    con.execute(
+        "CREATE INDEX arrays_filter ON arrays (cas_type, array_length, repeat_length)"
+    )
+
+
+# row count and length ranges per cas type, kept up to date by insert_arrays:
+#   the filter ranges and cas types without a scan over the arrays
+def _create_summary_table(con: db.Connection) -> None:
+    con.execute(
+        """
+        CREATE TABLE arrays_summary (
+        cas_type TEXT PRIMARY KEY,
+        num_arrays INTEGER,
+        min_array_length INTEGER,
+        max_array_length INTEGER,
+        min_repeat_length INTEGER,
+        max_repeat_length INTEGER
         ) STRICT;
         """
     )
 
+
+def _update_summary(con: db.Connection, arrays: Sequence[CRISPRArray]) -> None:
+    summary: dict[str, list[int]] = {}
+    for array in arrays:
+        array_length = array.repeat_stats.array_length
+        repeat_length = array.repeat_stats.repeat_length
+        row = summary.get(array.cas_type)
+        if row is None:
+            summary[array.cas_type] = [
+                1,
+                array_length,
+                array_length,
+                repeat_length,
+                repeat_length,
+            ]
+            continue
+        row[0] += 1
+        row[1] = min(row[1], array_length)
+        row[2] = max(row[2], array_length)
+        row[3] = min(row[3], repeat_length)
+        row[4] = max(row[4], repeat_length)
+
+    con.executemany(
+        """INSERT INTO arrays_summary VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (cas_type) DO UPDATE SET
+        num_arrays = num_arrays + excluded.num_arrays,
+        min_array_length = min(min_array_length, excluded.min_array_length),
+        max_array_length = max(max_array_length, excluded.max_array_length),
+        min_repeat_length = min(min_repeat_length, excluded.min_repeat_length),
+        max_repeat_length = max(max_repeat_length, excluded.max_repeat_length)""",
+        [(cas_type, *row) for cas_type, row in summary.items()],
+    )
+
+
+def insert_arrays(con: db.Connection, arrays: Sequence[CRISPRArray]) -> None:
     con.executemany(
         """INSERT INTO arrays
-        VALUES (:id, :cas_type, :consensus_repeat, :array_length, :repeat_length, :mutation_count_consensus, :mutation_count_proximal, :mutation_count_distal, :mutation_diff_consensus, :mutation_diff_proximal, :mutation_diff_distal, :patterns)""",
-        [array.as_flat_dict() for array in arrays],
+        VALUES (:id, :cas_type, :consensus_repeat, :array_length, :repeat_length, :mutation_count_consensus, :mutation_count_proximal, :mutation_count_distal, :mutation_diff_consensus, :mutation_diff_proximal, :mutation_diff_distal, :patterns, :pattern_mask)""",
+        [
+            array.as_flat_dict()
+            | {"pattern_mask": pattern_mask(array.repeat_stats.patterns)}
+            for array in arrays
+        ],
     )
+    _update_summary(con, arrays)
+    if has_aggregate_tables(con):
+        insert_aggregates(con, arrays)
+
+
+def store_arrays(
+    con: db.Connection, arrays: Sequence[CRISPRArray], aggregates: bool = False
+) -> None:
+    create_arrays_table(con)
+    if aggregates:
+        create_aggregate_tables(con)
+    insert_arrays(con, arrays)
+
+
+# aggregate tables (optional): array and mutation counts per reference and filter
+#   group, see dataset_stats.count_arrays. insert_arrays keeps them up to date, and
+#   DatasetStats.from_aggregates builds the dataset stats from load_aggregates
+_AGGREGATE_GROUP = "cas_type, array_length, repeat_length, pattern_mask"
+
+
+def create_aggregate_tables(con: db.Connection) -> None:
+    con.execute(
+        """
+        CREATE TABLE agg_arrays (
+        reference TEXT,
+        cas_type TEXT,
+        array_length INTEGER,
+        repeat_length INTEGER,
+        pattern_mask INTEGER,
+        mutation_count INTEGER,
+        num_arrays INTEGER,
+        PRIMARY KEY (reference, cas_type, array_length, repeat_length, pattern_mask, mutation_count)
+        ) STRICT;
+        """
+    )
+    con.execute(
+        """
+        CREATE TABLE agg_mutations (
+        reference TEXT,
+        cas_type TEXT,
+        array_length INTEGER,
+        repeat_length INTEGER,
+        pattern_mask INTEGER,
+        repeat_index INTEGER,
+        base_index INTEGER,
+        num_mutations INTEGER,
+        PRIMARY KEY (reference, cas_type, array_length, repeat_length, pattern_mask, repeat_index, base_index)
+        ) STRICT;
+        """
+    )
+
+
+def has_aggregate_tables(con: db.Connection) -> bool:
+    row = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'agg_arrays'"
+    ).fetchone()
+    return row is not None
+
+
+def insert_aggregates(con: db.Connection, arrays: Sequence[CRISPRArray]) -> None:
+    for reference in REFERENCES:
+        array_counts, mutation_counts = count_arrays(arrays, reference)
+        con.executemany(
+            """INSERT INTO agg_arrays VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT DO UPDATE SET num_arrays = num_arrays + excluded.num_arrays""",
+            [(reference, *key, count) for key, count in array_counts.items()],
+        )
+        con.executemany(
+            """INSERT INTO agg_mutations VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT DO UPDATE SET num_mutations = num_mutations + excluded.num_mutations""",
+            [(reference, *key, count) for key, count in mutation_counts.items()],
+        )
+
+
+# aggregate tables for the arrays already stored
+def build_aggregates(con: db.Connection) -> None:
+    create_aggregate_tables(con)
+    cur = con.cursor()
+    # works according to docs, but typing is broken
+    cur.row_factory = db.Row  # type: ignore
+    cur.execute("SELECT * FROM arrays")
+    while rows := cur.fetchmany(MIGRATION_BATCH_SIZE):
+        insert_aggregates(con, [CRISPRArray.from_db_row(row) for row in rows])
+
+
+# the counts of the arrays matching the filter criteria, summed over the filter groups
+def load_aggregates(
+    con: db.Connection,
+    reference: Reference = "consensus",
+    min_array_length: int | None = None,
+    max_array_length: int | None = None,
+    min_repeat_length: int | None = None,
+    max_repeat_length: int | None = None,
+    cas_types: list[str] = [],
+    patterns_to_exclude: list[int] = [],
+) -> tuple[ArrayCounts, MutationCounts]:
+    where_clause, params = _build_where_clause(
+        min_array_length,
+        max_array_length,
+        min_repeat_length,
+        max_repeat_length,
+        cas_types,
+        patterns_to_exclude,
+    )
+    where_clause = (
+        where_clause + " AND reference = ?" if where_clause else "WHERE reference = ?"
+    )
+    params.append(reference)
+
+    array_rows = con.execute(
+        f"""SELECT {_AGGREGATE_GROUP}, mutation_count, SUM(num_arrays)
+        FROM agg_arrays {where_clause}
+        GROUP BY {_AGGREGATE_GROUP}, mutation_count""",
+        params,
+    )
+    array_counts = {tuple(row[:-1]): row[-1] for row in array_rows}
+    mutation_rows = con.execute(
+        f"""SELECT {_AGGREGATE_GROUP}, repeat_index, base_index, SUM(num_mutations)
+        FROM agg_mutations {where_clause}
+        GROUP BY {_AGGREGATE_GROUP}, repeat_index, base_index""",
+        params,
+    )
+    mutation_counts = {tuple(row[:-1]): row[-1] for row in mutation_rows}
+    return array_counts, mutation_counts  # type: ignore
+
+
+MIGRATION_BATCH_SIZE = 10_000
+
+
+def migrate(con: db.Connection) -> None:
+    """
+    Upgrade a file written with an older schema to SCHEMA_VERSION, in place.
+
+    Version 1 files (JSON text columns) have their arrays table rewritten in
+    batches. Newer files get the missing columns, indexes and tables, computed in
+    SQL. Files without an arrays table, or already up to date, are left as is.
+    """
+    schema_version = get_schema_version(con)
+    if schema_version >= SCHEMA_VERSION:
+        return
+    row = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'arrays'"
+    ).fetchone()
+    if row is None:
+        return
+
+    if schema_version == 1:
+        # STRICT TEXT columns cannot hold the BLOBs: rebuild the table
+        con.execute("ALTER TABLE arrays RENAME TO arrays_v1")
+        create_arrays_table(con)
+        cur = con.cursor()
+        # works according to docs, but typing is broken
+        cur.row_factory = db.Row  # type: ignore
+        cur.execute("SELECT * FROM arrays_v1")
+        while rows := cur.fetchmany(MIGRATION_BATCH_SIZE):
+            insert_arrays(con, [CRISPRArray.from_db_row(row) for row in rows])
+        con.execute("DROP TABLE arrays_v1")
+    else:
+        if schema_version < 3:
+            con.execute("ALTER TABLE arrays ADD COLUMN pattern_mask INTEGER")
+            # one byte per pattern
+            mask = " | ".join(
+                f"((instr(patterns, x'{pattern:02x}') > 0) << {pattern})"
+                for pattern in PATTERNS
+            )
+            con.execute(f"UPDATE arrays SET pattern_mask = {mask}")
+            con.execute("CREATE INDEX arrays_pattern_mask ON arrays (pattern_mask)")
+        if schema_version < 4:
+            _create_filter_index(con)
+            _create_summary_table(con)
+            con.execute(
+                """INSERT INTO arrays_summary
+                SELECT cas_type, COUNT(*), MIN(array_length), MAX(array_length),
+                MIN(repeat_length), MAX(repeat_length)
+                FROM arrays GROUP BY cas_type"""
+            )
+
+    columns = [row[1] for row in con.execute("PRAGMA table_info(meta)")]
+    if "schema_version" not in columns:
+        con.execute("ALTER TABLE meta ADD COLUMN schema_version INTEGER")
+    con.execute("UPDATE meta SET schema_version = ?", (SCHEMA_VERSION,))
+
+
+# event tables (optional, see EventLog): one per event type, "<type>_events" in
+#   snake case, and an "events" view over all of them
+def _event_table(name: str) -> str:
+    snake = "".join("_" + c.lower() if c.isupper() else c for c in name).lstrip("_")
+    return f"{snake}_events"
+
+
+def create_event_tables(con: db.Connection) -> None:
+    for name, fields in EVENT_FIELDS.items():
+        table = _event_table(name)
+        columns = ",\n".join(f"{field} INTEGER" for field in fields)
+        con.execute(
+            f"""
+            CREATE TABLE {table} (
+            run_index INTEGER,
+            seq INTEGER, -- position in the run, over all event types
+            time REAL,
+            type_code INTEGER,
+            {columns}
+            ) STRICT;
+            """
+        )
+        con.execute(f"CREATE INDEX {table}_run_index ON {table} (run_index)")
+
+    con.execute(
+        "CREATE VIEW events AS "
+        + " UNION ALL ".join(
+            f"SELECT run_index, seq, time, type_code FROM {_event_table(name)}"
+            for name in EVENT_FIELDS
+        )
+    )
+
+
+def has_event_tables(con: db.Connection) -> bool:
+    row = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'view' AND name = 'events'"
+    ).fetchone()
+    return row is not None
+
+
+def insert_event_log(con: db.Connection, event_log: EventLog) -> None:
+    for name, columns in event_log.columns.items():
+        if len(columns) == 0:
+            continue
+        type_code = EVENT_TYPE_CODES[name]
+        qmarks = ", ".join("?" * (len(EVENT_FIELDS[name]) + 4))
+        con.executemany(
+            f"INSERT INTO {_event_table(name)} VALUES ({qmarks})",
+            (
+                (run_index, seq, time, type_code, *fields)
+                for run_index, seq, time, *fields in columns.rows()
+            ),
+        )
+
+
+# events of the given runs (all runs by default)
+def load_event_log(
+    con: db.Connection, run_indices: Sequence[int] | None = None
+) -> EventLog:
+    event_log = EventLog()
+    for name, fields in EVENT_FIELDS.items():
+        query = f"SELECT run_index, seq, time, {', '.join(fields)} FROM {_event_table(name)}"
+        params: list[int] = []
+        if run_indices is not None:
+            query += f" WHERE run_index IN ({','.join('?' * len(run_indices))})"
+            params.extend(run_indices)
+        event_log.add_rows(
+            name, con.execute(query + " ORDER BY run_index, seq", params)
+        )
+    return event_log
+
+
+# events of runs without a stored array: left over from an interrupted simulation
+def delete_orphaned_events(con: db.Connection) -> None:
+    for name in EVENT_FIELDS:
+        con.execute(
+            f"DELETE FROM {_event_table(name)} WHERE CAST(run_index AS TEXT) NOT IN (SELECT id FROM arrays)"
+        )
 
 
 def load_array(con: db.Connection, id: str) -> CRISPRArray | None:
@@ -165,6 +537,32 @@ def load_arrays(
     patterns_to_exclude: list[int] = [],
 ) -> list[CRISPRArray]:
     """Load all arrays matching the filter criteria."""
+    return list(
+        iter_arrays(
+            con,
+            min_array_length,
+            max_array_length,
+            min_repeat_length,
+            max_repeat_length,
+            cas_types,
+            patterns_to_exclude,
+        )
+    )
+
+
+# streamed in batches, e.g. into a DatasetStatsAccumulator; rowid_range limits the
+#   arrays to rowid start <= rowid < stop
+def iter_arrays(
+    con: db.Connection,
+    min_array_length: int | None = None,
+    max_array_length: int | None = None,
+    min_repeat_length: int | None = None,
+    max_repeat_length: int | None = None,
+    cas_types: list[str] = [],
+    patterns_to_exclude: list[int] = [],
+    rowid_range: tuple[int, int] | None = None,
+    batch_size: int = 10_000,
+) -> Iterator[CRISPRArray]:
     where_clause, params = _build_where_clause(
         min_array_length,
         max_array_length,
@@ -172,16 +570,63 @@ def load_arrays(
         max_repeat_length,
         cas_types,
         patterns_to_exclude,
+        get_schema_version(con),
     )
+    order_clause = "ORDER BY id"
+    if rowid_range is not None:
+        where_clause += " AND " if where_clause else "WHERE "
+        where_clause += "rowid >= ? AND rowid < ?"
+        params.extend(rowid_range)
+        # a range of a partition, in rowid order; sorting by id needs a temp B-tree
+        order_clause = ""
 
     cur = con.cursor()
     # works according to docs, but typing is broken
     cur.row_factory = db.Row  # type: ignore
-    rows = cur.execute(
-        f"SELECT * FROM arrays {where_clause} ORDER BY id", params
-    ).fetchall()
-
-    return [CRISPRArray.from_db_row(row) for row in rows]
+    cur.execute(f"SELECT * FROM arrays {where_clause} {order_clause}", params)
+    while rows := cur.fetchmany(batch_size):
+        yield from (CRISPRArray.from_db_row(row) for row in rows)
+
+
+def _accumulate_rowid_range(
+    filename: str,
+    reference: Reference,
+    rowid_range: tuple[int, int],
+    filters: dict[str, Any],
+) -> DatasetStatsAccumulator:
+    accumulator = DatasetStatsAccumulator(reference)
+    with database(filename) as con:
+        for array in iter_arrays(con, rowid_range=rowid_range, **filters):
+            accumulator.add(array)
+    return accumulator
+
+
+def accumulate_dataset_stats(
+    filename: str,
+    reference: Reference = "consensus",
+    num_workers: int = 4,
+    **filters: Any,
+) -> DatasetStatsAccumulator:
+    """
+    Counts for DatasetStats over the arrays matching the filters (see load_arrays),
+    streamed by num_workers processes, each over an equal rowid range.
+    """
+    with database(filename) as con:
+        max_rowid = con.execute("SELECT MAX(rowid) FROM arrays").fetchone()[0] or 0
+    step = max_rowid // num_workers + 1
+    rowid_ranges = [(start, start + step) for start in range(0, max_rowid + 1, step)]
+
+    accumulator = DatasetStatsAccumulator(reference)
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for result in executor.map(
+            _accumulate_rowid_range,
+            [filename] * len(rowid_ranges),
+            [reference] * len(rowid_ranges),
+            rowid_ranges,
+            [filters] * len(rowid_ranges),
+        ):
+            accumulator.merge(result)
+    return accumulator
 
 
 def load_array_ids(
@@ -200,6 +645,7 @@ def load_array_ids(
         max_repeat_length,
         cas_types,
         patterns_to_exclude,
+        get_schema_version(con),
     )
 
     query = "SELECT id FROM arrays"
@@ -210,27 +656,51 @@ def load_array_ids(
     return [row[0] for row in rows]
 
 
+# the summary getters below read arrays_summary, and scan the arrays of files
+#   written before it (see migrate)
+def _has_summary(con: db.Connection) -> bool:
+    return get_schema_version(con) >= 4
+
+
 def get_min_max_array_length(con: db.Connection) -> tuple[int, int]:
-    row = con.execute(
-        "SELECT MIN(array_length), MAX(array_length) FROM arrays"
-    ).fetchone()
+    if _has_summary(con):
+        query = (
+            "SELECT MIN(min_array_length), MAX(max_array_length) FROM arrays_summary"
+        )
+    else:
+        query = "SELECT MIN(array_length), MAX(array_length) FROM arrays"
+    row = con.execute(query).fetchone()
     return row[0], row[1]
 
 
 def get_min_max_repeat_length(con: db.Connection) -> tuple[int, int]:
-    row = con.execute(
-        "SELECT MIN(repeat_length), MAX(repeat_length) FROM arrays"
-    ).fetchone()
+    if _has_summary(con):
+        query = (
+            "SELECT MIN(min_repeat_length), MAX(max_repeat_length) FROM arrays_summary"
+        )
+    else:
+        query = "SELECT MIN(repeat_length), MAX(repeat_length) FROM arrays"
+    row = con.execute(query).fetchone()
     return row[0], row[1]
 
 
 def get_cas_types(con: db.Connection) -> list[str]:
-    rows = con.execute(
-        "SELECT DISTINCT cas_type FROM arrays ORDER BY cas_type"
-    ).fetchall()
+    if _has_summary(con):
+        query = "SELECT cas_type FROM arrays_summary ORDER BY cas_type"
+    else:
+        query = "SELECT DISTINCT cas_type FROM arrays ORDER BY cas_type"
+    rows = con.execute(query).fetchall()
     return [row[0] for row in rows]
 
 
+def get_num_arrays(con: db.Connection) -> int:
+    if _has_summary(con):
+        query = "SELECT COALESCE(SUM(num_arrays), 0) FROM arrays_summary"
+    else:
+        query = "SELECT COUNT(*) FROM arrays"
+    return con.execute(query).fetchone()[0]
+
+
 def _build_where_clause(
     min_array_length: int | None = None,
     max_array_length: int | None = None,
@@ -238,6 +708,7 @@ def _build_where_clause(
     max_repeat_length: int | None = None,
     cas_types: list[str] = [],
     patterns_to_exclude: list[int] = [],
+    schema_version: int = SCHEMA_VERSION,
 ) -> tuple[str, list[Any]]:
     where_conditions: list[str] = []
     params: list[Any] = []
@@ -263,10 +734,27 @@ def _build_where_clause(
         where_conditions.append(f"cas_type IN ({qmarks})")
         params.extend(cas_types)
 
-    if len(patterns_to_exclude) > 0:
+    if len(patterns_to_exclude) > 0 and schema_version >= 3:
+        # the masks without an excluded pattern: an IN lookup on the index
+        excluded = pattern_mask(set(patterns_to_exclude) - {0})
+        masks = [
+            mask
+            for mask in range(0, 1 << (max(PATTERNS) + 1), 2)
+            if mask & excluded == 0 and (mask != 0 or 0 not in patterns_to_exclude)
+        ]
+        where_conditions.append(f"pattern_mask IN ({','.join('?' * len(masks))})")
+        params.extend(masks)
+    elif len(patterns_to_exclude) > 0:
         pattern_exclusions: list[str] = []
         for pattern_val in patterns_to_exclude:
-            if pattern_val == 0:  # exclude arrays with no patterns
+            if schema_version >= 2:
+                # one byte per pattern
+                if pattern_val == 0:  # exclude arrays with no patterns
+                    pattern_exclusions.append("length(patterns) = 0")
+                else:
+                    pattern_exclusions.append("instr(patterns, ?) > 0")
+                    params.append(bytes([pattern_val]))
+            elif pattern_val == 0:  # exclude arrays with no patterns
                 pattern_exclusions.append("json_array_length(patterns) = 0")
             else:
                 pattern_exclusions.append(
@@ -6,6 +6,9 @@ from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
 from crisprmutsim.CRISPR.crispr_array import CRISPRArray
 import crisprmutsim.CRISPR.storage as db
 
+# arrays per batched all_stats pass
+STATS_BATCH_SIZE = 1000
+
 
 def iter_csv_rows(file_path: str) -> Iterator[dict[str, str]]:
     p = Path(file_path)
@@ -60,6 +63,8 @@ def load_csv(
     duplicates_dropped_consensus = 0
 
     arrays: list[CRISPRArray] = []
+    # arrays waiting for a batched all_stats pass
+    pending: list[tuple[str, str, RawCRISPRArray]] = []
     unique_arrays: set[RawCRISPRArray] = set()
     unique_consensus_cas: set[tuple[str, str]] = set()
 
@@ -94,17 +99,15 @@ def load_csv(
                     continue
                 unique_arrays.add(_arr)
 
-            obj = CRISPRArray.from_raw_array(
-                id=name,
-                cas_type=cas_type,
-                raw_array=_arr,
-            )
-
-            arrays.append(obj)
+            pending.append((name, cas_type, _arr))
+            if len(pending) >= STATS_BATCH_SIZE:
+                _flush_pending(arrays, pending)
 
         else:
             empty_after_cleanup += 1
 
+    _flush_pending(arrays, pending)
+
     print(
         f"Created {total_arrays} arrays, skipped {empty_after_cleanup} arrays with fewer than 3 repeats"
     )
@@ -127,3 +130,14 @@ def load_csv(
         db.store_arrays(con, arrays)
 
     print(f"Saved to {db_file_path}")
+
+
+def _flush_pending(
+    arrays: list[CRISPRArray],
+    pending: list[tuple[str, str, RawCRISPRArray]],
+) -> None:
+    if not pending:
+        return
+    ids, cas_types, raw_arrays = zip(*pending)
+    arrays.extend(CRISPRArray.from_raw_arrays(ids, cas_types, raw_arrays))
+    pending.clear()
@@ -1,10 +1,46 @@
-from random import Random
+from collections.abc import Callable
+import math
 
+import numpy as np
+import numpy.typing as npt
 
-def geometric_mean_alpha(rng: Random, alpha: float) -> int:
+from crisprmutsim.simulation.rng import IRandom
+
+
+# one draw per trial; kept for reproducing results simulated with it
+#   (legacy_block_length_sampling), see geometric_sampler
+def geometric_mean_alpha(rng: IRandom, alpha: float) -> int:
     p = 1.0 / alpha
 
     k = 1
     while rng.random() > p:
         k += 1
     return k
+
+
+# geometric distribution with mean alpha (support 1, 2, ...) by inverse CDF: exactly
+#   one draw per sample, whatever alpha
+def geometric_sampler(alpha: float) -> Callable[[IRandom], int]:
+    p = 1.0 / alpha
+    if p >= 1.0:
+
+        def sample_one(rng: IRandom) -> int:
+            rng.random()
+            return 1
+
+        return sample_one
+
+    log_q = math.log1p(-p)
+
+    def sample(rng: IRandom) -> int:
+        # 1 - random() is in (0, 1]
+        return 1 + int(math.log(1.0 - rng.random()) / log_q)
+
+    return sample
+
+
+def geometric_mean_alpha_batch(
+    rng: np.random.Generator, alpha: float, size: int
+) -> npt.NDArray[np.int64]:
+    p = min(1.0 / alpha, 1.0)
+    return rng.geometric(p, size=size)
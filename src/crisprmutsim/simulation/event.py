@@ -1,8 +1,11 @@
 from collections.abc import Callable, Iterable, Mapping, Sequence
+from functools import partial
 import json
-from random import Random
+from types import FunctionType, MethodType
 from typing import Any, Protocol, Self
 
+from crisprmutsim.simulation.rng import IRandom
+
 
 EventParametersType = Mapping[str, object]
 EventActionsType = Mapping[str, object]
@@ -51,12 +54,28 @@ class IEventGenerator[
     def rate(self, current_time: float, obj: TIAcceptsEvents) -> float: ...
 
     def generate(
-        self, rng: Random, current_time: float, obj: TIAcceptsEvents
+        self, rng: IRandom, current_time: float, obj: TIAcceptsEvents
     ) -> TIEvent: ...
 
 
+# Optional rate caching hints for run_direct_method. Both are plain attributes, not part
+#   of the protocols; a missing attribute (or None) means "unknown":
+#   - generator.rate_dependencies: the parts of the object's state the rate depends on
+#       (e.g. "array_length"); an empty set means a constant rate
+#   - event.invalidates: the parts of the state the event changes
+def rate_dependencies(event_gen: object) -> frozenset[str] | None:
+    return getattr(event_gen, "rate_dependencies", None)
+
+
+def invalidates(event: object) -> frozenset[str] | None:
+    return getattr(event, "invalidates", None)
+
+
 # implementation for inheritance
 class Event[TEventActions: EventActionsType]:
+    # see invalidates(); None: may change anything
+    invalidates: frozenset[str] | None = None
+
     @property
     def actions(self) -> TEventActions:
         return self._actions
@@ -111,15 +130,37 @@ def event_to_tuple(e: IEvent) -> tuple[str, float, str]:
     )
 
 
+# rate objects with plain JSON attributes (the rate converters) by class name and
+#   attributes, so the generators can be rebuilt; other callables (functions, lambdas)
+#   as "callable"
+def rate_to_json(rate: object) -> object:
+    if not callable(rate):
+        return rate
+    parameters = getattr(rate, "__dict__", None)
+    if parameters is None or isinstance(rate, FunctionType | MethodType | partial):
+        return "callable"
+    try:
+        json.dumps(parameters)
+    except TypeError:
+        return "callable"
+    return {"type": rate.__class__.__name__, "parameters": parameters}
+
+
+# opaque_rates: every callable rate as "callable", as written before rate_to_json
 def event_generators_to_json(
     gens: Sequence[IEventGenerator[EventParametersType, IEvent, Any]],
+    opaque_rates: bool = False,
 ) -> str:
     return json.dumps(
         [
             {
                 "type": gen.__class__.__name__,
                 "parameters": gen.parameters,
-                "rate": (gen._rate if not callable(gen._rate) else "callable"),
+                "rate": (
+                    "callable"
+                    if opaque_rates and callable(gen._rate)
+                    else rate_to_json(gen._rate)
+                ),
             }
             for gen in gens
         ]
@@ -0,0 +1,94 @@
+from collections.abc import Sequence
+import math
+from random import Random
+from typing import Literal, Protocol
+
+import numpy as np
+
+# "random": random.Random(base_seed + run_index), the legacy, reproducible backend
+# "numpy": NumpyRandom, an independent PCG64 stream per run
+type RandomBackend = Literal["random", "numpy"]
+
+
+# what the simulation engines and event generators draw from; random.Random
+#   implements it as is
+class IRandom(Protocol):
+    def random(self) -> float: ...
+
+    def randint(self, a: int, b: int) -> int: ...
+
+    def choice[T](self, seq: Sequence[T]) -> T: ...
+
+    def expovariate(self, lambd: float = 1.0) -> float: ...
+
+    def getrandbits(self, k: int, /) -> int: ...
+
+
+class NumpyRandom:
+    """
+    IRandom on a NumPy PCG64 generator.
+
+    Scalar draws are served from a buffer of uniforms, refilled in blocks, since
+    single NumPy draws are slow. randint and choice scale a uniform; their bias is
+    below len / 2^53. Batch draws go through `generator` directly.
+    """
+
+    BUFFER_SIZE = 1024
+
+    def __init__(self, seed: int | np.random.SeedSequence | None = None) -> None:
+        self.generator = np.random.Generator(np.random.PCG64(seed))
+        self._buffer: list[float] = []
+        self._index = 0
+
+    # stream `run_index` of `base_seed`: same as SeedSequence(base_seed).spawn(n)
+    #   [run_index], without spawning the others. streams are independent, unlike
+    #   consecutive integer seeds
+    @classmethod
+    def for_run(cls, base_seed: int, run_index: int) -> "NumpyRandom":
+        return cls(np.random.SeedSequence(base_seed, spawn_key=(run_index,)))
+
+    def random(self) -> float:
+        if self._index == len(self._buffer):
+            self._buffer = self.generator.random(self.BUFFER_SIZE).tolist()
+            self._index = 0
+        value = self._buffer[self._index]
+        self._index += 1
+        return value
+
+    def randint(self, a: int, b: int) -> int:
+        if b < a:
+            raise ValueError(f"empty range in randint({a}, {b})")
+        return a + int(self.random() * (b - a + 1))
+
+    def choice[T](self, seq: Sequence[T]) -> T:
+        if not seq:
+            raise IndexError("Cannot choose from an empty sequence")
+        return seq[int(self.random() * len(seq))]
+
+    def expovariate(self, lambd: float = 1.0) -> float:
+        # 1 - random() is in (0, 1]
+        return -math.log(1.0 - self.random()) / lambd
+
+    def getrandbits(self, k: int, /) -> int:
+        words = (k + 63) // 64
+        value = 0
+        for word in self.generator.bit_generator.random_raw(words).tolist():
+            value = value << 64 | word
+        return value >> (64 * words - k)
+
+
+def make_rng(backend: RandomBackend, base_seed: int, run_index: int) -> IRandom:
+    match backend:
+        case "random":
+            return Random(base_seed + run_index)
+        case "numpy":
+            return NumpyRandom.for_run(base_seed, run_index)
+        case _:
+            raise ValueError(f"Unknown random backend: {backend}")
+
+
+# NumPy generator for batch draws: the backend's own, or one seeded from it
+def numpy_generator(rng: IRandom) -> np.random.Generator:
+    if isinstance(rng, NumpyRandom):
+        return rng.generator
+    return np.random.default_rng(rng.getrandbits(64))
@@ -1,5 +1,4 @@
 from collections.abc import Collection, Iterator
-from random import Random
 from typing import Any
 
 from crisprmutsim.simulation.event import (
@@ -7,7 +6,10 @@ from crisprmutsim.simulation.event import (
     IAcceptsEvents,
     IEvent,
     IEventGenerator,
+    invalidates,
+    rate_dependencies,
 )
+from crisprmutsim.simulation.rng import IRandom
 
 
 # same issue with IAcceptsEvents as in event.py; workaround using Any
@@ -16,7 +18,7 @@ def run_poisson_process[
     TIEvent: IEvent,
     TIAcceptsEvents: IAcceptsEvents[Any],
 ](
-    rng: Random,
+    rng: IRandom,
     end_time: float,
     obj: TIAcceptsEvents,
     event_generators: Collection[
@@ -56,3 +58,68 @@ def run_poisson_process[
         event = earliest_event_gen.generate(rng, current_time, obj)
         obj.apply_events([event])
         yield event
+
+
+# index of a generator picked proportionally to its rate; needs total_rate > 0.
+#   single generator: no draw. falls through to the last generator with a positive
+#   rate on rounding
+def select_by_rate(rng: IRandom, rates: list[float], total_rate: float) -> int:
+    index = 0
+    if len(rates) > 1:
+        threshold = rng.random() * total_rate
+        for k, rate in enumerate(rates):
+            if rate > 0:
+                index = k
+                threshold -= rate
+                if threshold < 0:
+                    break
+    return index
+
+
+# direct method (Gillespie): one exponential waiting time from the total rate, then the
+#   generator is picked proportionally to its rate.
+#   rates are cached; after an event, a generator's rate is only recomputed if its
+#   rate_dependencies intersect the event's invalidates (None on either side: always)
+def run_direct_method[
+    TEventParameters: EventParametersType,
+    TIEvent: IEvent,
+    TIAcceptsEvents: IAcceptsEvents[Any],
+](
+    rng: IRandom,
+    end_time: float,
+    obj: TIAcceptsEvents,
+    event_generators: Collection[
+        IEventGenerator[TEventParameters, TIEvent, TIAcceptsEvents]
+    ],
+) -> Iterator[TIEvent]:
+    if len(event_generators) == 0:
+        raise ValueError("No event generators provided for simulation.")
+    if end_time <= 0:
+        raise ValueError("End time must be greater than 0.")
+
+    generators = list(event_generators)
+    dependencies = [rate_dependencies(event_gen) for event_gen in generators]
+    current_time: float = 0.0
+    rates = [event_gen.rate(current_time, obj) for event_gen in generators]
+    total_rate = sum(rates)
+
+    while total_rate > 0:
+        current_time += rng.expovariate(total_rate)
+
+        if current_time > end_time:
+            break
+
+        index = select_by_rate(rng, rates, total_rate)
+        event = generators[index].generate(rng, current_time, obj)
+        obj.apply_events([event])
+        yield event
+
+        invalidated = invalidates(event)
+        for k, event_gen in enumerate(generators):
+            if (
+                dependencies[k] is None
+                or invalidated is None
+                or dependencies[k] & invalidated
+            ):
+                rates[k] = event_gen.rate(current_time, obj)
+        total_rate = sum(rates)
@@ -305,6 +305,7 @@ def run(folder_path: str = "."):
     for db_file in db_files:
         with db.database(os.path.join(folder, db_file)) as con:
             try:
+                db.migrate(con)
                 ids = con.execute("SELECT id FROM arrays").fetchall()
                 db_ids[db_file] = [id[0] for id in ids]
             except Exception as e:
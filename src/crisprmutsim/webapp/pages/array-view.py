@@ -3,13 +3,18 @@ from dash import callback, dcc, html, Input, Output
 import plotly.graph_objects as go
 
 from crisprmutsim.CRISPR.crispr_array import CRISPRArray
+from crisprmutsim.CRISPR.simulation.replay import replay
 import crisprmutsim.CRISPR.storage as db
+from crisprmutsim.simulation.event import Event
 from crisprmutsim.webapp.config.graph_config import graph_config
 from crisprmutsim.webapp.layouts.dataset_filter import dataset_filter_layout
 
 
 dash.register_page(__name__)
 
+# events listed for a replayed run, the latest ones
+MAX_LISTED_EVENTS = 200
+
 
 def generate_figure(array: CRISPRArray):
     array_length = array.repeat_stats.array_length
@@ -73,6 +78,24 @@ def layout():
                     dcc.Dropdown([], None, id="array-view--id-dropdown"),
                 ],
             ),
+            html.Div(
+                [
+                    html.Label("Replay until time (simulations only):"),
+                    dcc.Input(
+                        id="array-view--replay-time-input",
+                        type="number",
+                        min=0,
+                        placeholder="Stored array if empty",
+                        debounce=True,
+                        style={
+                            "width": "200px",
+                            "display": "block",
+                            "marginTop": "5px",
+                        },
+                    ),
+                ],
+                style={"paddingTop": "10px"},
+            ),
             html.Div(
                 id="array-view--array-info",
                 style={
@@ -121,9 +144,10 @@ def update_id_options(
     Output("array-view--array-info", "children"),
     Input({"type": "file-dropdown", "page": __name__}, "value"),
     Input("array-view--id-dropdown", "value"),
+    Input("array-view--replay-time-input", "value"),
     prevent_initial_call=True,
 )
-def update_array_view(filename, id) -> tuple[list, list]:
+def update_array_view(filename, id, replay_time) -> tuple[list, list]:
     if filename is None or id is None:
         return [], []
 
@@ -131,6 +155,39 @@ def update_array_view(filename, id) -> tuple[list, list]:
         array = db.load_array(con, id)
         if array is None:
             return [], []
+        info = (
+            db.load_simulation_info(con)
+            if db.load_meta(con).get("type") == "sim"
+            else None
+        )
+
+    # re-simulated from the seed: the array at replay_time and its history
+    history_children = []
+    if info is not None and replay_time is not None:
+        try:
+            replayed, events = replay(info, int(id), replay_time)
+            history = list(events)
+        except ValueError as e:
+            history_children = [html.Div(f"Cannot replay: {e}")]
+        else:
+            array = CRISPRArray.from_raw_array(
+                array.id, array.cas_type, replayed.to_raw_array()
+            )
+            history_children = [
+                html.Details(
+                    [
+                        html.Summary(
+                            f"Replayed until time {replay_time}: {len(history)} events"
+                        ),
+                        html.Pre(
+                            "\n".join(
+                                Event.to_string(event)  # type: ignore
+                                for event in history[-MAX_LISTED_EVENTS:]
+                            )
+                        ),
+                    ]
+                )
+            ]
 
     fig = generate_figure(array)
     fig_container = dcc.Graph(figure=fig, config=graph_config)
@@ -159,6 +216,7 @@ def update_array_view(filename, id) -> tuple[list, list]:
                 html.Span(patterns_text),
             ]
         ),
+        *history_children,
     ]
 
     return [fig_container], info_children
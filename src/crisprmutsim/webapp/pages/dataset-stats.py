@@ -901,16 +901,30 @@ def update_figures(
     if filename is None:
         raise PreventUpdate
 
+    filters = dict(
+        min_array_length=array_length_filter[0],
+        max_array_length=array_length_filter[1],
+        min_repeat_length=repeat_length_filter[0],
+        max_repeat_length=repeat_length_filter[1],
+        cas_types=cas_type_filter,
+        patterns_to_exclude=pattern_filter,
+    )
     with db.database(filename) as con:
-        arrays = db.load_arrays(
-            con,
-            min_array_length=array_length_filter[0],
-            max_array_length=array_length_filter[1],
-            min_repeat_length=repeat_length_filter[0],
-            max_repeat_length=repeat_length_filter[1],
-            cas_types=cas_type_filter,
-            patterns_to_exclude=pattern_filter,
-        )
+        # summed in SQL when the file has aggregate tables, without loading arrays
+        if db.has_aggregate_tables(con):
+            stats = DatasetStats.from_aggregates(
+                *db.load_aggregates(con, reference_mode, **filters),
+                reference_mode,
+                repeat_range,
+                repeat_range_from_distal,
+            )
+        else:
+            stats = DatasetStats.from_arrays(
+                db.load_arrays(con, **filters),
+                reference_mode,
+                repeat_range,
+                repeat_range_from_distal,
+            )
         dataset_info = html.Div("Loaded from CSV")
         try:
             sim_info = db.load_simulation_info(con)
@@ -924,13 +938,9 @@ def update_figures(
         except:
             pass
 
-    if len(arrays) == 0:
+    if stats.total_arrays == 0:
         return ("", 0, 0, 0, 0) + tuple([[] for _ in range(13)])
 
-    stats = DatasetStats.from_arrays(
-        arrays, reference_mode, repeat_range, repeat_range_from_distal
-    )
-
     #### figures ####
     figs: list[go.Figure] = []
 
@@ -38,6 +38,8 @@ simulation_progress = {
     "running": False,
     "error": None,
     "filename": None,
+    # set by the cancel button, polled by the running simulation
+    "cancel_event": threading.Event(),
 }
 
 layout = html.Div(
@@ -159,6 +161,71 @@ layout = html.Div(
                     ],
                     style={"marginBottom": "15px"},
                 ),
+                html.Div(
+                    [
+                        html.Label("Simulation engine:"),
+                        dcc.RadioItems(
+                            id="home--engine-input",
+                            options=[
+                                {
+                                    "label": "First reaction (reference)",
+                                    "value": "first_reaction",
+                                },
+                                {
+                                    "label": "Direct method (cached rates)",
+                                    "value": "direct",
+                                },
+                                {
+                                    "label": "Tau-leaping (approximate, fast for high mutation rates)",
+                                    "value": "tau_leaping",
+                                },
+                                {
+                                    "label": "Analytic (exact, batched mutations between insertions/deletions)",
+                                    "value": "analytic",
+                                },
+                                {
+                                    "label": "Ensemble (exact, blocks of runs vectorized with NumPy)",
+                                    "value": "ensemble",
+                                },
+                            ],
+                            value="first_reaction",
+                            labelStyle={"display": "block"},
+                        ),
+                    ],
+                    style={"marginBottom": "15px"},
+                ),
+                html.Div(
+                    [
+                        html.Label("Random number generator:"),
+                        dcc.RadioItems(
+                            id="home--rng-backend-input",
+                            options=[
+                                {
+                                    "label": "Python random (legacy seeding)",
+                                    "value": "random",
+                                },
+                                {
+                                    "label": "NumPy PCG64 (independent stream per run)",
+                                    "value": "numpy",
+                                },
+                            ],
+                            value="random",
+                            labelStyle={"display": "block"},
+                        ),
+                        dcc.Checklist(
+                            id="home--legacy-deletion-sampling-input",
+                            options=[
+                                {
+                                    "label": " Legacy deletion block length sampling (with Python random, reproduces earlier results)",
+                                    "value": "yes",
+                                }
+                            ],
+                            value=[],
+                            style={"marginTop": "5px"},
+                        ),
+                    ],
+                    style={"marginBottom": "15px"},
+                ),
             ],
         ),
         html.H3(
@@ -530,6 +597,39 @@ layout = html.Div(
                     placeholder="Auto-generated if empty",
                     style={"width": "400px", "display": "block", "marginTop": "5px"},
                 ),
+                dcc.Checklist(
+                    id="home--resume-input",
+                    options=[
+                        {
+                            "label": " Resume if the file exists (same parameters and seed)",
+                            "value": "yes",
+                        }
+                    ],
+                    value=[],
+                    style={"marginTop": "5px"},
+                ),
+                dcc.Checklist(
+                    id="home--record-events-input",
+                    options=[
+                        {
+                            "label": " Record every run's events (first reaction and direct engines)",
+                            "value": "yes",
+                        }
+                    ],
+                    value=[],
+                    style={"marginTop": "5px"},
+                ),
+                dcc.Checklist(
+                    id="home--store-aggregates-input",
+                    options=[
+                        {
+                            "label": " Store aggregate statistics tables (faster dataset stats)",
+                            "value": "yes",
+                        }
+                    ],
+                    value=[],
+                    style={"marginTop": "5px"},
+                ),
             ],
             style={"marginBottom": "20px"},
         ),
@@ -543,6 +643,18 @@ layout = html.Div(
                 "cursor": "pointer",
             },
         ),
+        html.Button(
+            "Cancel",
+            id="home--cancel-button",
+            n_clicks=0,
+            disabled=True,
+            style={
+                "padding": "10px 20px",
+                "fontSize": "16px",
+                "cursor": "pointer",
+                "marginLeft": "10px",
+            },
+        ),
         html.Div(
             id="home--progress-container",
             children=[
@@ -585,6 +697,7 @@ layout = html.Div(
     Output("home--simulation-running", "data"),
     Output("home--progress-interval", "disabled"),
     Output("home--run-button", "disabled"),
+    Output("home--cancel-button", "disabled"),
     Input("home--run-button", "n_clicks"),
     State("home--array-length-input", "value"),
     State("home--repeat-length-input", "value"),
@@ -592,6 +705,9 @@ layout = html.Div(
     State("home--end-time-input", "value"),
     State("home--num-runs-input", "value"),
     State("home--num-workers-input", "value"),
+    State("home--engine-input", "value"),
+    State("home--rng-backend-input", "value"),
+    State("home--legacy-deletion-sampling-input", "value"),
     State("home--mutation-rate-input", "value"),
     State("home--mutation-allow-same-base-input", "value"),
     State("home--indel-rate-input", "value"),
@@ -611,6 +727,9 @@ layout = html.Div(
     State("home--deletion-split-offset-input", "value"),
     State("home--deletion-mean-block-length-input", "value"),
     State("home--filename-input", "value"),
+    State("home--resume-input", "value"),
+    State("home--record-events-input", "value"),
+    State("home--store-aggregates-input", "value"),
     prevent_initial_call=True,
 )
 def start_simulation(
@@ -621,6 +740,9 @@ def start_simulation(
     end_time,
     num_runs,
     num_workers,
+    engine,
+    rng_backend,
+    legacy_deletion_sampling,
     mutation_rate,
     mutation_allow_same_base,
     indel_rate,
@@ -640,6 +762,9 @@ def start_simulation(
     del_split_offset,
     del_mean_block_length,
     filename,
+    resume,
+    record_events,
+    store_aggregates,
 ):
     global simulation_progress
 
@@ -648,7 +773,7 @@ def start_simulation(
 
     if not all([array_length, repeat_length, end_time, num_runs, num_workers]):
         simulation_progress["error"] = "Error: All parameters must be filled."
-        return False, True, False
+        return False, True, False, True
 
     if seed is None:
         seed = int.from_bytes(os.urandom(4), "little")
@@ -686,6 +811,7 @@ def start_simulation(
     simulation_progress["running"] = True
     simulation_progress["error"] = None
     simulation_progress["filename"] = filename
+    simulation_progress["cancel_event"] = threading.Event()
 
     def run_simulation_thread():
         global simulation_progress
@@ -742,6 +868,11 @@ def start_simulation(
                         "distal_offset": del_distal_offset,
                         "split_offset": del_split_offset,
                         "mean_block_deletion_length": del_mean_block_length,
+                        "legacy_block_length_sampling": (
+                            "yes" in legacy_deletion_sampling
+                            if legacy_deletion_sampling
+                            else False
+                        ),
                     },
                     rate=DeletionRateConverter(del_rate),
                 )
@@ -763,6 +894,14 @@ def start_simulation(
                 meta,
                 num_workers,
                 progress_callback=progress_update,
+                resume="yes" in resume if resume else False,
+                cancel_event=simulation_progress["cancel_event"],
+                engine=engine,
+                rng_backend=rng_backend,
+                record_events="yes" in record_events if record_events else False,
+                store_aggregates=(
+                    "yes" in store_aggregates if store_aggregates else False
+                ),
             )
 
             simulation_progress["running"] = False
@@ -776,7 +915,23 @@ def start_simulation(
     thread = threading.Thread(target=run_simulation_thread, daemon=True)
     thread.start()
 
-    return True, False, True
+    return True, False, True, False
+
+
+@callback(
+    Output("home--cancel-button", "disabled", allow_duplicate=True),
+    Input("home--cancel-button", "n_clicks"),
+    prevent_initial_call=True,
+)
+def cancel_simulation(n_clicks):
+    global simulation_progress
+
+    if n_clicks == 0:
+        raise PreventUpdate
+
+    # the simulation stops submitting runs and keeps the finished ones
+    simulation_progress["cancel_event"].set()
+    return True
 
 
 @callback(
@@ -788,6 +943,7 @@ def start_simulation(
     Output("home--simulation-running", "data", allow_duplicate=True),
     Output("home--progress-interval", "disabled", allow_duplicate=True),
     Output("home--run-button", "disabled", allow_duplicate=True),
+    Output("home--cancel-button", "disabled", allow_duplicate=True),
     Input("home--progress-interval", "n_intervals"),
     State("home--simulation-running", "data"),
     prevent_initial_call=True,
@@ -814,6 +970,7 @@ def update_progress(n_intervals, is_running):
             False,
             True,
             False,
+            True,
         )
 
     if running:
@@ -822,6 +979,9 @@ def update_progress(n_intervals, is_running):
             f"Running simulation: {current}/{total} runs completed ({percentage:.1f}%)"
         )
 
+        if simulation_progress["cancel_event"].is_set():
+            progress_text = f"Cancelling simulation: {current}/{total} runs completed"
+
         return (
             {"display": "block"},
             progress_text,
@@ -831,6 +991,19 @@ def update_progress(n_intervals, is_running):
             True,
             False,
             True,
+            simulation_progress["cancel_event"].is_set(),
+        )
+    elif simulation_progress["cancel_event"].is_set():
+        return (
+            {"display": "none"},
+            "",
+            "0",
+            f"Simulation cancelled after {current}/{total} runs. Partial results saved as: {filename} (resume to complete)",
+            {"marginTop": "20px", "fontSize": "14px", "color": "orange"},
+            False,
+            True,
+            False,
+            True,
         )
     else:
         return (
@@ -842,4 +1015,5 @@ def update_progress(n_intervals, is_running):
             False,
             True,
             False,
+            True,
         )
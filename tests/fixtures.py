@@ -0,0 +1,19 @@
+import random
+
+from crisprmutsim.CRISPR.crispr_array import CRISPRArray
+from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
+
+
+# shared by the storage and dataset stats tests
+def example_arrays() -> list[CRISPRArray]:
+    random.seed(0)
+    # no pattern, line at the first repeat (1), floating line (2)
+    return [
+        CRISPRArray.from_raw_array("a", "I-E", RawCRISPRArray(["ACGT"] * 4)),
+        CRISPRArray.from_raw_array(
+            "b", "I-E", RawCRISPRArray(["TCGT"] * 3 + ["ACGT"] * 5)
+        ),
+        CRISPRArray.from_raw_array(
+            "c", "II-A", RawCRISPRArray(["ACGT"] * 2 + ["ACGA"] * 3 + ["ACGT"] * 3)
+        ),
+    ]
@@ -1,7 +1,8 @@
+import random
 import unittest
 
 from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
-from crisprmutsim.CRISPR.dna_sequence import DNASequence
+from crisprmutsim.CRISPR.dna_sequence import DNASequence, PackedDNASequence
 
 
 class TestCrisprArray(unittest.TestCase):
@@ -211,6 +212,47 @@ class TestCrisprArray(unittest.TestCase):
         with self.assertWarns(Warning):
             self.assertEqual(["T", "A"] + a, RawCRISPRArray(["T", "A", "ACGT", "TGCA"]))
 
+    def test_packed_backend(self) -> None:
+        a: RawCRISPRArray = RawCRISPRArray(
+            ["ACGT", "TGCA", "AAAA"], sequence_type=PackedDNASequence
+        )
+        self.assertTrue(all(isinstance(seq, PackedDNASequence) for seq in a))
+        self.assertEqual(a, RawCRISPRArray(["ACGT", "TGCA", "AAAA"]))
+
+        a.__unsafe_apply_insertion__(0, 0)
+        a.__unsafe_apply_mutation__(0, 0, "G")
+        self.assertEqual(a, ["GCGT", "ACGT", "TGCA", "AAAA"])
+        self.assertIsInstance(a[0], PackedDNASequence)
+
+        a.__unsafe_apply_split_deletion__(1, 2, 1)
+        self.assertEqual(a, ["GCGT", "ACCA", "AAAA"])
+        self.assertIsInstance(a[1], PackedDNASequence)
+
+        # consensus ties are broken with the global random module
+        random.seed(0)
+        stats = a.all_stats()
+        random.seed(0)
+        self.assertEqual(stats, RawCRISPRArray(list(map(str, a))).all_stats())
+
+    def test_packed_backend_passthrough(self) -> None:
+        a = RawCRISPRArray(["ACGT", "ACGA"], sequence_type=PackedDNASequence)
+        for b in [a + ["TTTT"], ["TTTT"] + a]:
+            self.assertIs(b.sequence_type, PackedDNASequence)
+            self.assertTrue(all(isinstance(seq, PackedDNASequence) for seq in b))
+        a += ["TTTT"]
+        self.assertEqual(a, ["ACGT", "ACGA", "TTTT"])
+        self.assertTrue(all(isinstance(seq, PackedDNASequence) for seq in a))
+        self.assertIsInstance(a.consensus(), PackedDNASequence)
+
+        random.seed(0)
+        b = RawCRISPRArray.from_array_stats(a.all_stats(), PackedDNASequence)
+        self.assertEqual(b, a)
+        self.assertIs(b.sequence_type, PackedDNASequence)
+        self.assertTrue(all(isinstance(seq, PackedDNASequence) for seq in b))
+        b = RawCRISPRArray.from_json(a.to_json(), PackedDNASequence)
+        self.assertEqual(b, a)
+        self.assertIsInstance(b[0], PackedDNASequence)
+
 
 if __name__ == "__main__":
     unittest.main()
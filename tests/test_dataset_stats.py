@@ -0,0 +1,90 @@
+import pickle
+import unittest
+
+from crisprmutsim.CRISPR.dataset_stats import (
+    DatasetStats,
+    DatasetStatsAccumulator,
+    count_arrays,
+)
+from tests.fixtures import example_arrays
+
+
+class TestDatasetStats(unittest.TestCase):
+    def test_count_arrays(self) -> None:
+        array_counts, mutation_counts = count_arrays(example_arrays())
+        self.assertEqual(
+            array_counts,
+            {
+                ("I-E", 4, 4, 0, 0): 1,
+                ("I-E", 8, 4, 1 << 1, 3): 1,
+                ("II-A", 8, 4, 1 << 2, 3): 1,
+            },
+        )
+        self.assertEqual(
+            mutation_counts,
+            {("I-E", 8, 4, 1 << 1, i, 0): 1 for i in range(3)}
+            | {("II-A", 8, 4, 1 << 2, i, 3): 1 for i in range(2, 5)},
+        )
+
+    def test_from_arrays(self) -> None:
+        stats = DatasetStats.from_arrays(example_arrays(), "consensus", (0, 7))
+        self.assertEqual(stats.total_arrays, 3)
+        self.assertEqual((stats.max_array_length, stats.max_repeat_length), (8, 4))
+        self.assertEqual(stats.array_length_distribution_abs, {4: 1, 8: 2})
+        self.assertEqual(stats.mutation_count_distribution_abs, {0: 1, 3: 2})
+        self.assertEqual(stats.mean_mutations_per_array, 2.0)
+        self.assertEqual(
+            stats.pattern_counts, {i: 1 / 3 if i < 3 else 0.0 for i in range(7)}
+        )
+        self.assertEqual(stats.mutation_matrix[2], [1 / 3, 0.0, 0.0, 1 / 3])
+        self.assertEqual(stats.mutation_matrix_from_distal[7], [0.0, 0.0, 0.0, 1 / 3])
+        # repeat 4 only exists in the two arrays of length 8
+        self.assertEqual(stats.mutations_per_repeat_normalized[4], 1 / 2)
+        self.assertEqual(stats.mutations_per_base_position, {0: 1.0, 3: 1.0})
+        # in the order of first occurrence, array after array
+        self.assertEqual(list(stats.mutations_per_repeat_position), [0, 1, 2, 3, 4])
+        self.assertEqual(
+            list(stats.mutations_per_repeat_position_from_distal), [7, 6, 5, 4, 3]
+        )
+
+        stats = DatasetStats.from_arrays(example_arrays()[:1])
+        self.assertEqual(stats.mutation_matrix, [[0.0] * 4] * 4)
+        self.assertEqual(stats.mutations_per_repeat_position, {})
+
+        self.assertEqual(DatasetStats.from_arrays([]), DatasetStats())
+
+    def test_from_aggregates(self) -> None:
+        arrays = example_arrays()
+        for reference in ["consensus", "proximal", "distal"]:
+            self.assertEqual(
+                DatasetStats.from_aggregates(
+                    *count_arrays(arrays, reference), reference, (1, 3), (0, 2)
+                ),
+                DatasetStats.from_arrays(arrays, reference, (1, 3), (0, 2)),
+            )
+
+    def test_accumulator(self) -> None:
+        arrays = example_arrays()
+        first = DatasetStatsAccumulator("proximal")
+        first.add(arrays[0])
+        self.assertEqual(
+            first.finalize(), DatasetStats.from_arrays(arrays[:1], "proximal")
+        )
+        second = DatasetStatsAccumulator("proximal")
+        for array in arrays[1:]:
+            second.add(array)
+
+        # e.g. from a worker process
+        first.merge(pickle.loads(pickle.dumps(second)))
+        self.assertEqual(len(first), 3)
+        self.assertEqual(
+            first.finalize((0, 4), (1, 2)),
+            DatasetStats.from_arrays(arrays, "proximal", (0, 4), (1, 2)),
+        )
+        self.assertEqual(DatasetStatsAccumulator().finalize(), DatasetStats())
+        with self.assertRaises(ValueError):
+            first.merge(DatasetStatsAccumulator("distal"))
+
+
+if __name__ == "__main__":
+    unittest.main()
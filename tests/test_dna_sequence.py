@@ -1,6 +1,6 @@
 import unittest
 
-from crisprmutsim.CRISPR.dna_sequence import DNASequence
+from crisprmutsim.CRISPR.dna_sequence import DNASequence, PackedDNASequence
 
 
 class TestDNASequence(unittest.TestCase):
@@ -153,5 +153,81 @@ class TestDNASequence(unittest.TestCase):
             self.assertEqual(["AA", "C"] + a, ["AA", "C", "A", "C", "G", "T"])
 
 
+class TestPackedDNASequence(unittest.TestCase):
+    def test_declare(self) -> None:
+        a: PackedDNASequence = PackedDNASequence("aCGaCgT")
+        self.assertEqual(a.bases, bytearray(b"ACGACGT"))
+        self.assertEqual(a.sequence, ["A", "C", "G", "A", "C", "G", "T"])
+        self.assertEqual(a, PackedDNASequence(a))
+        self.assertEqual(a, DNASequence(a))
+        self.assertEqual(DNASequence(a), a)
+        self.assertEqual(PackedDNASequence(["N"] * 3, unsafe=True), "NNN")
+
+        with self.assertRaises(ValueError):
+            PackedDNASequence("ACGTX")
+        with self.assertRaises(ValueError):
+            PackedDNASequence(["A", "C", "G", "AC"])
+        with self.assertRaises(ValueError):
+            PackedDNASequence("ACGä")
+
+    def test_getitem_setitem(self) -> None:
+        a: PackedDNASequence = PackedDNASequence("ACGT")
+        self.assertEqual(a[0], "A")
+        self.assertEqual(a[-1], "T")
+        self.assertEqual(a[1:3], ["C", "G"])
+
+        a[0] = "t"
+        self.assertEqual(a, "TCGT")
+        a[1:3] = ["A", "T"]
+        self.assertEqual(a, "TATT")
+        a[0:2] = "A"
+        self.assertEqual(a, "ATT")
+        a.__unsafe_setitem__(2, "G")
+        self.assertEqual(a, "ATG")
+
+        with self.assertRaises(ValueError):
+            a[0] = "X"
+        with self.assertRaises(ValueError):
+            a[0] = "AC"
+        with self.assertRaises(IndexError):
+            a[7]
+
+    def test_delitem_insert(self) -> None:
+        a: PackedDNASequence = PackedDNASequence("ACGT")
+        del a[0]
+        self.assertEqual(a, "CGT")
+        a.insert(0, "a")
+        self.assertEqual(a, "ACGT")
+        del a[1:3]
+        self.assertEqual(a, "AT")
+
+        with self.assertRaises(ValueError):
+            a.insert(0, "X")
+
+    def test_contains_index_count(self) -> None:
+        a: PackedDNASequence = PackedDNASequence("ACGACGT")
+        self.assertTrue("AC" in a)
+        self.assertTrue(DNASequence("GAC") in a)
+        self.assertFalse("ACT" in a)
+        self.assertEqual(a.index("G"), 2)
+        self.assertEqual(a.count("A"), 2)
+
+        with self.assertRaises(TypeError):
+            self.assertTrue(1 in a)
+
+    def test_concat(self) -> None:
+        a: PackedDNASequence = PackedDNASequence("ACGT")
+        self.assertEqual(a + "TGCA", "ACGTTGCA")
+        self.assertIsInstance(a + "TGCA", PackedDNASequence)
+        self.assertEqual("TGCA" + a, "TGCAACGT")
+        a += ["A", "C"]
+        self.assertEqual(a, "ACGTAC")
+
+        with self.assertRaises(ValueError):
+            a + "x"
+        with self.assertRaises(ValueError):
+            a += ["AA", "C"]
+
+
 if __name__ == "__main__":
     unittest.main()
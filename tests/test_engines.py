@@ -0,0 +1,489 @@
+import math
+from random import Random
+import unittest
+
+import numpy as np
+
+from crisprmutsim.CRISPR.matrix_crispr_array import MatrixCRISPRArray
+from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
+from crisprmutsim.CRISPR.simulation.ensemble import (
+    ENSEMBLE_BLOCK_SIZE,
+    Ensemble,
+    simulate_ensemble,
+    simulate_runs,
+)
+from crisprmutsim.CRISPR.simulation.events.crispr_event import ICRISPRArray
+from crisprmutsim.CRISPR.simulation.events.deletion import (
+    DeletionGenerator,
+    DeletionRateConverter,
+)
+from crisprmutsim.CRISPR.simulation.events.insertion import (
+    Insertion,
+    InsertionGenerator,
+)
+from crisprmutsim.CRISPR.simulation.events.insertion_deletion import (
+    InsertionDeletionGenerator,
+    InsertionDeletionRateConverter,
+)
+from crisprmutsim.CRISPR.simulation.events.mutation import (
+    Mutation,
+    MutationGenerator,
+    MutationRateConverter,
+)
+from crisprmutsim.CRISPR.simulation.simulation import run_crispr_poisson_process
+from crisprmutsim.simulation.rng import make_rng, numpy_generator
+
+
+# hides rate_dependencies, so every rate is recomputed after every event
+class Uncached:
+    def __init__(self, event_gen) -> None:
+        self.event_gen = event_gen
+        self.parameters = event_gen.parameters
+        self._rate = event_gen._rate
+
+    def rate(self, current_time: float, obj: ICRISPRArray) -> float:
+        return self.event_gen.rate(current_time, obj)
+
+    def generate(self, rng: Random, current_time: float, obj: ICRISPRArray):
+        return self.event_gen.generate(rng, current_time, obj)
+
+
+def run(seed: int, event_generators, engine: str, end_time: float = 10.0) -> list:
+    array = MatrixCRISPRArray.from_shape(10, 10)
+    return list(
+        run_crispr_poisson_process(
+            Random(seed), end_time, array, event_generators, engine  # type: ignore
+        )
+    )
+
+
+class TestEngines(unittest.TestCase):
+    def setUp(self) -> None:
+        self.event_generators = [
+            MutationGenerator({}, rate=MutationRateConverter(0.01)),
+            InsertionGenerator({"anchor": "proximal", "randomize": "none"}, rate=1.0),
+            DeletionGenerator(
+                {"leader_offset": 1, "mean_block_deletion_length": 1.5},
+                rate=DeletionRateConverter(0.02),
+            ),
+            InsertionDeletionGenerator(
+                {"insertion_anchor": "proximal", "insertion_randomize": "none"},
+                rate=InsertionDeletionRateConverter(0.02),
+            ),
+        ]
+
+    def test_rate_dependencies(self) -> None:
+        mutation, insertion, deletion, insertion_deletion = self.event_generators
+        self.assertEqual(
+            mutation.rate_dependencies, {"array_length", "repeat_length"}  # type: ignore
+        )
+        self.assertEqual(insertion.rate_dependencies, set())  # type: ignore
+        self.assertEqual(deletion.rate_dependencies, {"array_length"})  # type: ignore
+        self.assertEqual(
+            insertion_deletion.rate_dependencies, {"array_length"}  # type: ignore
+        )
+        self.assertIsNone(
+            MutationGenerator({}, rate=lambda t, obj: t).rate_dependencies
+        )
+
+    def test_single_generator(self) -> None:
+        # one waiting time per step either way: same random numbers, same events
+        event_generators = self.event_generators[:1]
+        for seed in range(10):
+            self.assertEqual(
+                list(map(str, run(seed, event_generators, "first_reaction"))),
+                list(map(str, run(seed, event_generators, "direct"))),
+            )
+
+    def test_cached_rates(self) -> None:
+        uncached = [Uncached(event_gen) for event_gen in self.event_generators]
+        for seed in range(20):
+            self.assertEqual(
+                list(map(str, run(seed, self.event_generators, "direct"))),
+                list(map(str, run(seed, uncached, "direct"))),
+            )
+
+    def test_event_counts(self) -> None:
+        # mutations: 0.01 per base and time unit, array grows by one repeat per time
+        #   unit: 0.01 * 10 * integral_0^10 (10 + t) dt = 15
+        event_generators = self.event_generators[:2]
+        for engine in ["first_reaction", "direct"]:
+            counts = {Mutation: 0, Insertion: 0}
+            num_runs = 400
+            for seed in range(num_runs):
+                for event in run(seed, event_generators, engine):
+                    counts[type(event)] += 1
+            self.assertAlmostEqual(counts[Insertion] / num_runs, 10.0, delta=0.6)
+            self.assertAlmostEqual(counts[Mutation] / num_runs, 15.0, delta=0.8)
+
+    def test_mutation_batch(self) -> None:
+        # one cell hit `count` times: back at A with probability (1 + 3(-1/3)^count) / 4
+        rng = np.random.default_rng(0)
+        matrix = np.frombuffer(b"A", dtype=np.uint8).reshape(1, 1)
+        num_trials = 4000
+        for allow_same_base, count, expected in [
+            (False, 1, 0.0),
+            (False, 2, 1 / 3),
+            (False, 3, 2 / 9),
+            (True, 1, 1 / 4),
+        ]:
+            gen = MutationGenerator({"allow_same_base": allow_same_base}, rate=1.0)
+            new_bases = []
+            for _ in range(num_trials):
+                cells, bases = gen.generate_batch(rng, matrix, count)
+                self.assertEqual(list(cells), [0])
+                new_bases.append(chr(bases[0]))
+            self.assertAlmostEqual(
+                new_bases.count("A") / num_trials, expected, delta=0.025
+            )
+            for base in "CGT":
+                self.assertAlmostEqual(
+                    new_bases.count(base) / num_trials, (1 - expected) / 3, delta=0.03
+                )
+
+        # from N: uniform over ACGT after the first hit
+        matrix = np.frombuffer(b"N", dtype=np.uint8).reshape(1, 1)
+        gen = MutationGenerator({}, rate=1.0)
+        new_bases = [chr(gen.generate_batch(rng, matrix, 2)[1][0]) for _ in range(4000)]
+        for base in "ACGT":
+            self.assertAlmostEqual(new_bases.count(base) / 4000, 0.25, delta=0.025)
+
+    def test_tau_leaping_mutations_only(self) -> None:
+        # a single leap; fraction of unchanged bases: 1/4 + 3/4 e^(-4/3 mu t)
+        event_generators = [MutationGenerator({}, rate=MutationRateConverter(0.1))]
+        unchanged = 0
+        num_runs = 200
+        for seed in range(num_runs):
+            array = MatrixCRISPRArray.from_shape(10, 10, "A")
+            events = run_crispr_poisson_process(
+                Random(seed), 5.0, array, event_generators, "tau_leaping"
+            )
+            self.assertEqual(list(events), [])
+            unchanged += "".join(array).count("A")
+        self.assertAlmostEqual(
+            unchanged / (num_runs * 100),
+            1 / 4 + 3 / 4 * math.exp(-4 / 3 * 0.5),
+            delta=0.01,
+        )
+
+    def test_tau_leaping_fallback(self) -> None:
+        # structural events too frequent for a leap: exact steps only, as "direct"
+        for seed in range(10):
+            self.assertEqual(
+                list(map(str, run(seed, self.event_generators, "tau_leaping"))),
+                list(map(str, run(seed, self.event_generators, "direct"))),
+            )
+
+    def test_tau_leaping_structural(self) -> None:
+        event_generators = [
+            MutationGenerator({}, rate=MutationRateConverter(2.0)),
+            InsertionGenerator({"anchor": "proximal", "randomize": "none"}, rate=1.0),
+        ]
+        insertions = 0
+        num_runs = 400
+        for seed in range(num_runs):
+            array = MatrixCRISPRArray.from_shape(10, 10)
+            events = list(
+                run_crispr_poisson_process(
+                    Random(seed), 10.0, array, event_generators, "tau_leaping"
+                )
+            )
+            times = [event.time for event in events]
+            self.assertEqual(times, sorted(times))
+            num_insertions = sum(isinstance(event, Insertion) for event in events)
+            self.assertEqual(len(array), 10 + num_insertions)
+            insertions += num_insertions
+        self.assertAlmostEqual(insertions / num_runs, 10.0, delta=0.6)
+
+        with self.assertRaises(TypeError):
+            list(
+                run_crispr_poisson_process(
+                    Random(0),
+                    1.0,
+                    RawCRISPRArray(["ACGT"]),
+                    event_generators,
+                    "tau_leaping",
+                )
+            )
+
+    def test_analytic(self) -> None:
+        # per-base rate 0.1, t = 5: from A, unchanged with 1/4 + 3/4 e^(-4/3 mu t),
+        #   from N (or with same-base mutations, from A) with e^(-mu t) (+ 1/4 redraws)
+        mu_t = 0.5
+        num_runs = 200
+        for base, allow_same_base, expected in [
+            ("A", False, 1 / 4 + 3 / 4 * math.exp(-4 / 3 * mu_t)),
+            ("N", False, math.exp(-mu_t)),
+            ("A", True, math.exp(-mu_t) + (1 - math.exp(-mu_t)) / 4),
+        ]:
+            event_generators = [
+                MutationGenerator(
+                    {"allow_same_base": allow_same_base},
+                    rate=MutationRateConverter(0.1),
+                )
+            ]
+            unchanged = 0
+            for seed in range(num_runs):
+                array = MatrixCRISPRArray.from_shape(10, 10, base)
+                events = run_crispr_poisson_process(
+                    Random(seed), 5.0, array, event_generators, "analytic"
+                )
+                self.assertEqual(list(events), [])
+                self.assertTrue(set("".join(array)) <= {base, *"ACGT"})
+                unchanged += "".join(array).count(base)
+            self.assertAlmostEqual(unchanged / (num_runs * 100), expected, delta=0.01)
+
+        # same distribution as simulating the mutations (number of unchanged bases)
+        event_generators = [MutationGenerator({}, rate=MutationRateConverter(0.1))]
+        for engine in ["direct", "analytic"]:
+            unchanged = 0
+            for seed in range(num_runs):
+                array = MatrixCRISPRArray.from_shape(10, 10, "A")
+                list(
+                    run_crispr_poisson_process(
+                        Random(seed), 5.0, array, event_generators, engine  # type: ignore
+                    )
+                )
+                unchanged += "".join(array).count("A")
+            self.assertAlmostEqual(
+                unchanged / (num_runs * 100),
+                1 / 4 + 3 / 4 * math.exp(-4 / 3 * mu_t),
+                delta=0.01,
+            )
+
+        with self.assertRaises(ValueError):
+            run(0, [MutationGenerator({}, rate=lambda t, obj: t)], "analytic")
+
+    def test_analytic_structural(self) -> None:
+        # same distribution as the direct method: array length, and the bases copied by
+        #   insertions after being mutated. few mutations between structural events
+        #   (applied one by one) and many (evolve_mutations)
+        num_runs = 300
+        for mutation_rate in [0.05, 0.3]:
+            event_generators = [
+                MutationGenerator({}, rate=MutationRateConverter(mutation_rate)),
+                InsertionGenerator(
+                    {"anchor": "proximal", "randomize": "none"}, rate=1.0
+                ),
+                DeletionGenerator(
+                    {"leader_offset": 1, "mean_block_deletion_length": 1.5},
+                    rate=DeletionRateConverter(0.05),
+                ),
+            ]
+            results = {}
+            for engine in ["direct", "analytic"]:
+                lengths = 0
+                unchanged = 0.0
+                for seed in range(num_runs):
+                    array = MatrixCRISPRArray.from_shape(10, 10, "A")
+                    list(
+                        run_crispr_poisson_process(
+                            Random(seed), 10.0, array, event_generators, engine  # type: ignore
+                        )
+                    )
+                    lengths += len(array)
+                    unchanged += "".join(array).count("A") / (len(array) * 10)
+                results[engine] = (lengths / num_runs, unchanged / num_runs)
+
+            direct, analytic = results["direct"], results["analytic"]
+            self.assertAlmostEqual(direct[0], analytic[0], delta=0.5)
+            self.assertAlmostEqual(direct[1], analytic[1], delta=0.02)
+
+        with self.assertRaises(ValueError):
+            run(0, [Uncached(event_gen) for event_gen in event_generators], "analytic")
+
+    def test_ensemble_primitives(self) -> None:
+        # same arrays as the MatrixCRISPRArray primitives, one event per replicate
+        rng = np.random.default_rng(0)
+        num_runs, repeat_length = 50, 6
+        ensemble = Ensemble(num_runs, 12, repeat_length)
+        ensemble.buffer[:] = rng.choice(
+            np.frombuffer(b"ACGT", np.uint8), size=ensemble.buffer.shape
+        )
+        ensemble.lengths[:] = rng.integers(4, 12, num_runs)
+        arrays = [
+            MatrixCRISPRArray.from_matrix(matrix.copy())
+            for matrix in ensemble.matrices()
+        ]
+        replicas = np.arange(num_runs)
+
+        for step in range(30):
+            lengths = ensemble.lengths.copy()
+            if step % 3 == 0:
+                insertion_indices = (rng.random(num_runs) * (lengths + 1)).astype(
+                    np.int64
+                )
+                copy_indices = (rng.random(num_runs) * lengths).astype(np.int64)
+                ensemble.insert(replicas, copy_indices, insertion_indices)
+                for array, copy_index, insertion_index in zip(
+                    arrays, copy_indices, insertion_indices
+                ):
+                    array.__unsafe_apply_insertion__(
+                        int(copy_index), int(insertion_index)
+                    )
+            elif step % 3 == 1:
+                # keeps at least one repeat (insertions copy one)
+                active = replicas[lengths > 2]
+                repeat_indices = (
+                    rng.random(len(active)) * (lengths[active] - 1)
+                ).astype(np.int64)
+                split_indices = np.where(
+                    rng.random(len(active)) < 0.5,
+                    rng.integers(0, repeat_length, len(active)),
+                    -1,
+                )
+                block_lengths = np.minimum(
+                    rng.integers(1, 4, len(active)),
+                    lengths[active] - repeat_indices - 1,
+                )
+                ensemble.delete(active, repeat_indices, split_indices, block_lengths)
+                for b, repeat_index, split_index, block_length in zip(
+                    active, repeat_indices, split_indices, block_lengths
+                ):
+                    if split_index >= 0:
+                        arrays[b].__unsafe_apply_split_deletion__(
+                            int(repeat_index), int(split_index), int(block_length)
+                        )
+                    else:
+                        arrays[b].__unsafe_apply_deletion__(
+                            int(repeat_index), int(block_length)
+                        )
+            else:
+                repeat_indices = (rng.random(num_runs) * lengths).astype(np.int64)
+                base_indices = rng.integers(0, repeat_length, num_runs)
+                new_bases = rng.choice(np.frombuffer(b"ACGT", np.uint8), size=num_runs)
+                ensemble.mutate(replicas, repeat_indices, base_indices, new_bases)
+                for array, repeat_index, base_index, new_base in zip(
+                    arrays, repeat_indices, base_indices, new_bases
+                ):
+                    array.__unsafe_apply_mutation__(
+                        int(repeat_index), int(base_index), chr(new_base)
+                    )
+
+            for array, matrix in zip(arrays, ensemble.matrices()):
+                np.testing.assert_array_equal(array.matrix, matrix)
+
+    def test_ensemble(self) -> None:
+        # per-base rate 0.1, t = 5: bases never mutated, e^(-mu t)
+        ensemble = simulate_ensemble(
+            np.random.default_rng(0),
+            5.0,
+            10,
+            10,
+            [MutationGenerator({}, rate=MutationRateConverter(0.1))],
+            1000,
+        )
+        self.assertTrue(np.all(ensemble.lengths == 10))
+        unchanged = np.mean(ensemble.buffer[:, :10] == ord("N"))
+        self.assertAlmostEqual(unchanged, math.exp(-0.5), delta=0.01)
+
+        # same distribution as the direct method, with every built-in generator
+        event_generators = [
+            MutationGenerator({}, rate=MutationRateConverter(0.05)),
+            InsertionGenerator(
+                {"anchor": "distal", "randomize": "exponential"}, rate=1.0
+            ),
+            DeletionGenerator(
+                {
+                    "leader_offset": 1,
+                    "split_offset": 3,
+                    "mean_block_deletion_length": 1.5,
+                },
+                rate=DeletionRateConverter(0.05),
+            ),
+            InsertionDeletionGenerator(
+                {
+                    "insertion_anchor": "distal",
+                    "insertion_randomize": "uniform",
+                    "split_offset": 2,
+                },
+                rate=InsertionDeletionRateConverter(0.05),
+            ),
+        ]
+        num_runs = 300
+        lengths = 0
+        unchanged = 0.0
+        for seed in range(num_runs):
+            array = MatrixCRISPRArray.from_shape(10, 10)
+            list(
+                run_crispr_poisson_process(
+                    Random(seed), 10.0, array, event_generators, "direct"
+                )
+            )
+            lengths += len(array)
+            unchanged += "".join(array).count("N") / (len(array) * 10)
+
+        ensemble = simulate_ensemble(
+            np.random.default_rng(0), 10.0, 10, 10, event_generators, 2000
+        )
+        matrices = ensemble.matrices()
+        self.assertAlmostEqual(np.mean(ensemble.lengths), lengths / num_runs, delta=0.5)
+        self.assertAlmostEqual(
+            np.mean([np.mean(matrix == ord("N")) for matrix in matrices]),
+            unchanged / num_runs,
+            delta=0.02,
+        )
+
+        with self.assertRaises(ValueError):
+            simulate_ensemble(
+                np.random.default_rng(0),
+                1.0,
+                10,
+                10,
+                [Uncached(event_generators[0])],
+                10,
+            )
+        with self.assertRaises(ValueError):
+            simulate_ensemble(
+                np.random.default_rng(0),
+                1.0,
+                10,
+                10,
+                [MutationGenerator({}, rate=lambda t, obj: t)],
+                10,
+            )
+        with self.assertRaises(ValueError):
+            run(0, self.event_generators, "ensemble")
+
+    def test_ensemble_runs(self) -> None:
+        # a run's result depends on its index (and the job's size) only, not on the
+        #   other runs requested
+        event_generators = [
+            MutationGenerator({}, rate=MutationRateConverter(0.1)),
+            InsertionGenerator({"anchor": "proximal", "randomize": "none"}, rate=0.5),
+        ]
+        num_runs = ENSEMBLE_BLOCK_SIZE + 2
+        run_indices = [3, ENSEMBLE_BLOCK_SIZE + 1, 7]
+        matrices = simulate_runs(0, run_indices, num_runs, 1.0, 5, 4, event_generators)
+        self.assertEqual(len(matrices), 3)
+        for run_index, matrix in zip(run_indices, matrices):
+            (single,) = simulate_runs(
+                0, [run_index], num_runs, 1.0, 5, 4, event_generators
+            )
+            np.testing.assert_array_equal(matrix, single)
+        self.assertFalse(
+            np.array_equal(
+                matrices[0],
+                simulate_runs(1, [3], num_runs, 1.0, 5, 4, event_generators)[0],
+            )
+        )
+        with self.assertRaises(ValueError):
+            simulate_runs(0, [num_runs], num_runs, 1.0, 5, 4, event_generators)
+
+    def test_ensemble_block_size(self) -> None:
+        # a small job only simulates its own runs
+        event_generators = [MutationGenerator({}, rate=MutationRateConverter(0.1))]
+        block = simulate_ensemble(
+            numpy_generator(make_rng("random", 0, 0)), 1.0, 5, 4, event_generators, 100
+        ).matrices()
+        matrices = simulate_runs(0, [0, 99], 100, 1.0, 5, 4, event_generators)
+        np.testing.assert_array_equal(matrices[0], block[0])
+        np.testing.assert_array_equal(matrices[1], block[99])
+
+    def test_unknown_engine(self) -> None:
+        with self.assertRaises(ValueError):
+            run(0, self.event_generators, "unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import pickle
 import unittest
 from random import Random
 
@@ -509,6 +510,34 @@ class TestEventGenerators(unittest.TestCase):
         with self.assertRaises(ValueError):
             InsertionDeletionGenerator(parameters={"split_offset": -2}, rate=1.0)
 
+    def test_pickle(self) -> None:
+        # compiled samplers are rebuilt after unpickling (process pool workers)
+        array = RawCRISPRArray(["AAAA", "TTTT", "GGGG", "CCCC", "ACGT"])
+        for gen in [
+            MutationGenerator(parameters={"allow_same_base": True}, rate=1.0),
+            InsertionGenerator(
+                parameters={"anchor": "distal", "randomize": "exponential"}, rate=1.0
+            ),
+            DeletionGenerator(
+                parameters={"leader_offset": 1, "split_offset": 1}, rate=1.0
+            ),
+            InsertionDeletionGenerator(
+                parameters={
+                    "insertion_anchor": "distal",
+                    "insertion_randomize": "uniform",
+                },
+                rate=1.0,
+            ),
+        ]:
+            copy = pickle.loads(pickle.dumps(gen))
+            self.assertEqual(copy.parameters, gen.parameters)
+            rng, copy_rng = Random(7), Random(7)
+            for _ in range(20):
+                self.assertEqual(
+                    str(copy.generate(copy_rng, 0.0, array)),
+                    str(gen.generate(rng, 0.0, array)),
+                )
+
 
 if __name__ == "__main__":
     unittest.main()
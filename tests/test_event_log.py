@@ -0,0 +1,92 @@
+import pickle
+import unittest
+
+from crisprmutsim.CRISPR.event_log import EventLog
+from crisprmutsim.CRISPR.simulation.events.deletion import Deletion
+from crisprmutsim.CRISPR.simulation.events.insertion import Insertion
+from crisprmutsim.CRISPR.simulation.events.insertion_deletion import (
+    InsertionDeletion,
+)
+from crisprmutsim.CRISPR.simulation.events.mutation import Mutation
+from crisprmutsim.simulation.event import event_to_tuple
+
+
+def example_events() -> list:
+    return [
+        Mutation(0.5, {"repeat_index": 1, "base_index": 2, "new_base": "G"}),
+        Insertion(0.7, {"copy_index": 0, "insertion_index": 0}),
+        Deletion(
+            1.25, {"repeat_index": 2, "split_index": -1, "block_deletion_length": 2}
+        ),
+        InsertionDeletion(
+            1.5,
+            {
+                "copy_index": 3,
+                "insertion_index": 4,
+                "deletion_repeat_index": 1,
+                "deletion_split_index": 5,
+            },
+        ),
+        Mutation(2.0, {"repeat_index": 0, "base_index": 0, "new_base": "T"}),
+    ]
+
+
+class TestEventLog(unittest.TestCase):
+    def test_record(self) -> None:
+        events = example_events()
+        event_log = EventLog()
+        self.assertEqual(event_log.record(3, iter(events)), 5)
+        self.assertEqual(event_log.record(7, events[:2]), 2)
+        self.assertEqual(len(event_log), 7)
+        self.assertEqual(len(event_log.columns["Mutation"]), 3)
+        self.assertEqual(event_log.run_indices(), {3, 7})
+
+        self.assertEqual(
+            [event_to_tuple(event) for event in event_log.events(3)],
+            [event_to_tuple(event) for event in events],
+        )
+        self.assertEqual(
+            [event_to_tuple(event) for event in event_log.events(7)],
+            [event_to_tuple(event) for event in events[:2]],
+        )
+        self.assertEqual(event_log.events(0), [])
+
+        # optional fields are stored with their defaults
+        event_log = EventLog()
+        event_log.record(0, [Deletion(1.0, {"repeat_index": 2})])
+        self.assertEqual(
+            event_log.events(0)[0].actions,
+            {"repeat_index": 2, "split_index": -1, "block_deletion_length": 1},
+        )
+
+        class Unknown(Insertion):
+            pass
+
+        with self.assertRaises(ValueError):
+            EventLog().record(0, [Unknown(0.0, {})])
+
+    def test_extend(self) -> None:
+        events = example_events()
+        first, second = EventLog(), EventLog()
+        first.record(0, events)
+        second.record(1, events[::-1])
+        second.add_rows("Insertion", [(2, 0, 0.1, 5, 6)])
+        first.extend(second)
+        self.assertEqual(len(first), 11)
+        self.assertEqual(first.run_indices(), {0, 1, 2})
+        self.assertEqual(
+            first.events(2)[0].actions, {"copy_index": 5, "insertion_index": 6}
+        )
+
+    def test_pickle(self) -> None:
+        event_log = EventLog()
+        event_log.record(0, example_events())
+        copy = pickle.loads(pickle.dumps(event_log))
+        self.assertEqual(
+            [event_to_tuple(event) for event in copy.events(0)],
+            [event_to_tuple(event) for event in event_log.events(0)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+from random import Random
+import unittest
+
+import numpy as np
+
+from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
+from crisprmutsim.CRISPR.simulation.events.deletion import DeletionGenerator
+from crisprmutsim.helpers import (
+    geometric_mean_alpha,
+    geometric_mean_alpha_batch,
+    geometric_sampler,
+)
+
+
+class TestHelpers(unittest.TestCase):
+    def test_geometric_sampler(self) -> None:
+        num_samples = 20000
+        for alpha in [1.0, 1.5, 4.0, 50.0]:
+            sample = geometric_sampler(alpha)
+            rng = Random(0)
+            samples = [sample(rng) for _ in range(num_samples)]
+
+            # one draw per sample
+            reference = Random(0)
+            for _ in range(num_samples):
+                reference.random()
+            self.assertEqual(rng.getstate(), reference.getstate())
+
+            self.assertGreaterEqual(min(samples), 1)
+            self.assertAlmostEqual(sum(samples) / num_samples / alpha, 1.0, delta=0.03)
+            self.assertAlmostEqual(
+                samples.count(1) / num_samples, 1 / alpha, delta=0.015
+            )
+
+            legacy = [geometric_mean_alpha(rng, alpha) for _ in range(num_samples)]
+            self.assertAlmostEqual(
+                sum(legacy) / num_samples,
+                sum(samples) / num_samples,
+                delta=0.05 * alpha,
+            )
+
+            batch = geometric_mean_alpha_batch(
+                np.random.default_rng(0), alpha, num_samples
+            )
+            self.assertGreaterEqual(batch.min(), 1)
+            self.assertAlmostEqual(batch.mean() / alpha, 1.0, delta=0.03)
+
+    def test_legacy_block_length_sampling(self) -> None:
+        array = RawCRISPRArray(["AAAA"] * 40)
+        parameters = {"leader_offset": 1, "mean_block_deletion_length": 3.0}
+        gen = DeletionGenerator(
+            parameters={**parameters, "legacy_block_length_sampling": True}, rate=1.0
+        )
+
+        # same draws as before: repeat index, then one draw per block length trial
+        rng, reference = Random(3), Random(3)
+        for _ in range(100):
+            actions = gen.generate(rng, 0.0, array).actions
+            repeat_idx = reference.randint(1, len(array) - 2)
+            block_len = min(
+                geometric_mean_alpha(reference, 3.0), len(array) - repeat_idx
+            )
+            self.assertEqual(actions["repeat_index"], repeat_idx)
+            self.assertEqual(actions["block_deletion_length"], block_len)
+
+        # default: a single draw for the block length
+        gen = DeletionGenerator(parameters=parameters, rate=1.0)  # type: ignore
+        rng, reference = Random(3), Random(3)
+        for _ in range(100):
+            gen.generate(rng, 0.0, array)
+            reference.randint(1, len(array) - 2)
+            reference.random()
+        self.assertEqual(rng.getstate(), reference.getstate())
+
+
+if __name__ == "__main__":
+    unittest.main()
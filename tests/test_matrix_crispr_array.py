@@ -0,0 +1,138 @@
+import pickle
+import random
+import unittest
+from random import Random
+
+from crisprmutsim.CRISPR.matrix_crispr_array import MatrixCRISPRArray
+from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
+from crisprmutsim.CRISPR.simulation.events.deletion import (
+    Deletion,
+    DeletionGenerator,
+    DeletionRateConverter,
+)
+from crisprmutsim.CRISPR.simulation.events.insertion import (
+    Insertion,
+    InsertionGenerator,
+)
+from crisprmutsim.CRISPR.simulation.events.insertion_deletion import (
+    InsertionDeletion,
+)
+from crisprmutsim.CRISPR.simulation.events.mutation import (
+    Mutation,
+    MutationGenerator,
+    MutationRateConverter,
+)
+from crisprmutsim.CRISPR.simulation.simulation import run_crispr_poisson_process
+
+
+class TestMatrixCrisprArray(unittest.TestCase):
+    def test_declare(self) -> None:
+        a = MatrixCRISPRArray(["ACGT", "tgca"])
+        self.assertEqual(len(a), 2)
+        self.assertEqual(a.repeat_length, 4)
+        self.assertEqual(a[0], "ACGT")
+        self.assertEqual(a[-1], "TGCA")
+        self.assertEqual(a, ["ACGT", "TGCA"])
+        self.assertEqual(a, RawCRISPRArray(["ACGT", "TGCA"]))
+        self.assertEqual(a.to_raw_array(), RawCRISPRArray(["ACGT", "TGCA"]))
+        self.assertEqual(MatrixCRISPRArray.from_shape(2, 3), ["NNN", "NNN"])
+
+        with self.assertRaises(ValueError):
+            MatrixCRISPRArray(["ACGT", "TGC"])
+        with self.assertRaises(ValueError):
+            MatrixCRISPRArray(["ACGX"])
+        with self.assertRaises(IndexError):
+            a[2]
+
+    def test_events(self) -> None:
+        a = MatrixCRISPRArray(["ACGT", "TGCA", "AAAA"])
+
+        a.apply_events([Insertion(0.0, {"copy_index": 1, "insertion_index": 0})])
+        self.assertEqual(a, ["TGCA", "ACGT", "TGCA", "AAAA"])
+        a.apply_events([Insertion(0.0, {"copy_index": 0, "insertion_index": 4})])
+        self.assertEqual(a, ["TGCA", "ACGT", "TGCA", "AAAA", "TGCA"])
+
+        a.apply_events(
+            [Mutation(0.0, {"repeat_index": 3, "base_index": 1, "new_base": "C"})]
+        )
+        self.assertEqual(a, ["TGCA", "ACGT", "TGCA", "ACAA", "TGCA"])
+
+        a.apply_events([Deletion(0.0, {"repeat_index": 0, "block_deletion_length": 2})])
+        self.assertEqual(a, ["TGCA", "ACAA", "TGCA"])
+
+        a.apply_events([Deletion(0.0, {"repeat_index": 0, "split_index": 2})])
+        self.assertEqual(a, ["TGAA", "TGCA"])
+
+        a.apply_events(
+            [
+                InsertionDeletion(
+                    0.0,
+                    {
+                        "copy_index": 0,
+                        "insertion_index": 0,
+                        "deletion_repeat_index": 1,
+                    },
+                )
+            ]
+        )
+        self.assertEqual(a, ["TGAA", "TGAA"])
+
+        with self.assertRaises(IndexError):
+            a.apply_events([Insertion(0.0, {"copy_index": 0, "insertion_index": 5})])
+        with self.assertRaises(IndexError):
+            a.apply_events(
+                [Mutation(0.0, {"repeat_index": 0, "base_index": 4, "new_base": "A"})]
+            )
+
+    def test_growth(self) -> None:
+        a = MatrixCRISPRArray(["ACGT"])
+        for _ in range(100):
+            a.__unsafe_apply_insertion__(0, 0)
+            a.__unsafe_apply_insertion__(0, len(a))
+        self.assertEqual(len(a), 201)
+        self.assertTrue(all(repeat == "ACGT" for repeat in a))
+
+        a.__unsafe_apply_deletion__(10, 150)
+        self.assertEqual(len(a), 51)
+
+    def test_same_as_raw_array(self) -> None:
+        event_generators = [
+            MutationGenerator({}, rate=MutationRateConverter(0.05)),
+            InsertionGenerator(
+                {"anchor": "proximal", "randomize": "uniform"}, rate=3.0
+            ),
+            DeletionGenerator(
+                {"split_offset": 3, "mean_block_deletion_length": 2.0},
+                rate=DeletionRateConverter(0.1),
+            ),
+        ]
+
+        for seed in range(20):
+            raw = RawCRISPRArray([["N"] * 12] * 10, unsafe=True)
+            matrix = MatrixCRISPRArray.from_shape(10, 12)
+            raw_events = list(
+                run_crispr_poisson_process(Random(seed), 10.0, raw, event_generators)
+            )
+            matrix_events = list(
+                run_crispr_poisson_process(Random(seed), 10.0, matrix, event_generators)
+            )
+
+            self.assertEqual(list(map(str, raw_events)), list(map(str, matrix_events)))
+            self.assertEqual(matrix, raw)
+
+            random.seed(seed)
+            raw_stats = raw.all_stats()
+            random.seed(seed)
+            self.assertEqual(matrix.all_stats(), raw_stats)
+
+    def test_pickle(self) -> None:
+        a = MatrixCRISPRArray(["ACGT", "TGCA"])
+        b = pickle.loads(pickle.dumps(a))
+        self.assertEqual(a, b)
+        b.__unsafe_apply_mutation__(0, 0, "G")
+        self.assertEqual(b, ["GCGT", "TGCA"])
+        self.assertEqual(a, ["ACGT", "TGCA"])
+
+
+if __name__ == "__main__":
+    unittest.main()
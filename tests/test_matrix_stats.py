@@ -0,0 +1,254 @@
+import random
+import unittest
+
+import numpy as np
+
+from crisprmutsim.CRISPR.array_stats import ArrayStats
+from crisprmutsim.CRISPR.dna_sequence import IUPAC_BASES
+from crisprmutsim.CRISPR.crispr_array import CRISPRArray
+from crisprmutsim.CRISPR.matrix_stats import (
+    batch_all_stats,
+    matrix_all_stats,
+    stack_matrices,
+    to_matrix,
+)
+from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
+from crisprmutsim.CRISPR.simulation.events.mutation import MutationActions
+
+
+# original per-column loop implementation, kept as reference
+def reference_consensus(self: list[str]) -> str:
+    array_length = len(self)
+    if array_length == 0:
+        return ""
+    repeat_length = len(self[0])
+    consensus: list[str] = [""] * repeat_length
+
+    for j in range(repeat_length):
+        counts: dict[str, int] = {base: 0 for base in IUPAC_BASES}
+        for i in range(array_length):
+            base = self[i][j]
+            counts[base] = counts[base] + 1
+
+        max_count = max(counts.values())
+
+        # all bases with max_count
+        most_frequent = [base for base, count in counts.items() if count == max_count]
+
+        # random select if tie
+        consensus[j] = random.choice(most_frequent)
+
+    return "".join(consensus)
+
+
+def reference_all_stats(
+    self: list[str], min_line_length: int = 3, max_gap_length: int = 5
+) -> ArrayStats:
+    array_length = len(self)
+    if array_length == 0:
+        return ArrayStats.empty()
+    repeat_length = len(self[0])
+    mutation_diff_consensus: list[MutationActions] = []
+    mutation_diff_proximal: list[MutationActions] = []
+    mutation_diff_distal: list[MutationActions] = []
+    mutation_count_consensus = 0
+    mutation_count_proximal = 0
+    mutation_count_distal = 0
+    patterns: set[int] = set()
+
+    consensus = reference_consensus(self)
+
+    for j in range(repeat_length):
+        mismatch_lines: list[tuple[int, int]] = []  # (start_index, length)
+        i = 0
+        while i < array_length:
+            while i < array_length and self[i][j] == consensus[j]:
+                if self[i][j] != self[0][j]:
+                    mutation_diff_proximal.append(
+                        {"repeat_index": i, "base_index": j, "new_base": self[i][j]}
+                    )
+                    mutation_count_proximal += 1
+                if self[i][j] != self[-1][j]:
+                    mutation_diff_distal.append(
+                        {"repeat_index": i, "base_index": j, "new_base": self[i][j]}
+                    )
+                    mutation_count_distal += 1
+                i += 1
+            if i == array_length:
+                break
+            # count a line
+            line_start_idx = i
+            while i < array_length and self[i][j] != consensus[j]:
+                mutation_diff_consensus.append(
+                    {"repeat_index": i, "base_index": j, "new_base": self[i][j]}
+                )
+                mutation_count_consensus += 1
+                if self[i][j] != self[0][j]:
+                    mutation_diff_proximal.append(
+                        {"repeat_index": i, "base_index": j, "new_base": self[i][j]}
+                    )
+                    mutation_count_proximal += 1
+                if self[i][j] != self[-1][j]:
+                    mutation_diff_distal.append(
+                        {"repeat_index": i, "base_index": j, "new_base": self[i][j]}
+                    )
+                    mutation_count_distal += 1
+                i += 1
+            line_length = i - line_start_idx
+            mismatch_lines.append((line_start_idx, line_length))
+
+        # split mismatch_lines into groups separated by large gaps;
+        #    each group represents an independent pattern
+        groups: list[list[tuple[int, int]]] = []
+        if len(mismatch_lines) > 0:
+            current_group: list[tuple[int, int]] = [mismatch_lines[0]]
+
+            for k in range(1, len(mismatch_lines)):
+                prev_start, prev_length = current_group[-1]
+                curr_start, _ = mismatch_lines[k]
+                gap = curr_start - (prev_start + prev_length)
+
+                if gap <= max_gap_length:
+                    current_group.append(mismatch_lines[k])
+                else:
+                    # gap too large, save current group and start a new one
+                    groups.append(current_group)
+                    current_group = [mismatch_lines[k]]
+
+            groups.append(current_group)
+
+        # check each group for patterns
+        for group in groups:
+            if len(group) > 2:  # Dotted pattern (Pattern 4 or 5)
+                if j == 0:
+                    patterns.add(5)  # Dotted at first column (Pattern 5)
+                elif j == repeat_length - 1:
+                    patterns.add(6)  # Pattern 5 at last column
+                else:
+                    patterns.add(4)  # Pattern 4
+            elif len(group) == 2:  # Split Line (Pattern 3)
+                # at least one line must be long enough
+                if any(line[1] >= min_line_length for line in group):
+                    patterns.add(3)
+            elif len(group) == 1:  # one Line
+                start_idx, length = group[0]
+                if length >= min_line_length:
+                    end_idx = start_idx + length - 1
+                    # Line: line starts at top or bottom (Pattern 1)
+                    if start_idx == 0 or end_idx == array_length - 1:
+                        patterns.add(1)
+                    else:  # Floating line (2 flips) (Pattern 2)
+                        patterns.add(2)
+
+    return ArrayStats(
+        consensus_repeat=str(consensus),
+        array_length=array_length,
+        repeat_length=repeat_length,
+        mutation_diff_consensus=mutation_diff_consensus,
+        mutation_diff_proximal=mutation_diff_proximal,
+        mutation_diff_distal=mutation_diff_distal,
+        mutation_count_consensus=mutation_count_consensus,
+        mutation_count_proximal=mutation_count_proximal,
+        mutation_count_distal=mutation_count_distal,
+        patterns=patterns,
+    )
+
+
+def random_array(
+    rng: random.Random, array_length: int, repeat_length: int, bases: str
+) -> list[str]:
+    # mostly-conserved columns with runs of mismatches, so all patterns show up
+    template = [rng.choice(bases) for _ in range(repeat_length)]
+    array = [template.copy() for _ in range(array_length)]
+    for j in range(repeat_length):
+        for _ in range(rng.randint(0, 4)):
+            start = rng.randrange(array_length)
+            stop = min(array_length, start + rng.randint(1, 6))
+            for i in range(start, stop):
+                array[i][j] = rng.choice(bases)
+    return ["".join(repeat) for repeat in array]
+
+
+class TestMatrixStats(unittest.TestCase):
+    def test_to_matrix(self) -> None:
+        m = to_matrix(["ACGT", "TGCA"])
+        self.assertEqual(m.shape, (2, 4))
+        self.assertEqual(m.tobytes(), b"ACGTTGCA")
+        self.assertEqual(to_matrix([]).shape, (0, 0))
+        with self.assertRaises(ValueError):
+            to_matrix(["ACGT", "TGC"])
+
+    def test_empty(self) -> None:
+        self.assertEqual(
+            matrix_all_stats(np.zeros((0, 0), dtype=np.uint8)), ArrayStats.empty()
+        )
+        self.assertEqual(RawCRISPRArray([]).all_stats(), ArrayStats.empty())
+        self.assertEqual(RawCRISPRArray([]).consensus(), "")
+
+    def test_same_as_reference(self) -> None:
+        rng = random.Random(0)
+        for k in range(300):
+            array_length = rng.randint(1, 30)
+            repeat_length = rng.randint(1, 12)
+            bases = "ACGT" if k % 3 else IUPAC_BASES
+            array = random_array(rng, array_length, repeat_length, bases)
+            min_line_length = rng.randint(1, 4)
+            max_gap_length = rng.randint(0, 6)
+
+            random.seed(k)
+            expected = reference_all_stats(array, min_line_length, max_gap_length)
+            expected_state = random.getstate()
+            random.seed(k)
+            stats = RawCRISPRArray(array).all_stats(min_line_length, max_gap_length)
+            self.assertEqual(stats, expected)
+            # same number of random draws for tie-breaking
+            self.assertEqual(random.getstate(), expected_state)
+
+            random.seed(k)
+            expected_consensus = reference_consensus(array)
+            random.seed(k)
+            self.assertEqual(str(RawCRISPRArray(array).consensus()), expected_consensus)
+
+    def test_stack_matrices(self) -> None:
+        tensor, lengths = stack_matrices([to_matrix(["AC", "GT"]), to_matrix(["TT"])])
+        self.assertEqual(tensor.shape, (2, 2, 2))
+        self.assertEqual(lengths.tolist(), [2, 1])
+        self.assertEqual(tensor[1, 1].tolist(), [0, 0])
+        with self.assertRaises(ValueError):
+            stack_matrices([to_matrix(["AC"]), to_matrix(["ACG"])])
+
+    def test_batch_same_as_single(self) -> None:
+        rng = random.Random(1)
+        arrays: list[list[str]] = []
+        for k in range(200):
+            if k % 25 == 0:
+                arrays.append([])
+                continue
+            repeat_length = rng.choice([4, 7, 12])
+            arrays.append(
+                random_array(rng, rng.randint(1, 30), repeat_length, IUPAC_BASES)
+            )
+
+        random.seed(2)
+        expected = [RawCRISPRArray(array).all_stats(2, 3) for array in arrays]
+        expected_state = random.getstate()
+        random.seed(2)
+        stats = batch_all_stats([to_matrix(array) for array in arrays], 2, 3)
+        self.assertEqual(stats, expected)
+        self.assertEqual(random.getstate(), expected_state)
+        self.assertEqual(batch_all_stats([]), [])
+
+    def test_crispr_array_from_raw_arrays(self) -> None:
+        raw_arrays = [RawCRISPRArray(["ACGT", "ACGA", "TCGA"]), RawCRISPRArray(["AC"])]
+        random.seed(0)
+        expected = [
+            CRISPRArray.from_raw_array(str(i), "I-E", raw_array)
+            for i, raw_array in enumerate(raw_arrays)
+        ]
+        random.seed(0)
+        arrays = CRISPRArray.from_raw_arrays(["0", "1"], ["I-E", "I-E"], raw_arrays)
+        self.assertEqual(arrays, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import pickle
+import unittest
+
+from crisprmutsim.CRISPR.array_stats import ArrayStats
+from crisprmutsim.CRISPR.mutation_diff import MutationDiff
+from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
+
+
+class TestMutationDiff(unittest.TestCase):
+    def test_declare(self) -> None:
+        actions = [
+            {"repeat_index": 0, "base_index": 2, "new_base": "A"},
+            {"repeat_index": 3, "base_index": 1, "new_base": "N"},
+        ]
+        diff = MutationDiff.from_actions(actions)
+        self.assertEqual(len(diff), 2)
+        self.assertEqual(diff[1], actions[1])
+        self.assertEqual(diff[-1], actions[1])
+        self.assertEqual(list(diff), actions)
+        self.assertEqual(diff, actions)
+        self.assertEqual(actions, diff)
+        self.assertEqual(diff, MutationDiff([0, 3], [2, 1], b"AN"))
+        self.assertEqual(diff[1:], actions[1:])
+        self.assertIsInstance(diff[1:], MutationDiff)
+        self.assertNotEqual(diff, actions[:1])
+        self.assertEqual(MutationDiff(), [])
+
+        with self.assertRaises(ValueError):
+            MutationDiff([0, 1], [0], b"A")
+        with self.assertRaises(IndexError):
+            diff[2]
+
+    def test_json(self) -> None:
+        diff = MutationDiff([0, 3], [2, 1], b"AN")
+        self.assertEqual(MutationDiff.from_json(diff.to_json()), diff)
+        self.assertEqual(MutationDiff.from_json("[]"), MutationDiff())
+
+    def test_bytes(self) -> None:
+        diff = MutationDiff([0, 300], [2, 1], b"AN")
+        self.assertEqual(diff.to_bytes(), b"\x00\x00\x2c\x01\x02\x00\x01\x00AN")
+        self.assertEqual(MutationDiff.from_bytes(diff.to_bytes()), diff)
+        self.assertEqual(MutationDiff.from_bytes(b""), MutationDiff())
+        with self.assertRaises(ValueError):
+            MutationDiff.from_bytes(b"\x00")
+
+    def test_pickle(self) -> None:
+        diff = MutationDiff([0, 3], [2, 1], b"AN")
+        self.assertEqual(pickle.loads(pickle.dumps(diff)), diff)
+
+        stats = RawCRISPRArray(["ACGT", "ACGT", "TCGA"]).all_stats()
+        self.assertIsInstance(stats.mutation_diff_distal, MutationDiff)
+        self.assertEqual(pickle.loads(pickle.dumps(stats)), stats)
+
+    def test_array_stats_round_trip(self) -> None:
+        raw = RawCRISPRArray(["ACGT", "ACGT", "TCGA", "ACGG"])
+        stats = raw.all_stats()
+        self.assertEqual(RawCRISPRArray.from_array_stats(stats), raw)
+        self.assertEqual(
+            ArrayStats.from_json(
+                '{"consensus_repeat": "ACGT", "array_length": 2, "repeat_length": 4,'
+                ' "mutation_count_consensus": 1, "mutation_count_proximal": 0,'
+                ' "mutation_count_distal": 1,'
+                ' "mutation_diff_consensus": '
+                '[{"repeat_index": 1, "base_index": 0, "new_base": "T"}],'
+                ' "mutation_diff_proximal": [], "mutation_diff_distal": '
+                '[{"repeat_index": 1, "base_index": 0, "new_base": "T"}],'
+                ' "patterns": []}'
+            ).mutation_diff_consensus,
+            MutationDiff([1], [0], b"T"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+import json
+import os
+import tempfile
+import unittest
+
+from crisprmutsim.CRISPR.matrix_crispr_array import MatrixCRISPRArray
+from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
+from crisprmutsim.CRISPR.simulation.events.deletion import (
+    DeletionGenerator,
+    DeletionRateConverter,
+)
+from crisprmutsim.CRISPR.simulation.events.insertion import InsertionGenerator
+from crisprmutsim.CRISPR.simulation.events.mutation import (
+    MutationGenerator,
+    MutationRateConverter,
+)
+from crisprmutsim.CRISPR.simulation.replay import event_generators_from_json, replay
+import crisprmutsim.CRISPR.simulation.simulation as simulation
+import crisprmutsim.CRISPR.storage as db
+from crisprmutsim.simulation.event import event_generators_to_json, event_to_tuple
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self) -> None:
+        handle, self.filename = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        os.remove(self.filename)
+        self.event_generators = [
+            MutationGenerator({}, rate=MutationRateConverter(0.1)),
+            InsertionGenerator({"anchor": "distal", "randomize": "uniform"}, rate=1.0),
+            DeletionGenerator(
+                {"leader_offset": 1, "mean_block_deletion_length": 1.5},
+                rate=DeletionRateConverter(0.1),
+            ),
+        ]
+
+    def tearDown(self) -> None:
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(self.filename + suffix):
+                os.remove(self.filename + suffix)
+
+    def store(self, **kwargs) -> dict:
+        simulation.run_and_store_results(
+            self.filename,
+            100,
+            2.0,
+            5,
+            10,
+            self.event_generators,
+            4,
+            num_workers=1,
+            **kwargs,
+        )
+        with db.database(self.filename) as con:
+            info = db.load_simulation_info(con)
+            assert info is not None
+            return info
+
+    def test_generators_json(self) -> None:
+        json_str = event_generators_to_json(self.event_generators)
+        event_generators = event_generators_from_json(json_str)
+        self.assertEqual(event_generators_to_json(event_generators), json_str)
+        self.assertIsInstance(event_generators[0]._rate, MutationRateConverter)
+        self.assertEqual(event_generators[1]._rate, 1.0)
+
+        # callables that are not rate converters cannot be rebuilt
+        json_str = event_generators_to_json(
+            [MutationGenerator({}, rate=lambda t, obj: 1.0)]
+        )
+        with self.assertRaises(ValueError):
+            event_generators_from_json(json_str)
+        with self.assertRaises(ValueError):
+            event_generators_from_json(
+                event_generators_to_json(self.event_generators, opaque_rates=True)
+            )
+
+    def test_replay(self) -> None:
+        info = self.store(engine="direct", record_events=True)
+        with db.database(self.filename) as con:
+            stored = db.load_array(con, "2")
+            assert stored is not None
+            recorded = db.load_event_log(con).events(2)
+
+        array, events = replay(info, 2)
+        self.assertEqual(len(array), 5)  # lazily: nothing simulated yet
+        events = list(events)
+        self.assertEqual(
+            [event_to_tuple(event) for event in events],
+            [event_to_tuple(event) for event in recorded],
+        )
+        self.assertEqual(
+            RawCRISPRArray.from_array_stats(stored.repeat_stats),
+            RawCRISPRArray.from_array_stats(array.all_stats()),
+        )
+
+        # stopped at time 1: the events up to 1, applied
+        array, events = replay(info, 2, until=1.0)
+        events = list(events)
+        self.assertEqual(
+            [event_to_tuple(event) for event in events],
+            [event_to_tuple(event) for event in recorded if event.time <= 1.0],
+        )
+        expected = MatrixCRISPRArray.from_shape(5, 10)
+        expected.apply_events(events)
+        self.assertEqual(array, expected)
+
+        array, events = replay(info, 2, until=0.0)
+        self.assertEqual(list(events), [])
+        self.assertEqual(array, MatrixCRISPRArray.from_shape(5, 10))
+
+    def test_replay_engines(self) -> None:
+        info = self.store(engine="analytic")
+        with db.database(self.filename) as con:
+            stored = db.load_array(con, "1")
+            assert stored is not None
+        array, events = replay(info, 1)
+        list(events)
+        self.assertEqual(
+            RawCRISPRArray.from_array_stats(stored.repeat_stats),
+            RawCRISPRArray.from_array_stats(array.all_stats()),
+        )
+        with self.assertRaises(ValueError):
+            replay(info, 1, until=1.0)
+
+        info["engine"] = "ensemble"
+        array, events = replay(info, 1)
+        self.assertEqual(list(events), [])
+        self.assertEqual(array.repeat_length, 10)
+
+    def test_legacy_sampling(self) -> None:
+        # a file written before legacy_block_length_sampling: no flag in the JSON
+        parameters = {"mean_block_deletion_length": 2.5}
+        self.event_generators = [
+            MutationGenerator({}, rate=MutationRateConverter(0.1)),
+            DeletionGenerator(
+                {**parameters, "legacy_block_length_sampling": True},
+                rate=DeletionRateConverter(0.5),
+            ),
+        ]
+        info = self.store()
+        entries = json.loads(info["event_generators"])
+        del entries[1]["parameters"]["legacy_block_length_sampling"]
+        info["event_generators"] = json.dumps(entries)
+        with db.database(self.filename) as con:
+            con.execute(
+                "UPDATE simulation_info SET event_generators = ?",
+                (info["event_generators"],),
+            )
+            expected = db.load_arrays(con)
+            con.execute("DELETE FROM arrays WHERE id IN ('1', '3')")
+
+        for array in expected:
+            replayed, events = replay(info, int(array.id))
+            list(events)
+            self.assertEqual(
+                RawCRISPRArray.from_array_stats(array.repeat_stats),
+                RawCRISPRArray.from_array_stats(replayed.all_stats()),
+            )
+        # the current sampler gives other arrays
+        info["event_generators"] = event_generators_to_json(
+            [
+                self.event_generators[0],
+                DeletionGenerator(parameters, rate=DeletionRateConverter(0.5)),
+            ]
+        )
+        replayed_arrays = []
+        for array in expected:
+            replayed, events = replay(info, int(array.id))
+            list(events)
+            replayed_arrays.append(
+                RawCRISPRArray.from_array_stats(replayed.all_stats())
+            )
+        self.assertNotEqual(
+            replayed_arrays,
+            [RawCRISPRArray.from_array_stats(array.repeat_stats) for array in expected],
+        )
+
+        # resumed with the sampling of the stored runs
+        simulation.run_and_store_results(
+            self.filename,
+            100,
+            2.0,
+            5,
+            10,
+            [
+                self.event_generators[0],
+                DeletionGenerator(parameters, rate=DeletionRateConverter(0.5)),
+            ],
+            4,
+            num_workers=1,
+            resume=True,
+        )
+        with db.database(self.filename) as con:
+            self.assertEqual(
+                [
+                    RawCRISPRArray.from_array_stats(array.repeat_stats)
+                    for array in db.load_arrays(con)
+                ],
+                [
+                    RawCRISPRArray.from_array_stats(array.repeat_stats)
+                    for array in expected
+                ],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+from random import Random
+import unittest
+
+import numpy as np
+
+from crisprmutsim.CRISPR.matrix_crispr_array import MatrixCRISPRArray
+from crisprmutsim.CRISPR.simulation.events.insertion import InsertionGenerator
+from crisprmutsim.CRISPR.simulation.events.mutation import (
+    MutationGenerator,
+    MutationRateConverter,
+)
+from crisprmutsim.CRISPR.simulation.simulation import run_crispr_poisson_process
+from crisprmutsim.simulation.rng import NumpyRandom, make_rng, numpy_generator
+
+
+class TestRng(unittest.TestCase):
+    def test_streams(self) -> None:
+        a = NumpyRandom.for_run(42, 3)
+        b = NumpyRandom.for_run(42, 3)
+        self.assertEqual(
+            [a.random() for _ in range(3000)], [b.random() for _ in range(3000)]
+        )
+
+        # same stream as spawning from the base seed
+        spawned = np.random.SeedSequence(42).spawn(4)[3]
+        c = np.random.Generator(np.random.PCG64(spawned))
+        self.assertEqual(NumpyRandom.for_run(42, 3).generator.random(), c.random())
+
+        self.assertNotEqual(
+            NumpyRandom.for_run(42, 3).random(), NumpyRandom.for_run(42, 4).random()
+        )
+        self.assertNotEqual(
+            NumpyRandom.for_run(42, 3).random(), NumpyRandom.for_run(43, 3).random()
+        )
+
+        # legacy backend: consecutive integer seeds
+        self.assertEqual(make_rng("random", 42, 3).random(), Random(45).random())
+        self.assertIsInstance(make_rng("numpy", 42, 3), NumpyRandom)
+        with self.assertRaises(ValueError):
+            make_rng("unknown", 42, 3)  # type: ignore
+
+    def test_draws(self) -> None:
+        rng = NumpyRandom(0)
+        num_draws = 20000
+
+        values = [rng.randint(2, 5) for _ in range(num_draws)]
+        self.assertEqual(set(values), {2, 3, 4, 5})
+        for value in range(2, 6):
+            self.assertAlmostEqual(values.count(value) / num_draws, 0.25, delta=0.015)
+        self.assertEqual(rng.randint(7, 7), 7)
+        with self.assertRaises(ValueError):
+            rng.randint(1, 0)
+
+        choices = [rng.choice("ACG") for _ in range(num_draws)]
+        for base in "ACG":
+            self.assertAlmostEqual(choices.count(base) / num_draws, 1 / 3, delta=0.015)
+        with self.assertRaises(IndexError):
+            rng.choice("")
+
+        waiting_times = [rng.expovariate(4.0) for _ in range(num_draws)]
+        self.assertGreater(min(waiting_times), 0.0)
+        self.assertAlmostEqual(sum(waiting_times) / num_draws, 0.25, delta=0.01)
+
+        for k in [1, 8, 64, 100]:
+            bits = [rng.getrandbits(k) for _ in range(200)]
+            self.assertTrue(all(0 <= value < 2**k for value in bits))
+            self.assertGreater(max(bits), 2 ** (k - 1) - 1)
+
+    def test_numpy_generator(self) -> None:
+        rng = NumpyRandom(0)
+        self.assertIs(numpy_generator(rng), rng.generator)
+        self.assertEqual(
+            numpy_generator(Random(0)).random(), numpy_generator(Random(0)).random()
+        )
+
+    def test_engines(self) -> None:
+        event_generators = [
+            MutationGenerator({}, rate=MutationRateConverter(0.05)),
+            InsertionGenerator(
+                {"anchor": "proximal", "randomize": "uniform"}, rate=1.0
+            ),
+        ]
+        for engine in ["first_reaction", "direct", "tau_leaping", "analytic"]:
+            arrays = []
+            for _ in range(2):
+                array = MatrixCRISPRArray.from_shape(10, 10)
+                list(
+                    run_crispr_poisson_process(
+                        NumpyRandom.for_run(0, 1), 10.0, array, event_generators, engine  # type: ignore
+                    )
+                )
+                arrays.append(list(array))
+            self.assertEqual(arrays[0], arrays[1])
+            self.assertGreater(len(arrays[0]), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,410 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from crisprmutsim.CRISPR.dataset_stats import DatasetStats, DatasetStatsAccumulator
+from crisprmutsim.CRISPR.matrix_crispr_array import MatrixCRISPRArray
+from crisprmutsim.CRISPR.raw_crispr_array import RawCRISPRArray
+import crisprmutsim.CRISPR.simulation.simulation as simulation
+from crisprmutsim.CRISPR.simulation.events.insertion import InsertionGenerator
+from crisprmutsim.CRISPR.simulation.events.mutation import (
+    MutationGenerator,
+    MutationRateConverter,
+)
+from crisprmutsim.simulation.event import event_generators_to_json, event_to_tuple
+from crisprmutsim.simulation.rng import make_rng
+import crisprmutsim.CRISPR.storage as db
+
+
+class TestSimulation(unittest.TestCase):
+    def setUp(self) -> None:
+        handle, self.filename = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        os.remove(self.filename)
+        self.event_generators = [
+            MutationGenerator({}, rate=MutationRateConverter(0.1)),
+        ]
+
+    def tearDown(self) -> None:
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(self.filename + suffix):
+                os.remove(self.filename + suffix)
+
+    def test_run_and_store_results(self) -> None:
+        progress: list[int] = []
+        simulation.run_and_store_results(
+            self.filename,
+            100,
+            1.0,
+            5,
+            10,
+            self.event_generators,
+            7,
+            num_workers=2,
+            progress_callback=lambda count, total: progress.append(count),
+            commit_interval=3,
+        )
+        self.assertEqual(progress, list(range(1, 8)))
+
+        with db.database(self.filename) as con:
+            info = db.load_simulation_info(con)
+            assert info is not None
+            self.assertEqual(info["num_runs"], 7)
+            self.assertEqual(db.load_array_ids(con), [str(i) for i in range(7)])
+
+            for id in ["0", "6"]:
+                array = db.load_array(con, id)
+                assert array is not None
+                _, stats = simulation.run_single(
+                    100, int(id), 1.0, 5, 10, self.event_generators
+                )
+                self.assertEqual(
+                    array.repeat_stats.mutation_diff_proximal,
+                    stats.mutation_diff_proximal,
+                )
+
+        with self.assertRaises(FileExistsError):
+            simulation.run_and_store_results(
+                self.filename, 0, 1.0, 5, 10, self.event_generators, 1
+            )
+
+    def test_chunks(self) -> None:
+        expected = [
+            simulation.run_single(100, i, 1.0, 5, 10, self.event_generators)
+            for i in range(10)
+        ]
+        for chunk_size in [None, 1, 3, 20]:
+            results = simulation.run_and_iter_results(
+                100, 1.0, 5, 10, self.event_generators, 10, 2, chunk_size=chunk_size
+            )
+            self.assertEqual(sorted(results, key=lambda r: r[0]), expected)
+
+        results = simulation.run_and_iter_results(
+            100, 1.0, 5, 10, self.event_generators, 10, 2, run_indices=[]
+        )
+        self.assertEqual(list(results), [])
+
+    def test_cancel(self) -> None:
+        cancel_event = threading.Event()
+        results = []
+        for result in simulation.run_and_iter_results(
+            100,
+            1.0,
+            5,
+            10,
+            self.event_generators,
+            1000,
+            2,
+            chunk_size=1,
+            cancel_event=cancel_event,
+        ):
+            results.append(result)
+            if len(results) == 3:
+                cancel_event.set()
+        # the chunks already completed in the same wait() may still be yielded
+        self.assertLess(len(results), 1000)
+        self.assertEqual(len({index for index, _ in results}), len(results))
+
+        cancel_event = threading.Event()
+        cancel_event.set()
+        simulation.run_and_store_results(
+            self.filename,
+            100,
+            1.0,
+            5,
+            10,
+            self.event_generators,
+            10,
+            chunk_size=1,
+            cancel_event=cancel_event,
+        )
+        with db.database(self.filename) as con:
+            self.assertEqual(db.load_array_ids(con), [])
+
+    def test_chunk_size(self) -> None:
+        self.assertEqual(simulation._chunk_size(1.0, 1000, 4), 1)
+        self.assertEqual(simulation._chunk_size(0.0, 1000, 4), 62)
+        self.assertEqual(simulation._chunk_size(0.001, 10**6, 4), 200)
+        self.assertEqual(simulation._chunk_size(0.001, 0, 4), 1)
+
+        for chunk_size in [0, -1]:
+            with self.assertRaises(ValueError):
+                list(
+                    simulation.run_parallel(
+                        100, 1.0, 5, 10, self.event_generators, 10, 2, [1], chunk_size
+                    )
+                )
+            with self.assertRaises(ValueError):
+                simulation.run_and_store_results(
+                    self.filename,
+                    100,
+                    1.0,
+                    5,
+                    10,
+                    self.event_generators,
+                    10,
+                    chunk_size=chunk_size,
+                )
+            self.assertFalse(os.path.exists(self.filename))
+
+    def test_resume(self) -> None:
+        simulation.run_and_store_results(
+            self.filename, 100, 1.0, 5, 10, self.event_generators, 7, num_workers=2
+        )
+        with db.database(self.filename) as con:
+            expected = db.load_arrays(con)
+            # as if the run had been interrupted
+            con.execute("DELETE FROM arrays WHERE id IN ('2', '5')")
+
+        progress: list[int] = []
+        simulation.run_and_store_results(
+            self.filename,
+            100,
+            1.0,
+            5,
+            10,
+            self.event_generators,
+            7,
+            num_workers=2,
+            progress_callback=lambda count, total: progress.append(count),
+            resume=True,
+        )
+        self.assertEqual(progress, [6, 7])
+        with db.database(self.filename) as con:
+            self.assertEqual(db.load_arrays(con), expected)
+
+        # nothing left to do
+        simulation.run_and_store_results(
+            self.filename, 100, 1.0, 5, 10, self.event_generators, 7, resume=True
+        )
+        with self.assertRaises(ValueError):
+            simulation.run_and_store_results(
+                self.filename, 101, 1.0, 5, 10, self.event_generators, 7, resume=True
+            )
+        with self.assertRaises(ValueError):
+            simulation.run_and_store_results(
+                self.filename,
+                100,
+                1.0,
+                5,
+                10,
+                self.event_generators,
+                7,
+                resume=True,
+                engine="direct",
+            )
+
+        # files written before the rate converters were serialized
+        with db.database(self.filename) as con:
+            con.execute(
+                "UPDATE simulation_info SET event_generators = ?",
+                (event_generators_to_json(self.event_generators, opaque_rates=True),),
+            )
+        simulation.run_and_store_results(
+            self.filename, 100, 1.0, 5, 10, self.event_generators, 7, resume=True
+        )
+
+    def test_engine(self) -> None:
+        simulation.run_and_store_results(
+            self.filename,
+            100,
+            1.0,
+            5,
+            10,
+            self.event_generators,
+            3,
+            num_workers=1,
+            engine="direct",
+        )
+        with db.database(self.filename) as con:
+            info = db.load_simulation_info(con)
+            assert info is not None
+            self.assertEqual(info["engine"], "direct")
+            array = db.load_array(con, "1")
+            assert array is not None
+            _, stats = simulation.run_single(
+                100, 1, 1.0, 5, 10, self.event_generators, "direct"
+            )
+            self.assertEqual(array.repeat_stats, stats)
+
+    def test_ensemble_engine(self) -> None:
+        simulation.run_and_store_results(
+            self.filename,
+            100,
+            1.0,
+            5,
+            10,
+            self.event_generators,
+            3,
+            num_workers=1,
+            engine="ensemble",
+        )
+        with db.database(self.filename) as con:
+            for id in ["0", "2"]:
+                array = db.load_array(con, id)
+                assert array is not None
+                _, stats = simulation.run_single(
+                    100,
+                    int(id),
+                    1.0,
+                    5,
+                    10,
+                    self.event_generators,
+                    "ensemble",
+                    num_runs=3,
+                )
+                self.assertEqual(
+                    RawCRISPRArray.from_array_stats(array.repeat_stats),
+                    RawCRISPRArray.from_array_stats(stats),
+                )
+
+    def test_record_events(self) -> None:
+        event_generators = [
+            *self.event_generators,
+            InsertionGenerator(
+                {"anchor": "proximal", "randomize": "uniform"}, rate=2.0
+            ),
+        ]
+        simulation.run_and_store_results(
+            self.filename,
+            100,
+            1.0,
+            5,
+            10,
+            event_generators,
+            4,
+            num_workers=2,
+            chunk_size=3,
+            engine="direct",
+            record_events=True,
+        )
+        with db.database(self.filename) as con:
+            event_log = db.load_event_log(con)
+            self.assertEqual(event_log.run_indices(), {0, 1, 2, 3})
+            for id in ["0", "3"]:
+                array = db.load_array(con, id)
+                assert array is not None
+                replayed = MatrixCRISPRArray.from_shape(5, 10)
+                expected = list(
+                    simulation.run_crispr_poisson_process(
+                        make_rng("random", 100, int(id)),
+                        1.0,
+                        replayed,
+                        event_generators,
+                        "direct",
+                    )
+                )
+                events = event_log.events(int(id))
+                self.assertEqual(
+                    [event_to_tuple(event) for event in events],
+                    [event_to_tuple(event) for event in expected],
+                )
+                # the events rebuild the stored array
+                array_from_events = MatrixCRISPRArray.from_shape(5, 10)
+                array_from_events.apply_events(events)
+                self.assertEqual(
+                    RawCRISPRArray.from_array_stats(array.repeat_stats),
+                    RawCRISPRArray.from_array_stats(array_from_events.all_stats()),
+                )
+
+        # resuming must record too
+        with self.assertRaises(ValueError):
+            simulation.run_and_store_results(
+                self.filename,
+                100,
+                1.0,
+                5,
+                10,
+                event_generators,
+                4,
+                resume=True,
+                engine="direct",
+            )
+        with self.assertRaises(ValueError):
+            simulation.run_and_store_results(
+                self.filename + "-tau",
+                100,
+                1.0,
+                5,
+                10,
+                event_generators,
+                4,
+                engine="tau_leaping",
+                record_events=True,
+            )
+
+    def test_dataset_stats(self) -> None:
+        accumulator = DatasetStatsAccumulator()
+        simulation.run_and_store_results(
+            self.filename,
+            100,
+            1.0,
+            5,
+            10,
+            self.event_generators,
+            7,
+            num_workers=2,
+            stats_accumulator=accumulator,
+        )
+        with db.database(self.filename) as con:
+            self.assertFalse(db.has_aggregate_tables(con))
+            expected = DatasetStats.from_arrays(db.load_arrays(con))
+        self.assertEqual(accumulator.finalize(), expected)
+
+        # aggregates for the stored arrays, on resume
+        accumulator = DatasetStatsAccumulator()
+        simulation.run_and_store_results(
+            self.filename,
+            100,
+            1.0,
+            5,
+            10,
+            self.event_generators,
+            7,
+            resume=True,
+            store_aggregates=True,
+            stats_accumulator=accumulator,
+        )
+        self.assertEqual(accumulator.finalize(), expected)
+        with db.database(self.filename) as con:
+            self.assertEqual(
+                DatasetStats.from_aggregates(*db.load_aggregates(con)), expected
+            )
+
+    def test_rng_backend(self) -> None:
+        simulation.run_and_store_results(
+            self.filename,
+            100,
+            1.0,
+            5,
+            10,
+            self.event_generators,
+            4,
+            num_workers=2,
+            rng_backend="numpy",
+        )
+        with db.database(self.filename) as con:
+            info = db.load_simulation_info(con)
+            assert info is not None
+            self.assertEqual(info["rng_backend"], "numpy")
+            for id in ["0", "3"]:
+                array = db.load_array(con, id)
+                assert array is not None
+                _, stats = simulation.run_single(
+                    100, int(id), 1.0, 5, 10, self.event_generators, rng_backend="numpy"
+                )
+                # the consensus tie-breaks depend on the process; the arrays do not
+                self.assertEqual(
+                    RawCRISPRArray.from_array_stats(array.repeat_stats),
+                    RawCRISPRArray.from_array_stats(stats),
+                )
+
+        with self.assertRaises(ValueError):
+            simulation.run_and_store_results(
+                self.filename, 100, 1.0, 5, 10, self.event_generators, 4, resume=True
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
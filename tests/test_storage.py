@@ -0,0 +1,293 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from crisprmutsim.CRISPR.crispr_array import CRISPRArray
+from crisprmutsim.CRISPR.dataset_stats import REFERENCES, DatasetStats
+from crisprmutsim.CRISPR.event_log import EventLog
+from crisprmutsim.CRISPR.simulation.events.deletion import Deletion
+from crisprmutsim.CRISPR.simulation.events.mutation import Mutation
+import crisprmutsim.CRISPR.storage as db
+from tests.fixtures import example_arrays
+
+
+class TestStorage(unittest.TestCase):
+    def setUp(self) -> None:
+        handle, self.filename = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        os.remove(self.filename)
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+    def test_round_trip(self) -> None:
+        arrays = example_arrays()
+        with db.database(self.filename) as con:
+            db.store_meta(con, "file")
+            db.store_arrays(con, arrays)
+
+        with db.database(self.filename) as con:
+            self.assertEqual(db.get_schema_version(con), db.SCHEMA_VERSION)
+            self.assertIsInstance(
+                con.execute("SELECT patterns FROM arrays").fetchone()[0], bytes
+            )
+            self.assertEqual(db.load_arrays(con), arrays)
+            self.assertEqual(db.load_array(con, "b"), arrays[1])
+            self.assertEqual(
+                db.load_array_ids(con, patterns_to_exclude=[0]), ["b", "c"]
+            )
+            self.assertEqual(
+                db.load_array_ids(con, patterns_to_exclude=[1]), ["a", "c"]
+            )
+            self.assertEqual(
+                db.load_array_ids(con, patterns_to_exclude=[2]), ["a", "b"]
+            )
+
+    def test_event_tables(self) -> None:
+        event_log = EventLog()
+        event_log.record(
+            0,
+            [
+                Mutation(0.5, {"repeat_index": 1, "base_index": 2, "new_base": "G"}),
+                Deletion(
+                    0.75,
+                    {"repeat_index": 0, "split_index": 3, "block_deletion_length": 1},
+                ),
+            ],
+        )
+        event_log.record(
+            1, [Mutation(0.25, {"repeat_index": 0, "base_index": 0, "new_base": "A"})]
+        )
+        with db.database(self.filename) as con:
+            db.store_arrays(con, example_arrays())
+            self.assertFalse(db.has_event_tables(con))
+            db.create_event_tables(con)
+            self.assertTrue(db.has_event_tables(con))
+            db.insert_event_log(con, event_log)
+
+        with db.database(self.filename) as con:
+            # queryable without decoding: plain columns, and a view over all types
+            self.assertEqual(
+                con.execute(
+                    "SELECT run_index, seq, time, type_code FROM events ORDER BY time"
+                ).fetchall(),
+                [(1, 0, 0.25, 0), (0, 0, 0.5, 0), (0, 1, 0.75, 2)],
+            )
+            self.assertEqual(
+                con.execute(
+                    "SELECT new_base FROM mutation_events WHERE run_index = 0"
+                ).fetchone(),
+                (ord("G"),),
+            )
+            loaded = db.load_event_log(con)
+            self.assertEqual(len(loaded), 3)
+            self.assertEqual(
+                [event.actions for event in loaded.events(0)],
+                [event.actions for event in event_log.events(0)],
+            )
+            self.assertEqual(db.load_event_log(con, [1]).run_indices(), {1})
+
+            # no arrays with ids "0" or "1"
+            db.delete_orphaned_events(con)
+            self.assertEqual(len(db.load_event_log(con)), 0)
+
+    def test_json_schema(self) -> None:
+        # files written before schema versioning: JSON text columns, no schema_version
+        arrays = example_arrays()
+        con = sqlite3.connect(self.filename)
+        con.execute("CREATE TABLE meta (type TEXT, info TEXT) STRICT")
+        con.execute("INSERT INTO meta VALUES ('file', '')")
+        con.execute("""CREATE TABLE arrays (id TEXT PRIMARY KEY, cas_type TEXT,
+            consensus_repeat TEXT, array_length INTEGER, repeat_length INTEGER,
+            mutation_count_consensus INTEGER, mutation_count_proximal INTEGER,
+            mutation_count_distal INTEGER, mutation_diff_consensus TEXT,
+            mutation_diff_proximal TEXT, mutation_diff_distal TEXT, patterns TEXT
+            ) STRICT""")
+        for array in arrays:
+            data = array.as_flat_dict()
+            for key in [
+                "mutation_diff_consensus",
+                "mutation_diff_proximal",
+                "mutation_diff_distal",
+            ]:
+                data[key] = data[key].to_json()
+            data["patterns"] = json.dumps(sorted(data["patterns"]))
+            con.execute(
+                """INSERT INTO arrays VALUES (:id, :cas_type, :consensus_repeat,
+                :array_length, :repeat_length, :mutation_count_consensus,
+                :mutation_count_proximal, :mutation_count_distal,
+                :mutation_diff_consensus, :mutation_diff_proximal,
+                :mutation_diff_distal, :patterns)""",
+                data,
+            )
+        con.commit()
+        con.close()
+
+        with db.database(self.filename) as con:
+            self.assertEqual(db.get_schema_version(con), 1)
+            self.assertEqual(db.load_arrays(con), arrays)
+            self.assertEqual(
+                db.load_array_ids(con, patterns_to_exclude=[0]), ["b", "c"]
+            )
+            self.assertEqual(
+                db.load_array_ids(con, patterns_to_exclude=[1]), ["a", "c"]
+            )
+
+        with db.database(self.filename) as con:
+            db.migrate(con)
+
+        with db.database(self.filename) as con:
+            self.assertEqual(db.get_schema_version(con), db.SCHEMA_VERSION)
+            self.assertEqual(db.load_arrays(con), arrays)
+            self.assertEqual(
+                db.load_array_ids(con, patterns_to_exclude=[0]), ["b", "c"]
+            )
+            self.assertEqual(
+                db.load_array_ids(con, patterns_to_exclude=[1]), ["a", "c"]
+            )
+
+    def test_pattern_mask(self) -> None:
+        arrays = example_arrays()
+        with db.database(self.filename) as con:
+            db.store_meta(con, "file")
+            db.store_arrays(con, arrays)
+            masks = con.execute("SELECT pattern_mask FROM arrays ORDER BY id")
+            self.assertEqual([row[0] for row in masks], [0, 1 << 1, 1 << 2])
+
+            where_clause, params = db._build_where_clause(patterns_to_exclude=[0, 2])
+            plan = con.execute(
+                f"EXPLAIN QUERY PLAN SELECT id FROM arrays {where_clause}", params
+            ).fetchall()
+            self.assertIn("arrays_pattern_mask", str(plan))
+            self.assertEqual(db.load_array_ids(con, patterns_to_exclude=[0, 2]), ["b"])
+            self.assertEqual(
+                db.load_array_ids(con, patterns_to_exclude=[0, *db.PATTERNS]), []
+            )
+
+            # back to a version 2 file
+            con.execute("DROP TABLE arrays_summary")
+            con.execute("DROP INDEX arrays_filter")
+            con.execute("DROP INDEX arrays_pattern_mask")
+            con.execute("ALTER TABLE arrays DROP COLUMN pattern_mask")
+            con.execute("UPDATE meta SET schema_version = 2")
+
+        with db.database(self.filename) as con:
+            self.assertEqual(db.load_array_ids(con, patterns_to_exclude=[0, 2]), ["b"])
+            db.migrate(con)
+
+        with db.database(self.filename) as con:
+            self.assertEqual(db.get_schema_version(con), db.SCHEMA_VERSION)
+            masks = con.execute("SELECT pattern_mask FROM arrays ORDER BY id")
+            self.assertEqual([row[0] for row in masks], [0, 1 << 1, 1 << 2])
+            self.assertEqual(db.load_arrays(con), arrays)
+            self.assertEqual(db.load_array_ids(con, patterns_to_exclude=[0, 2]), ["b"])
+            self.assertEqual(db.get_cas_types(con), ["I-E", "II-A"])
+            self.assertEqual(db.get_num_arrays(con), 3)
+
+    def test_summary(self) -> None:
+        arrays = example_arrays()
+        with db.database(self.filename) as con:
+            db.store_meta(con, "file")
+            db.store_arrays(con, arrays[:2])
+            self.assertEqual(db.get_cas_types(con), ["I-E"])
+            db.insert_arrays(con, arrays[2:])
+
+            self.assertEqual(db.get_num_arrays(con), 3)
+            self.assertEqual(db.get_min_max_array_length(con), (4, 8))
+            self.assertEqual(db.get_min_max_repeat_length(con), (4, 4))
+            self.assertEqual(db.get_cas_types(con), ["I-E", "II-A"])
+            rows = con.execute(
+                "SELECT cas_type, num_arrays, min_array_length, max_array_length FROM arrays_summary ORDER BY cas_type"
+            ).fetchall()
+            self.assertEqual(rows, [("I-E", 2, 4, 8), ("II-A", 1, 8, 8)])
+
+            where_clause, params = db._build_where_clause(
+                min_array_length=5, cas_types=["II-A"]
+            )
+            plan = con.execute(
+                f"EXPLAIN QUERY PLAN SELECT id FROM arrays {where_clause}", params
+            ).fetchall()
+            self.assertIn("arrays_filter", str(plan))
+            self.assertEqual(
+                db.load_array_ids(con, min_array_length=5, cas_types=["II-A"]), ["c"]
+            )
+
+    def test_aggregates(self) -> None:
+        arrays = example_arrays()
+        with db.database(self.filename) as con:
+            db.store_meta(con, "file")
+            db.store_arrays(con, arrays[:2], aggregates=True)
+            self.assertTrue(db.has_aggregate_tables(con))
+            # upserted into the existing groups
+            db.insert_arrays(
+                con,
+                [
+                    CRISPRArray(array.id + "2", array.cas_type, array.repeat_stats)
+                    for array in arrays
+                ],
+            )
+
+            filters = [
+                {},
+                {"patterns_to_exclude": [0]},
+                {"cas_types": ["I-E"], "min_array_length": 5},
+            ]
+            for reference in REFERENCES:
+                for filter in filters:
+                    self.assertEqual(
+                        DatasetStats.from_aggregates(
+                            *db.load_aggregates(con, reference, **filter),
+                            reference,
+                            (0, 3),
+                        ),
+                        DatasetStats.from_arrays(
+                            db.load_arrays(con, **filter), reference, (0, 3)
+                        ),
+                    )
+            array_counts, _ = db.load_aggregates(con)
+            self.assertEqual(sum(array_counts.values()), 5)
+
+            con.execute("DROP TABLE agg_arrays")
+            con.execute("DROP TABLE agg_mutations")
+            db.build_aggregates(con)
+            self.assertEqual(db.load_aggregates(con)[0], array_counts)
+
+    def test_accumulate_dataset_stats(self) -> None:
+        arrays = example_arrays()
+        with db.database(self.filename) as con:
+            db.store_meta(con, "file")
+            db.store_arrays(con, arrays)
+            statements: list[str] = []
+            con.set_trace_callback(statements.append)
+            self.assertEqual(
+                [array.id for array in db.iter_arrays(con, rowid_range=(2, 4))],
+                ["b", "c"],
+            )
+            con.set_trace_callback(None)
+            # a rowid range scan, without sorting
+            plan = con.execute(f"EXPLAIN QUERY PLAN {statements[-1]}").fetchall()
+            self.assertNotIn("TEMP B-TREE", " ".join(row[-1] for row in plan))
+            self.assertEqual(
+                list(db.iter_arrays(con, cas_types=["I-E"], batch_size=1)),
+                arrays[:2],
+            )
+
+        self.assertEqual(
+            db.accumulate_dataset_stats(
+                self.filename, "distal", num_workers=2
+            ).finalize(),
+            DatasetStats.from_arrays(arrays, "distal"),
+        )
+        self.assertEqual(
+            db.accumulate_dataset_stats(
+                self.filename, "distal", num_workers=2, patterns_to_exclude=[1]
+            ).finalize(),
+            DatasetStats.from_arrays([arrays[0], arrays[2]], "distal"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()